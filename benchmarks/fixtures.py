@@ -0,0 +1,361 @@
+"""
+ベンチマーク用の記録済みレスポンスと、その再生 (yfinance / RSS / NewsAPI / Supabase の代わり)
+
+    python benchmarks/fixtures.py --record      # 実際の API から記録 (.streamlit/secrets.toml が必要)
+    python benchmarks/fixtures.py --synthetic   # ネットワークなしで合成データを生成
+
+保存先は benchmarks/data/ (Git対象外):
+- prices_{15m,60m,1d}.npz : 銘柄ごとの OHLCV (BASE_PERIOD 分)
+- fundamentals.pkl         : {ticker: {"info": dict, "financials": DataFrame}}
+- rss/{ticker}.xml         : Yahoo RSS の生レスポンス
+- newsapi.json             : {language: get_everything のレスポンス}
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import zlib
+from email.utils import formatdate
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+DATA = os.path.join(HERE, "data")
+INTERVALS = {"15m": "5d", "60m": "1mo", "1d": "max"}   # dashboard_core.BASE_PERIOD と同じ
+RSS_URL = "https://finance.yahoo.com/rss/headline?s="
+
+
+def ticker_master():
+    """アプリの銘柄マスターを [(ticker, name, category)] で返す (アプリ本体は import しない)"""
+    import ast
+    src = open(os.path.join(APP_DIR, "dashboard_core.py"), encoding="utf-8").read()
+    out = {}
+    for node in ast.walk(ast.parse(src)):
+        if not isinstance(node, ast.List): continue
+        for d in node.elts:
+            if not isinstance(d, ast.Dict): continue
+            d = {k.value: v.value for k, v in zip(d.keys, d.values) if isinstance(k, ast.Constant) and isinstance(v, ast.Constant)}
+            if d.keys() == {"C", "T", "N"}: out.setdefault(d["T"], (d["T"], d["N"], d["C"]))
+    return list(out.values())
+
+
+def rss_path(root, ticker):
+    return os.path.join(root, "rss", ticker.replace("/", "_") + ".xml")
+
+
+# --- 保存形式 ---
+def save_prices(path, frames):
+    """{ticker: OHLCV df} を1ファイルにまとめる (銘柄ごとのタイムゾーンも保持)"""
+    tks = list(frames)
+    tz = [str(frames[t].index.tz) if frames[t].index.tz is not None else "" for t in tks]
+    ts, vals, offsets = [], [], [0]
+    for t in tks:
+        df = frames[t][["Open", "High", "Low", "Close", "Volume"]]
+        idx = df.index.tz_convert("UTC").tz_localize(None) if df.index.tz is not None else df.index
+        ts.append(idx.as_unit("s").asi8)
+        vals.append(df.to_numpy(dtype=float))
+        offsets.append(offsets[-1] + len(df))
+    np.savez_compressed(path, tickers=np.array(tks), tz=np.array(tz), offsets=np.array(offsets),
+                        ts=np.concatenate(ts) if ts else np.zeros(0, np.int64),
+                        ohlcv=np.concatenate(vals) if vals else np.zeros((0, 5)))
+
+
+def load_prices(path, now=None):
+    """
+    保存した OHLCV を {ticker: df} で返す。
+    記録時点から経過した分だけ (曜日を保つため週単位で) 時刻をずらし、最終バーを現在付近に合わせる。
+    """
+    with np.load(path) as z:
+        tickers, tzs, offsets, ts, ohlcv = (z[k] for k in ("tickers", "tz", "offsets", "ts", "ohlcv"))
+    if len(ts):
+        now = time.time() if now is None else now
+        ts = ts + (int(now - ts.max()) // (7 * 86400)) * 7 * 86400
+    out = {}
+    for i, t in enumerate(tickers):
+        lo, hi = offsets[i], offsets[i + 1]
+        idx = pd.to_datetime(ts[lo:hi], unit="s")
+        if tzs[i]: idx = idx.tz_localize("UTC").tz_convert(str(tzs[i]))
+        out[str(t)] = pd.DataFrame(ohlcv[lo:hi], index=pd.DatetimeIndex(idx, name="Date"),
+                                   columns=["Open", "High", "Low", "Close", "Volume"])
+    return out
+
+
+# --- 記録 ---
+def record(tickers, batch=50):
+    """実際の API から全レスポンスを記録する"""
+    import requests
+    import streamlit as st
+    import yfinance as yf
+    from newsapi import NewsApiClient
+
+    for iv, period in INTERVALS.items():
+        frames = {}
+        for i in range(0, len(tickers), batch):
+            chunk = tickers[i:i + batch]
+            raw = yf.download(chunk, period=period, interval=iv, group_by="ticker", auto_adjust=True, progress=False)
+            for t in chunk:
+                if raw.empty or t not in raw.columns.get_level_values(0): continue
+                df = raw[t].dropna(how="all")
+                if not df.empty: frames[t] = df
+        save_prices(os.path.join(DATA, f"prices_{iv}.npz"), frames)
+        print(f"prices {iv}: {len(frames)} tickers")
+
+    fund = {}
+    for t in tickers:
+        try: fund[t] = {"info": yf.Ticker(t).info, "financials": yf.Ticker(t).financials}
+        except Exception: pass
+    with open(os.path.join(DATA, "fundamentals.pkl"), "wb") as f: pickle.dump(fund, f)
+
+    os.makedirs(os.path.join(DATA, "rss"), exist_ok=True)
+    for t in tickers:
+        r = requests.get(RSS_URL + t, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+        with open(rss_path(DATA, t), "wb") as f: f.write(r.content)
+
+    client = NewsApiClient(api_key=st.secrets["NEWS_API_KEY"])
+    news = {lang: client.get_everything(q="Apple OR Microsoft OR Toyota", language=lang,
+                                        sort_by="publishedAt", page_size=20) for lang in ("en", "jp")}
+    with open(os.path.join(DATA, "newsapi.json"), "w", encoding="utf-8") as f: json.dump(news, f, ensure_ascii=False)
+
+
+# --- 合成データ (記録できない環境用) ---
+def _calendar(ticker, iv, end):
+    """銘柄の種類ごとの取引時間でバーの時刻を作る"""
+    if ticker.endswith("-USD"): tz, hours, days = "UTC", (0, 24), 7           # 暗号資産
+    elif ticker.endswith("=X"): tz, hours, days = "UTC", (0, 24), 5           # 為替
+    elif ticker.endswith(".T"): tz, hours, days = "Asia/Tokyo", (9, 15), 5
+    else: tz, hours, days = "America/New_York", (9.5, 16), 5
+    if iv == "1d":
+        freq = "D" if days == 7 else "B"
+        return pd.date_range(end=end.tz_localize(None).normalize(), periods=20 * (365 if days == 7 else 252), freq=freq, name="Date")
+    step = {"15m": 15, "60m": 60}[iv]
+    n_days = {"15m": 5, "60m": 22}[iv]
+    local = end.tz_convert(tz).normalize().tz_localize(None)
+    dates = pd.date_range(end=local, periods=n_days, freq="D" if days == 7 else "B")
+    start = np.arange(hours[0] * 60, hours[1] * 60, step)
+    idx = (dates.values[:, None] + (start * 60 * 10**9).astype("timedelta64[ns]")).ravel()
+    return pd.DatetimeIndex(idx).tz_localize(tz).tz_convert("UTC").rename("Datetime")
+
+
+def synthesize(master, seed=0):
+    """銘柄マスターの全銘柄について、再現可能な乱数で各レスポンスを生成する"""
+    end = pd.Timestamp.now(tz="UTC").floor("D") - pd.Timedelta(days=1)
+    for iv in INTERVALS:
+        frames = {}
+        for t, _, _ in master:
+            idx = _calendar(t, iv, end)
+            rng = np.random.default_rng([seed, zlib.crc32(t.encode())])
+            vol = {"1d": 0.015, "60m": 0.004, "15m": 0.002}[iv]
+            r = rng.normal(0, vol, len(idx))
+            close = 100 * np.exp(np.cumsum(r))
+            opn = np.r_[close[0], close[:-1]]
+            spread = np.abs(rng.normal(0, vol, len(idx))) * close
+            frames[t] = pd.DataFrame({
+                "Open": opn, "High": np.maximum(opn, close) + spread, "Low": np.minimum(opn, close) - spread,
+                "Close": close, "Volume": rng.lognormal(13, 1, len(idx)).round(),
+            }, index=idx)
+        save_prices(os.path.join(DATA, f"prices_{iv}.npz"), frames)
+
+    years = pd.to_datetime([f"{end.year - i - 1}-12-31" for i in range(4)])
+    fund = {}
+    for t, name, _ in master:
+        rng = np.random.default_rng([seed, zlib.crc32(t.encode()), 1])
+        rev = rng.uniform(1e9, 1e11) * np.cumprod(np.r_[1, rng.normal(0.95, 0.05, 3)])
+        fund[t] = {"info": {"shortName": name, "symbol": t, "currency": "JPY" if t.endswith(".T") else "USD"},
+                   "financials": pd.DataFrame([rev, rev * rng.uniform(0.05, 0.25), rev * 0.6],
+                                              index=["Total Revenue", "Net Income", "Cost Of Revenue"], columns=years)}
+    with open(os.path.join(DATA, "fundamentals.pkl"), "wb") as f: pickle.dump(fund, f)
+
+    os.makedirs(os.path.join(DATA, "rss"), exist_ok=True)
+    for t, name, _ in master:
+        items = "".join(
+            f"<item><title>{name} headline {i}</title><link>https://finance.yahoo.com/news/{t.lower()}-{i}.html</link>"
+            f"<description>Synthetic article {i} about {name}.</description>"
+            f"<pubDate>{formatdate(end.timestamp() - i * 3600)}</pubDate><guid>{t}-{i}</guid></item>"
+            for i in range(20))
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Yahoo! Finance: {t} News</title>'
+               f"<link>https://finance.yahoo.com/quote/{t}</link><description>Latest news</description>{items}</channel></rss>")
+        with open(rss_path(DATA, t), "w", encoding="utf-8") as f: f.write(xml)
+
+    news = {lang: {"status": "ok", "totalResults": 20, "articles": [{
+        "source": {"id": None, "name": f"Wire {i % 4}"}, "author": None,
+        "title": f"Market update {lang} {i}", "description": "Synthetic article.",
+        "url": f"https://news.example.com/{lang}/{i}", "urlToImage": None,
+        "publishedAt": (end - pd.Timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"), "content": "",
+    } for i in range(20)]} for lang in ("en", "jp")}
+    with open(os.path.join(DATA, "newsapi.json"), "w", encoding="utf-8") as f: json.dump(news, f, ensure_ascii=False)
+
+
+# --- 再生 ---
+class _Result:
+    def __init__(self, data): self.data = data
+
+
+class _Query:
+    """supabase-py のクエリビルダーのうちアプリが使う部分"""
+    def __init__(self, rows, op="select", payload=None):
+        self.rows, self.op, self.payload, self.filters = rows, op, payload, []
+    def select(self, *a, **k): return self
+    def order(self, col, desc=False):
+        self.sort = (col, desc)
+        return self
+    def limit(self, n): return self
+    def insert(self, payload): return _Query(self.rows, "insert", payload)
+    def update(self, payload): return _Query(self.rows, "update", payload)
+    def delete(self): return _Query(self.rows, "delete")
+    def eq(self, col, v):
+        self.filters.append((col, {v}))
+        return self
+    def in_(self, col, vs):
+        self.filters.append((col, set(vs)))
+        return self
+    def _match(self, r): return all(r.get(c) in vs for c, vs in self.filters)
+    def execute(self):
+        if self.op == "insert":
+            new = []
+            for p in self.payload if isinstance(self.payload, list) else [self.payload]:
+                new.append(dict(p, id=max([r["id"] for r in self.rows] + [0]) + 1,
+                                created_at=pd.Timestamp.now(tz="UTC").isoformat()))
+            self.rows.extend(new)
+            return _Result(new)
+        hit = [r for r in self.rows if self._match(r)]
+        if self.op == "delete":
+            self.rows[:] = [r for r in self.rows if not self._match(r)]
+        elif self.op == "update":
+            for r in hit: r.update(self.payload)
+        else:
+            col, desc = getattr(self, "sort", ("id", False))
+            hit = sorted(hit, key=lambda r: r.get(col) or "", reverse=desc)
+        return _Result([dict(r) for r in hit])
+
+
+class Replay:
+    """
+    記録済みレスポンスを返す上流の代役。install() で各ライブラリの入口を差し替える。
+    latency (秒) を指定すると1リクエストごとにその分待つ (ネットワーク遅延の再現)。
+    記録にない HTTP リクエストは接続エラーにする (ベンチマーク中に外部へ出ないように)。
+    """
+    def __init__(self, root=DATA, latency=0.0):
+        self.root, self.latency = root, latency
+        self.prices = {iv: load_prices(os.path.join(root, f"prices_{iv}.npz")) for iv in INTERVALS}
+        with open(os.path.join(root, "fundamentals.pkl"), "rb") as f: self.fundamentals = pickle.load(f)
+        with open(os.path.join(root, "newsapi.json"), encoding="utf-8") as f: self.news = json.load(f)
+        self.tables = {"watchlist": []}
+        self.calls = {"download": 0, "ticker": 0, "rss": 0, "newsapi": 0, "supabase": 0}
+
+    def set_watchlist(self, tickers):
+        self.tables["watchlist"][:] = [{"id": i + 1, "ticker": t, "note": "bench", "created_at": f"2026-01-01T00:00:{i % 60:02d}"}
+                                       for i, t in enumerate(tickers)]
+
+    def _wait(self, kind):
+        self.calls[kind] += 1
+        if self.latency: time.sleep(self.latency)
+
+    # yfinance
+    def download(self, tickers, period=None, interval="1d", start=None, end=None, group_by="column", **kw):
+        self._wait("download")
+        if isinstance(tickers, str): tickers = tickers.split()
+        frames = {}
+        for t in tickers:
+            df = self.prices.get(interval, {}).get(t)
+            if df is None: continue
+            if start is not None:
+                s = pd.Timestamp(start, unit="s", tz="UTC") if isinstance(start, (int, float)) else pd.Timestamp(start)
+                if df.index.tz is not None and s.tzinfo is None: s = s.tz_localize(df.index.tz)
+                df = df[df.index >= s]
+            elif period and period != "max":
+                n = int(period[:-2] if period.endswith("mo") else period[:-1])
+                off = {"d": pd.Timedelta(days=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[
+                    "mo" if period.endswith("mo") else period[-1]]
+                df = df[df.index > df.index[-1] - off]
+            if not df.empty: frames[t] = df
+        if not frames: return pd.DataFrame()
+        out = pd.concat(frames, axis=1, names=["Ticker", "Price"])
+        return out if group_by == "ticker" else out.swaplevel(axis=1).sort_index(axis=1)
+
+    def ticker(self, symbol, session=None):
+        replay = self
+        class Ticker:
+            def __init__(self): self.ticker = symbol
+            @property
+            def info(self):
+                replay._wait("ticker")
+                return dict(replay.fundamentals.get(symbol, {}).get("info", {}))
+            @property
+            def financials(self):
+                replay._wait("ticker")
+                return replay.fundamentals.get(symbol, {}).get("financials", pd.DataFrame()).copy()
+        return Ticker()
+
+    # HTTP (Yahoo RSS)
+    def request(self, session, method, url, headers=None, **kw):
+        import requests
+        if not url.startswith(RSS_URL):
+            raise requests.ConnectionError(f"offline benchmark: {url}")
+        self._wait("rss")
+        path = rss_path(self.root, url[len(RSS_URL):])
+        body = open(path, "rb").read() if os.path.exists(path) else b""
+        r = requests.Response()
+        r.url, r.encoding = url, "utf-8"
+        etag = f'"{zlib.crc32(body):08x}"'
+        if headers and headers.get("If-None-Match") == etag:
+            r.status_code, r._content = 304, b""
+        else:
+            r.status_code, r._content = (200, body) if body else (404, b"")
+        r.headers.update({"Content-Type": "application/rss+xml", "ETag": etag})
+        return r
+
+    # NewsAPI / Supabase
+    def newsapi_client(self, api_key=None, **kw):
+        replay = self
+        class Client:
+            def get_everything(self, q=None, language="en", **kw):
+                replay._wait("newsapi")
+                return json.loads(json.dumps(replay.news.get(language, {"status": "ok", "articles": []})))
+        return Client()
+
+    def supabase_client(self, url=None, key=None, **kw):
+        replay = self
+        class Client:
+            def table(self, name):
+                replay._wait("supabase")
+                return _Query(replay.tables.setdefault(name, []))
+        return Client()
+
+    def install(self):
+        import newsapi
+        import requests
+        import supabase
+        import yfinance as yf
+        replay = self
+        yf.download = self.download
+        yf.Ticker = self.ticker
+        requests.Session.request = lambda session, method, url, **kw: replay.request(session, method, url, **kw)
+        newsapi.NewsApiClient = self.newsapi_client
+        supabase.create_client = self.supabase_client
+        return self
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    g = ap.add_mutually_exclusive_group(required=True)
+    g.add_argument("--record", action="store_true", help="実際の API から記録する")
+    g.add_argument("--synthetic", action="store_true", help="合成データを生成する")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    os.makedirs(DATA, exist_ok=True)
+    master = ticker_master()
+    t = time.perf_counter()
+    if args.record:
+        sys.path.insert(0, APP_DIR)
+        record([tk for tk, _, _ in master])
+    else:
+        synthesize(master, args.seed)
+    print(f"{len(master)} tickers -> {DATA} ({time.perf_counter() - t:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
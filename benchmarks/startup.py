@@ -0,0 +1,93 @@
+"""
+起動ベンチマーク
+- コールドスタート: 新しいプロセスでアプリを初回実行するまでの時間
+- 再実行: 初回実行後、ウィジェット操作1回分 (スクリプト再実行) にかかる時間
+
+    python benchmarks/startup.py [--cold 3] [--reruns 20]
+
+上流 (yfinance / RSS / NewsAPI / Supabase) は記録済みのレスポンス (fixtures.py の Replay) で置き換え、
+先読みスレッドは止めて実行する (計測にネットワークや裏の取得が混ざらないように)。
+事前に python benchmarks/fixtures.py --synthetic (または --record) が必要。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "streamlit_app.py")
+DATA = os.path.join(HERE, "data")
+SECRETS = {
+    "SUPABASE_URL": "https://example.supabase.co",
+    "SUPABASE_KEY": "x" * 40,
+    "NEWS_API_KEY": "x",
+    "PREFETCH_ENABLED": False,
+}
+WATCHLIST = ["AAPL", "MSFT", "7203.T", "BTC-USD"]
+
+
+def child(reruns):
+    os.environ["PREFETCH_ENABLED"] = "0"
+    os.environ["DASHBOARD_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-startup-")
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t_harness = time.perf_counter()
+
+    # Replay は pandas・yfinance・supabase などを先に読み込む。アプリも初回実行で読むものなので初回実行に含め、
+    # 記録済みデータの読み込みだけを除く
+    sys.path.insert(0, HERE)
+    from fixtures import Replay
+    t_import = time.perf_counter()
+    replay = Replay()
+    t_load = time.perf_counter()
+    replay.install().set_watchlist(WATCHLIST)
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    for k, v in SECRETS.items(): at.secrets[k] = v
+    at.run()
+    t_first = time.perf_counter()
+
+    times = []
+    for _ in range(reruns):
+        t = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - t) * 1000)
+    print(json.dumps({
+        "harness_ms": (t_harness - t0) * 1000,
+        "first_run_ms": ((t_import - t_harness) + (t_first - t_load)) * 1000,
+        "reruns_ms": times,
+        "exceptions": [str(e.value) for e in at.exception],
+    }))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cold", type=int, default=3, help="コールドスタートの試行回数")
+    ap.add_argument("--reruns", type=int, default=20, help="1プロセスあたりの再実行回数")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child: return child(args.reruns)
+    if not os.path.exists(os.path.join(DATA, "prices_1d.npz")):
+        sys.exit("fixtures がありません: python benchmarks/fixtures.py --synthetic (または --record)")
+
+    results = []
+    for _ in range(args.cold):
+        out = subprocess.run([sys.executable, __file__, "--child", "--reruns", str(args.reruns)],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    first = [r["first_run_ms"] for r in results]
+    reruns = sorted(t for r in results for t in r["reruns_ms"])
+    print(f"cold start (first run) : median {statistics.median(first):8.1f} ms  (n={len(first)})")
+    print(f"rerun                  : median {statistics.median(reruns):8.1f} ms  "
+          f"p95 {reruns[int(len(reruns) * 0.95) - 1]:8.1f} ms  (n={len(reruns)})")
+    errs = {e for r in results for e in r["exceptions"]}
+    if errs: print("exceptions:", *errs, sep="\n  ")
+
+
+if __name__ == "__main__":
+    main()
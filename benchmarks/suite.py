@@ -0,0 +1,255 @@
+"""
+オフライン・ベンチマーク
+記録済みのレスポンス (benchmarks/fixtures.py) を上流の代わりに返し、ネットワークなしで
+主要な処理の所要時間を計測して、保存した基準値 (baseline.json) との差を表示する。
+
+    python benchmarks/fixtures.py --synthetic      # 初回のみ (--record で実データを記録)
+    python benchmarks/suite.py                     # 計測して基準値と比較 (悪化があれば終了コード 1)
+    python benchmarks/suite.py --save-baseline     # 基準値を更新
+    python benchmarks/suite.py --tickers 1,10 --periods 1日,1年 --no-page
+
+計測項目 (銘柄数 1/10/50/350 × 全期間):
+- prices.cold      : キャッシュもローカル保存も空の状態から get_prices (初回表示)
+- prices.store     : ローカル保存済み・メモリキャッシュ空 (再起動直後)
+- prices.snapshot  : 一括更新 (precompute) で指標も保存済み・メモリキャッシュ空
+- get_stock_data   : キャッシュ済みの銘柄を1つずつ取得 (通常の再実行)
+- technicals       : calculate_technicals を銘柄ごとに実行
+- correlation      : 相関計算 (価格は取得済み)
+- news.cold / news : fetch_news_hybrid (記事ストア空 / 取り込み済み。期間に依存しないので銘柄数ごとに1回)
+- news.add         : 取り込み済みの選択に1銘柄を足したときの fetch_news_hybrid
+- news.search      : 記事ストアの全文検索
+- screen.cold / screen : スクリーナー (ローカル保存が空 / 保存済みで計算結果のキャッシュなし)
+- backtest         : SMA クロス 100 通り × 10年のバックテスト (日足は保存済み)
+- portfolio        : 等ウェイトのリスク指標・フロンティア・モンテカルロ 10万パス × 252日 (50銘柄まで)
+- page.cold / page.warm : AppTest によるページ全体の実行 (キャッシュ空 / キャッシュ済み)
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+APP = os.path.join(APP_DIR, "streamlit_app.py")
+BASELINE = os.path.join(HERE, "baseline.json")
+SECRETS = {
+    "SUPABASE_URL": "https://example.supabase.co",
+    "SUPABASE_KEY": "x" * 40,
+    "NEWS_API_KEY": "x",
+    "PREFETCH_ENABLED": False,
+}
+SIZES = [1, 10, 50, 350]
+LARGE = 100   # これ以上の銘柄数は1回の計測が長くばらつきも小さいので繰り返さない
+
+sys.path.insert(0, HERE)
+from fixtures import DATA, Replay, ticker_master  # noqa: E402
+
+
+def load_app(workdir):
+    """一時ディレクトリの Secrets でデータ層 (dashboard_core) を読み込む。Streamlit は使わない"""
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        for k, v in SECRETS.items(): f.write(f"{k} = {json.dumps(v)}\n")
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+    import dashboard_core
+    return dashboard_core
+
+
+def reset(store=True):
+    """全キャッシュを捨てる。store=True ならローカル保存 (価格履歴・記事) も消す"""
+    core = sys.modules.get("dashboard_core")
+    if core is not None: core.clear_resources()
+    if "streamlit" in sys.modules:
+        import streamlit as st
+        st.cache_data.clear()
+    if not store: return
+    db = os.path.join(os.environ["DASHBOARD_DATA_DIR"], "ohlcv.sqlite")
+    if os.path.exists(db):
+        con = sqlite3.connect(db)
+        with con:
+            con.execute("DELETE FROM ohlcv")
+            con.execute("DELETE FROM ohlcv_meta")
+            con.execute("DELETE FROM indicators")
+        con.close()
+    for ext in ("", "-wal", "-shm"):
+        path = os.path.join(os.environ["DASHBOARD_DATA_DIR"], "news.sqlite" + ext)
+        if os.path.exists(path): os.remove(path)
+
+
+def pick(master, n):
+    """AAPL と、マスター全体から等間隔に選んだ残り n-1 銘柄 (カテゴリが偏らないように)"""
+    rest = [t for t in master if t != "AAPL"]
+    idx = np.linspace(0, len(rest) - 1, n - 1).round().astype(int) if n > 1 else []
+    return ["AAPL"] + [rest[i] for i in dict.fromkeys(idx)]
+
+
+def measure(fn, repeat, setup=None):
+    """setup (計測外) → fn を repeat 回繰り返し、中央値 (ms) を返す"""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return statistics.median(times)
+
+
+def bench_functions(A, replay, tickers, periods, repeat, results):
+    n = len(tickers)
+    replay.set_watchlist(tickers)
+    for pk in periods:
+        iv = A.I_MAP.get(pk, "1d")
+        results[f"prices.cold/{n}/{pk}"] = measure(lambda: A.get_prices(tickers, pk), repeat, reset)
+        A.get_prices(tickers, pk)   # ローカル保存を埋める
+        results[f"prices.store/{n}/{pk}"] = measure(lambda: A.get_prices(tickers, pk), repeat, lambda: reset(store=False))
+        A.precompute_prices(tickers, pk)   # 指標スナップショットを保存
+        results[f"prices.snapshot/{n}/{pk}"] = measure(lambda: A.get_prices(tickers, pk), repeat, lambda: reset(store=False))
+        results[f"get_stock_data/{n}/{pk}"] = measure(lambda: [A.get_stock_data(t, pk) for t in tickers], repeat)
+
+        raw = [A.slice_period(A.store_read(t, iv)[0], pk) for t in tickers]
+        raw = [df for df in raw if not df.empty]
+        results[f"technicals/{n}/{pk}"] = measure(lambda: [A.calculate_technicals(df) for df in raw], repeat)
+        if n >= 2:
+            results[f"correlation/{n}/{pk}"] = measure(lambda: A.correlation_analysis(tickers, pk), repeat,
+                                                       lambda: A._corr_cache().clear())
+    results[f"news.cold/{n}/-"] = measure(lambda: A.fetch_news_hybrid(tickers), repeat, reset)
+    results[f"news/{n}/-"] = measure(lambda: A.fetch_news_hybrid(tickers, force=True), repeat)
+    if n >= 2:
+        results[f"news.add/{n}/-"] = measure(lambda: A.fetch_news_hybrid(tickers), repeat,
+                                             lambda: (A._news_cache().clear(), A.fetch_news_hybrid(tickers[:-1])))
+    results[f"news.search/{n}/-"] = measure(lambda: A.news_store_query(tickers, "headline"), repeat)
+    results[f"screen.cold/{n}/-"] = measure(lambda: A.screen_universe(tickers, "3ヶ月"), repeat, reset)
+    results[f"screen/{n}/-"] = measure(lambda: A.screen_universe(tickers, "3ヶ月"), repeat, lambda: A._screen_cache().clear())
+    grid = A.backtest_grid("SMA クロス", {"短期": (5, 50, 5), "長期": (60, 240, 20)})
+    results[f"backtest/{n}/-"] = measure(lambda: A.backtest_sweep(tickers, "SMA クロス", grid, 10), repeat,
+                                         lambda: A._backtest_cache().clear())
+    if 2 <= n <= 50:
+        weights = {t: 1 / n for t in tickers}
+        results[f"portfolio/{n}/-"] = measure(lambda: A.portfolio_analysis(weights, "1年", 252, 100_000, "正規分布"), repeat,
+                                              lambda: A._risk_cache().clear())
+
+
+def bench_page(replay, tickers, periods, repeat, results):
+    """AppTest でページ全体を実行する (メモリを持ち越さないよう期間ごとに別プロセスで呼ぶ)"""
+    from streamlit.testing.v1 import AppTest
+    n = len(tickers)
+    replay.set_watchlist(tickers)
+    at = AppTest.from_file(APP, default_timeout=600)
+    for k, v in SECRETS.items(): at.secrets[k] = v
+    at.session_state["selected_tickers"] = tickers
+    errors = set()
+    def run():
+        at.run()
+        errors.update(str(e.value) for e in at.exception)
+    for pk in periods:
+        at.session_state["period"] = pk
+        results[f"page.cold/{n}/{pk}"] = measure(run, repeat, reset)
+        results[f"page.warm/{n}/{pk}"] = measure(run, repeat)
+    for e in errors: print(f"  ! page/{n}: {e}", file=sys.stderr)
+
+
+def page_in_child(tickers, period, repeat, latency):
+    out = subprocess.run([sys.executable, __file__, "--page-child", "--symbols", ",".join(tickers),
+                          "--periods", period, "--repeat", str(repeat), "--latency", str(latency)],
+                         stdout=subprocess.PIPE, text=True)
+    if out.returncode != 0:
+        print(f"  ! page/{len(tickers)}/{period}: exit {out.returncode}", file=sys.stderr)
+        return {}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def machine():
+    import pandas as pd
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__}
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """基準値と比べて表を出力し、悪化した項目名のリストを返す"""
+    base = baseline.get("results", {})
+    worse = []
+    print(f"{'case':<34}{'ms':>10}{'baseline':>10}{'ratio':>8}")
+    for case, ms in results.items():
+        b = base.get(case)
+        if not b:
+            print(f"{case:<34}{ms:>10.1f}{'-':>10}{'-':>8}")
+            continue
+        ratio, flag = ms / b, ""
+        if ratio > 1 + tolerance and ms - b > min_ms:
+            flag = "  << regression"
+            worse.append(case)
+        elif ratio < 1 / (1 + tolerance) and b - ms > min_ms:
+            flag = "  improved"
+        print(f"{case:<34}{ms:>10.1f}{b:>10.1f}{ratio:>8.2f}{flag}")
+    return worse
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", default=",".join(map(str, SIZES)), help="銘柄数 (カンマ区切り)")
+    ap.add_argument("--periods", default="all", help="期間 (カンマ区切り, all で全期間)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=0.0, help="上流1リクエストあたりの遅延 (秒)")
+    ap.add_argument("--no-page", action="store_true", help="AppTest によるページ計測を省略")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="基準値からの許容悪化率")
+    ap.add_argument("--min-ms", type=float, default=5.0, help="これ未満の差は悪化とみなさない")
+    ap.add_argument("--page-child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--symbols", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if not os.path.exists(os.path.join(DATA, "prices_1d.npz")):
+        sys.exit("fixtures がありません: python benchmarks/fixtures.py --synthetic (または --record)")
+    logging.disable(logging.WARNING)
+    replay = Replay(latency=args.latency).install()
+    if args.page_child:
+        results = {}
+        bench_page(replay, args.symbols.split(","), args.periods.split(","), args.repeat, results)
+        return print(json.dumps(results))
+
+    os.environ["DASHBOARD_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-store-")
+    replay.set_watchlist([])
+    A = load_app(tempfile.mkdtemp(prefix="bench-"))
+    master = [t for t, _, _ in ticker_master() if t in replay.prices["1d"]]
+    periods = A.PERIODS if args.periods == "all" else args.periods.split(",")
+
+    results = {}
+    for n in map(int, args.tickers.split(",")):
+        tickers = pick(master, min(n, len(master)))
+        repeat = 1 if n >= LARGE else args.repeat
+        t = time.perf_counter()
+        bench_functions(A, replay, tickers, periods, repeat, results)
+        if not args.no_page:
+            for pk in periods: results.update(page_in_child(tickers, pk, repeat, args.latency))
+        print(f"# {n} tickers: {time.perf_counter() - t:.1f}s", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        if baseline.get("machine", {}).get("platform") != machine()["platform"]:
+            print("# 基準値は別の環境で計測されたものです (比較は参考値)", file=sys.stderr)
+    worse = compare(results, baseline, args.tolerance, args.min_ms)
+
+    if args.save_baseline:
+        merged = dict(baseline.get("results", {}), **{k: round(v, 2) for k, v in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "repeat": args.repeat, "results": merged}, f, ensure_ascii=False, indent=1)
+        print(f"saved: {args.baseline}")
+    elif worse:
+        print(f"{len(worse)} regression(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
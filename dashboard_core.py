@@ -0,0 +1,2477 @@
+"""
+Pro Investor Dashboard のデータ取得・分析部分 (Streamlit なしで import できる)。
+画面 (streamlit_app.py) のほか、一括更新の CLI (precompute.py) やバッチから同じ関数・同じローカル保存を使う。
+
+設定は、ダッシュボードから読み込まれたときは st.secrets、単体では .streamlit/secrets.toml を読み、
+どちらも環境変数が優先する。
+"""
+import pandas as pd
+import numpy as np
+import requests
+import calendar
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import heapq
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from statistics import NormalDist
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+import functools
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+try: import tomllib
+except ImportError: tomllib = None   # Python 3.10 以前は secrets.toml を読まない (環境変数のみ)
+
+class _LazyModule:
+    """初回の属性アクセス時に import する (重いモジュールは使う画面になるまで読み込まない)"""
+    def __init__(self, name): self._name = name
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+def lazy_module(name):
+    return _LazyModule(name)
+
+yf = lazy_module("yfinance")
+feedparser = lazy_module("feedparser")
+
+# --- 1. 設定 ---
+SECRETS_FILES = [os.path.expanduser("~/.streamlit/secrets.toml"), os.path.join(os.getcwd(), ".streamlit", "secrets.toml")]
+
+def load_secrets():
+    """ダッシュボードから読み込まれたときは st.secrets、単体では Streamlit と同じ secrets.toml (後のファイルが優先)"""
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try: return {k: st.secrets[k] for k in st.secrets}
+        except: pass
+    out = {}
+    for path in SECRETS_FILES:
+        try:
+            with open(path, "rb") as f: out.update(tomllib.load(f))
+        except: pass
+    return out
+
+SECRETS = load_secrets()
+
+def setting(name, default=None):
+    """環境変数 > secrets の順に設定値を返す。環境変数の文字列は default の型 (bool / list) に合わせる"""
+    v = os.environ.get(name)
+    if v is None: return SECRETS.get(name, default)
+    if isinstance(default, bool): return v.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, list): return [x.strip() for x in v.split(",") if x.strip()]
+    return v
+
+SUPABASE_URL = setting("SUPABASE_URL")
+SUPABASE_KEY = setting("SUPABASE_KEY")
+NEWS_API_KEY = setting("NEWS_API_KEY")
+
+_RESOURCES = []
+
+def resource(fn):
+    """プロセスで1つだけ作って全セッション・スレッドで共有する (st.cache_resource 相当)"""
+    fn = functools.cache(fn)
+    _RESOURCES.append(fn)
+    return fn
+
+def clear_resources():
+    """resource をすべて作り直させる (テスト・ベンチマーク用)"""
+    for fn in _RESOURCES: fn.cache_clear()
+
+# クライアントは初回の使用時に1回だけ生成して共有
+@resource
+def get_supabase():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+class _TimeoutSession(requests.Session):
+    """NewsApiClient は timeout=30 固定で呼ぶため、セッション側で短いタイムアウトに差し替える"""
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().request(*args, **kwargs)
+
+@resource
+def get_newsapi():
+    from newsapi import NewsApiClient
+    return NewsApiClient(api_key=NEWS_API_KEY, session=_TimeoutSession(NEWS_SOURCE_TIMEOUT))
+
+# --- 計測 (処理時間・キャッシュヒット率) ---
+# 区間ごとの所要時間をヒストグラムに、キャッシュの hit / stale / miss を件数で集計する (プロセス全体)。
+# perf_begin() を呼んだスレッド (画面の再実行) で計測した区間はそのリストにも残し、今回の再実行の内訳として表示する。
+# 再実行がプールに投げた処理は perf_bind() で包むと、ワーカースレッドで計測した区間も同じリストに入る。
+PERF_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)   # 秒
+PERF_EXPORT_PATH = setting("PERF_EXPORT_PATH", "")   # Prometheus textfile の出力先 (任意)
+PERF_EXPORT_INTERVAL = 15
+_perf_local = threading.local()
+
+def perf_begin():
+    """このスレッドで以降に計測する区間を集めるリストを返す"""
+    _perf_local.run = []
+    return _perf_local.run
+
+def perf_bind(fn):
+    """呼び出し元スレッドの再実行のリストを引き継いで fn を実行する関数を返す (プールに投げる前に包む)"""
+    run = getattr(_perf_local, "run", None)
+    if run is None: return fn
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        prev = getattr(_perf_local, "run", None)
+        _perf_local.run = run
+        try: return fn(*args, **kwargs)
+        finally: _perf_local.run = prev
+    return wrapper
+
+@resource
+def _metrics():
+    return {"lock": threading.Lock(), "spans": {}, "cache": defaultdict(Counter),
+            "since": time.time(), "exported": 0.0}
+
+def record_span(name, dt):
+    m = _metrics()
+    with m["lock"]:
+        s = m["spans"].get(name)
+        if s is None: s = m["spans"][name] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(PERF_BUCKETS)}
+        s["count"] += 1
+        s["sum"] += dt
+        s["max"] = max(s["max"], dt)
+        for i, le in enumerate(PERF_BUCKETS):
+            if dt <= le: s["buckets"][i] += 1
+    run = getattr(_perf_local, "run", None)
+    if run is not None: run.append((name, dt))
+
+@contextmanager
+def perf_span(name):
+    t = time.perf_counter()
+    try: yield
+    finally: record_span(name, time.perf_counter() - t)
+
+def timed(name):
+    """関数全体を perf_span で計測するデコレータ"""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with perf_span(name): return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def cache_event(cache, result, n=1):
+    """result は "hit" / "stale" / "miss" """
+    if n <= 0: return
+    m = _metrics()
+    with m["lock"]: m["cache"][cache][result] += n
+
+def metrics_snapshot():
+    """プロセス全体の集計のコピー: {"since", "buckets", "spans": {区間: {...}}, "cache": {キャッシュ: {結果: 回数}}}"""
+    m = _metrics()
+    with m["lock"]:
+        return {"since": m["since"], "buckets": PERF_BUCKETS,
+                "spans": {k: dict(v) for k, v in m["spans"].items()},
+                "cache": {k: dict(v) for k, v in m["cache"].items()}}
+
+def span_count(name):
+    """区間 name を計測した回数"""
+    m = _metrics()
+    with m["lock"]: return m["spans"].get(name, {}).get("count", 0)
+
+def metrics_json():
+    return json.dumps(metrics_snapshot(), ensure_ascii=False, indent=2)
+
+def metrics_prometheus():
+    m = _metrics()
+    out = ["# HELP dashboard_span_seconds Time spent in instrumented sections.",
+           "# TYPE dashboard_span_seconds histogram"]
+    with m["lock"]:
+        for name, s in sorted(m["spans"].items()):
+            for le, c in zip(PERF_BUCKETS, s["buckets"]):
+                out.append(f'dashboard_span_seconds_bucket{{span="{name}",le="{le}"}} {c}')
+            out.append(f'dashboard_span_seconds_bucket{{span="{name}",le="+Inf"}} {s["count"]}')
+            out.append(f'dashboard_span_seconds_sum{{span="{name}"}} {s["sum"]:.6f}')
+            out.append(f'dashboard_span_seconds_count{{span="{name}"}} {s["count"]}')
+        out += ["# HELP dashboard_cache_requests_total Cache lookups by result.",
+                "# TYPE dashboard_cache_requests_total counter"]
+        for cache, cnt in sorted(m["cache"].items()):
+            for result, c in sorted(cnt.items()):
+                out.append(f'dashboard_cache_requests_total{{cache="{cache}",result="{result}"}} {c}')
+    return "\n".join(out) + "\n"
+
+def export_metrics():
+    """PERF_EXPORT_PATH があれば Prometheus 形式で書き出す (node_exporter の textfile collector 用)"""
+    m = _metrics()
+    if not PERF_EXPORT_PATH or time.time() - m["exported"] < PERF_EXPORT_INTERVAL: return
+    m["exported"] = time.time()
+    try:
+        tmp = PERF_EXPORT_PATH + ".tmp"
+        with open(tmp, "w") as f: f.write(metrics_prometheus())
+        os.replace(tmp, PERF_EXPORT_PATH)
+    except: pass
+
+# ==============================================================================
+# 2. 銘柄データマスター (350種以上・固定)
+# ==============================================================================
+# (リストは長いので省略せず、前回のv13と同じ内容を使用します。
+#  以下のリスト部分は前回のv13のコードのまま、変更ありません)
+
+# --- 債券・金利 ---
+BONDS = [
+    {"C": "📉 Bonds", "T": "^TNX", "N": "US 10Y Yield"},
+    {"C": "📉 Bonds", "T": "^FVX", "N": "US 5Y Yield"},
+    {"C": "📉 Bonds", "T": "^IRX", "N": "US 3 Month Bill"},
+    {"C": "📉 Bonds", "T": "^TYX", "N": "US 30Y Yield"},
+    {"C": "📉 Bonds", "T": "TLT", "N": "20+ Year Treasury Bond"},
+    {"C": "📉 Bonds", "T": "IEF", "N": "7-10 Year Treasury Bond"},
+    {"C": "📉 Bonds", "T": "SHY", "N": "1-3 Year Treasury Bond"},
+    {"C": "📉 Bonds", "T": "GOVT", "N": "US Treasury Bond ETF"},
+    {"C": "📉 Bonds", "T": "SHV", "N": "Short Treasury Bond"},
+    {"C": "📉 Bonds", "T": "BIL", "N": "1-3 Month Treasury"},
+    {"C": "📉 Bonds", "T": "LQD", "N": "Inv Grade Corporate Bond"},
+    {"C": "📉 Bonds", "T": "VCIT", "N": "Interm-Term Corp Bond"},
+    {"C": "📉 Bonds", "T": "VCSH", "N": "Short-Term Corp Bond"},
+    {"C": "📉 Bonds", "T": "HYG", "N": "High Yield Bond"},
+    {"C": "📉 Bonds", "T": "JNK", "N": "High Yield Bond SPDR"},
+    {"C": "📉 Bonds", "T": "BKLN", "N": "Senior Loan ETF"},
+    {"C": "📉 Bonds", "T": "AGG", "N": "US Aggregate Bond"},
+    {"C": "📉 Bonds", "T": "BND", "N": "Total Bond Market"},
+    {"C": "📉 Bonds", "T": "BNDX", "N": "Total International Bond"},
+    {"C": "📉 Bonds", "T": "TIP", "N": "TIPS (Inflation-Protected)"},
+]
+# --- 為替 ---
+FOREX = [
+    {"C": "💱 Forex", "T": "USDJPY=X", "N": "USD/JPY (ドル円)"},
+    {"C": "💱 Forex", "T": "EURJPY=X", "N": "EUR/JPY (ユーロ円)"},
+    {"C": "💱 Forex", "T": "GBPJPY=X", "N": "GBP/JPY (ポンド円)"},
+    {"C": "💱 Forex", "T": "AUDJPY=X", "N": "AUD/JPY (豪ドル円)"},
+    {"C": "💱 Forex", "T": "NZDJPY=X", "N": "NZD/JPY (NZドル円)"},
+    {"C": "💱 Forex", "T": "CADJPY=X", "N": "CAD/JPY (カナダドル円)"},
+    {"C": "💱 Forex", "T": "CHFJPY=X", "N": "CHF/JPY (フラン円)"},
+    {"C": "💱 Forex", "T": "EURUSD=X", "N": "EUR/USD (ユーロドル)"},
+    {"C": "💱 Forex", "T": "GBPUSD=X", "N": "GBP/USD (ポンドドル)"},
+    {"C": "💱 Forex", "T": "AUDUSD=X", "N": "AUD/USD (豪ドル米ドル)"},
+    {"C": "💱 Forex", "T": "NZDUSD=X", "N": "NZD/USD (NZドル米ドル)"},
+    {"C": "💱 Forex", "T": "USDCAD=X", "N": "USD/CAD (ドルカナダ)"},
+    {"C": "💱 Forex", "T": "USDCHF=X", "N": "USD/CHF (ドルフラン)"},
+    {"C": "💱 Forex", "T": "CNY=X", "N": "USD/CNY (ドル人民元)"},
+    {"C": "💱 Forex", "T": "HKD=X", "N": "USD/HKD (ドル香港ドル)"},
+    {"C": "💱 Forex", "T": "SGD=X", "N": "USD/SGD (ドルシンガポールドル)"},
+    {"C": "💱 Forex", "T": "INR=X", "N": "USD/INR (ドルルピー)"},
+    {"C": "💱 Forex", "T": "MXN=X", "N": "USD/MXN (ドルメキシコペソ)"},
+    {"C": "💱 Forex", "T": "BRL=X", "N": "USD/BRL (ドルレアル)"},
+    {"C": "💱 Forex", "T": "TRY=X", "N": "USD/TRY (ドルトルコリラ)"},
+    {"C": "💱 Forex", "T": "ZAR=X", "N": "USD/ZAR (ドルランド)"},
+    {"C": "💱 Forex", "T": "RUB=X", "N": "USD/RUB (ドルルーブル)"},
+    {"C": "💱 Forex", "T": "KRW=X", "N": "USD/KRW (ドルウォン)"},
+    {"C": "💱 Forex", "T": "TWD=X", "N": "USD/TWD (ドル台湾ドル)"},
+    {"C": "💱 Forex", "T": "DX-Y.NYB", "N": "Dollar Index (DXY)"},
+]
+# --- 米国株 ---
+US_TECH = [
+    {"C": "🇺🇸 Tech", "T": "AAPL", "N": "Apple"},
+    {"C": "🇺🇸 Tech", "T": "MSFT", "N": "Microsoft"},
+    {"C": "🇺🇸 Tech", "T": "NVDA", "N": "NVIDIA"},
+    {"C": "🇺🇸 Tech", "T": "GOOGL", "N": "Google (Alphabet)"},
+    {"C": "🇺🇸 Tech", "T": "AMZN", "N": "Amazon"},
+    {"C": "🇺🇸 Tech", "T": "META", "N": "Meta Platforms"},
+    {"C": "🇺🇸 Tech", "T": "TSLA", "N": "Tesla"},
+    {"C": "🇺🇸 Tech", "T": "AVGO", "N": "Broadcom"},
+    {"C": "🇺🇸 Tech", "T": "AMD", "N": "AMD"},
+    {"C": "🇺🇸 Tech", "T": "INTC", "N": "Intel"},
+    {"C": "🇺🇸 Tech", "T": "QCOM", "N": "Qualcomm"},
+    {"C": "🇺🇸 Tech", "T": "TXN", "N": "Texas Instruments"},
+    {"C": "🇺🇸 Tech", "T": "MU", "N": "Micron Technology"},
+    {"C": "🇺🇸 Tech", "T": "AMAT", "N": "Applied Materials"},
+    {"C": "🇺🇸 Tech", "T": "LRCX", "N": "Lam Research"},
+    {"C": "🇺🇸 Tech", "T": "ADI", "N": "Analog Devices"},
+    {"C": "🇺🇸 Tech", "T": "KLAC", "N": "KLA Corp"},
+    {"C": "🇺🇸 Tech", "T": "ASML", "N": "ASML Holding"},
+    {"C": "🇺🇸 Tech", "T": "TSM", "N": "TSMC"},
+    {"C": "🇺🇸 Tech", "T": "ARM", "N": "Arm Holdings"},
+    {"C": "🇺🇸 Tech", "T": "ORCL", "N": "Oracle"},
+    {"C": "🇺🇸 Tech", "T": "CRM", "N": "Salesforce"},
+    {"C": "🇺🇸 Tech", "T": "ADBE", "N": "Adobe"},
+    {"C": "🇺🇸 Tech", "T": "CSCO", "N": "Cisco Systems"},
+    {"C": "🇺🇸 Tech", "T": "IBM", "N": "IBM"},
+    {"C": "🇺🇸 Tech", "T": "NOW", "N": "ServiceNow"},
+    {"C": "🇺🇸 Tech", "T": "INTU", "N": "Intuit"},
+    {"C": "🇺🇸 Tech", "T": "SAP", "N": "SAP"},
+    {"C": "🇺🇸 Tech", "T": "UBER", "N": "Uber Technologies"},
+    {"C": "🇺🇸 Tech", "T": "ABNB", "N": "Airbnb"},
+    {"C": "🇺🇸 Tech", "T": "BKNG", "N": "Booking Holdings"},
+    {"C": "🇺🇸 Tech", "T": "PANW", "N": "Palo Alto Networks"},
+    {"C": "🇺🇸 Tech", "T": "CRWD", "N": "CrowdStrike"},
+    {"C": "🇺🇸 Tech", "T": "FTNT", "N": "Fortinet"},
+    {"C": "🇺🇸 Tech", "T": "ZS", "N": "Zscaler"},
+    {"C": "🇺🇸 Tech", "T": "PLTR", "N": "Palantir"},
+    {"C": "🇺🇸 Tech", "T": "SNOW", "N": "Snowflake"},
+    {"C": "🇺🇸 Tech", "T": "DDOG", "N": "Datadog"},
+    {"C": "🇺🇸 Tech", "T": "SQ", "N": "Block (Square)"},
+    {"C": "🇺🇸 Tech", "T": "PYPL", "N": "PayPal"},
+    {"C": "🇺🇸 Tech", "T": "SHOP", "N": "Shopify"},
+    {"C": "🇺🇸 Tech", "T": "COIN", "N": "Coinbase"},
+    {"C": "🇺🇸 Tech", "T": "HOOD", "N": "Robinhood"},
+    {"C": "🇺🇸 Tech", "T": "RBLX", "N": "Roblox"},
+    {"C": "🇺🇸 Tech", "T": "U", "N": "Unity Software"},
+    {"C": "🇺🇸 Tech", "T": "NET", "N": "Cloudflare"},
+    {"C": "🇺🇸 Tech", "T": "MDB", "N": "MongoDB"},
+    {"C": "🇺🇸 Tech", "T": "TEAM", "N": "Atlassian"},
+    {"C": "🇺🇸 Tech", "T": "WDAY", "N": "Workday"},
+    {"C": "🇺🇸 Tech", "T": "ZM", "N": "Zoom Video"},
+    {"C": "🇺🇸 Tech", "T": "DOCU", "N": "DocuSign"},
+    {"C": "🇺🇸 Tech", "T": "OKTA", "N": "Okta"},
+    {"C": "🇺🇸 Tech", "T": "TWLO", "N": "Twilio"},
+    {"C": "🇺🇸 Tech", "T": "SPOT", "N": "Spotify"},
+    {"C": "🇺🇸 Tech", "T": "SNAP", "N": "Snap"},
+    {"C": "🇺🇸 Tech", "T": "PINS", "N": "Pinterest"},
+    {"C": "🇺🇸 Tech", "T": "ROKU", "N": "Roku"},
+    {"C": "🇺🇸 Tech", "T": "EA", "N": "Electronic Arts"},
+    {"C": "🇺🇸 Tech", "T": "ATVI", "N": "Activision Blizzard"},
+]
+US_MAJOR = [
+    {"C": "🇺🇸 Major", "T": "JPM", "N": "JPMorgan Chase"},
+    {"C": "🇺🇸 Major", "T": "BAC", "N": "Bank of America"},
+    {"C": "🇺🇸 Major", "T": "WFC", "N": "Wells Fargo"},
+    {"C": "🇺🇸 Major", "T": "C", "N": "Citigroup"},
+    {"C": "🇺🇸 Major", "T": "GS", "N": "Goldman Sachs"},
+    {"C": "🇺🇸 Major", "T": "MS", "N": "Morgan Stanley"},
+    {"C": "🇺🇸 Major", "T": "BLK", "N": "BlackRock"},
+    {"C": "🇺🇸 Major", "T": "V", "N": "Visa"},
+    {"C": "🇺🇸 Major", "T": "MA", "N": "Mastercard"},
+    {"C": "🇺🇸 Major", "T": "AXP", "N": "American Express"},
+    {"C": "🇺🇸 Major", "T": "BRK-B", "N": "Berkshire Hathaway"},
+    {"C": "🇺🇸 Major", "T": "WMT", "N": "Walmart"},
+    {"C": "🇺🇸 Major", "T": "TGT", "N": "Target"},
+    {"C": "🇺🇸 Major", "T": "COST", "N": "Costco"},
+    {"C": "🇺🇸 Major", "T": "HD", "N": "Home Depot"},
+    {"C": "🇺🇸 Major", "T": "LOW", "N": "Lowe's"},
+    {"C": "🇺🇸 Major", "T": "PG", "N": "Procter & Gamble"},
+    {"C": "🇺🇸 Major", "T": "KO", "N": "Coca-Cola"},
+    {"C": "🇺🇸 Major", "T": "PEP", "N": "PepsiCo"},
+    {"C": "🇺🇸 Major", "T": "MCD", "N": "McDonald's"},
+    {"C": "🇺🇸 Major", "T": "SBUX", "N": "Starbucks"},
+    {"C": "🇺🇸 Major", "T": "CMG", "N": "Chipotle"},
+    {"C": "🇺🇸 Major", "T": "YUM", "N": "Yum! Brands"},
+    {"C": "🇺🇸 Major", "T": "NKE", "N": "Nike"},
+    {"C": "🇺🇸 Major", "T": "LULU", "N": "Lululemon"},
+    {"C": "🇺🇸 Major", "T": "DIS", "N": "Disney"},
+    {"C": "🇺🇸 Major", "T": "CMCSA", "N": "Comcast"},
+    {"C": "🇺🇸 Major", "T": "NFLX", "N": "Netflix"},
+    {"C": "🇺🇸 Major", "T": "WBD", "N": "Warner Bros. Discovery"},
+    {"C": "🇺🇸 Major", "T": "JNJ", "N": "Johnson & Johnson"},
+    {"C": "🇺🇸 Major", "T": "LLY", "N": "Eli Lilly"},
+    {"C": "🇺🇸 Major", "T": "UNH", "N": "UnitedHealth"},
+    {"C": "🇺🇸 Major", "T": "PFE", "N": "Pfizer"},
+    {"C": "🇺🇸 Major", "T": "MRK", "N": "Merck"},
+    {"C": "🇺🇸 Major", "T": "ABBV", "N": "AbbVie"},
+    {"C": "🇺🇸 Major", "T": "AMGN", "N": "Amgen"},
+    {"C": "🇺🇸 Major", "T": "GILD", "N": "Gilead Sciences"},
+    {"C": "🇺🇸 Major", "T": "CVX", "N": "Chevron"},
+    {"C": "🇺🇸 Major", "T": "XOM", "N": "Exxon Mobil"},
+    {"C": "🇺🇸 Major", "T": "COP", "N": "ConocoPhillips"},
+    {"C": "🇺🇸 Major", "T": "SLB", "N": "Schlumberger"},
+    {"C": "🇺🇸 Major", "T": "GE", "N": "General Electric"},
+    {"C": "🇺🇸 Major", "T": "CAT", "N": "Caterpillar"},
+    {"C": "🇺🇸 Major", "T": "DE", "N": "John Deere"},
+    {"C": "🇺🇸 Major", "T": "HON", "N": "Honeywell"},
+    {"C": "🇺🇸 Major", "T": "UPS", "N": "UPS"},
+    {"C": "🇺🇸 Major", "T": "FDX", "N": "FedEx"},
+    {"C": "🇺🇸 Major", "T": "BA", "N": "Boeing"},
+    {"C": "🇺🇸 Major", "T": "LMT", "N": "Lockheed Martin"},
+    {"C": "🇺🇸 Major", "T": "RTX", "N": "Raytheon"},
+    {"C": "🇺🇸 Major", "T": "GD", "N": "General Dynamics"},
+    {"C": "🇺🇸 Major", "T": "NOC", "N": "Northrop Grumman"},
+    {"C": "🇺🇸 Major", "T": "MMM", "N": "3M"},
+    {"C": "🇺🇸 Major", "T": "F", "N": "Ford Motor"},
+    {"C": "🇺🇸 Major", "T": "GM", "N": "General Motors"},
+    {"C": "🇺🇸 Major", "T": "TM", "N": "Toyota Motor (ADR)"},
+    {"C": "🇺🇸 Major", "T": "HMC", "N": "Honda Motor (ADR)"},
+    {"C": "🇺🇸 Major", "T": "T", "N": "AT&T"},
+    {"C": "🇺🇸 Major", "T": "VZ", "N": "Verizon"},
+    {"C": "🇺🇸 Major", "T": "TMUS", "N": "T-Mobile US"},
+]
+# --- 日本株 ---
+JAPAN = [
+    {"C": "🇯🇵 Japan", "T": "7203.T", "N": "トヨタ自動車"},
+    {"C": "🇯🇵 Japan", "T": "6758.T", "N": "ソニーグループ"},
+    {"C": "🇯🇵 Japan", "T": "9984.T", "N": "ソフトバンクグループ"},
+    {"C": "🇯🇵 Japan", "T": "9434.T", "N": "ソフトバンク"},
+    {"C": "🇯🇵 Japan", "T": "9432.T", "N": "NTT"},
+    {"C": "🇯🇵 Japan", "T": "9433.T", "N": "KDDI"},
+    {"C": "🇯🇵 Japan", "T": "8306.T", "N": "三菱UFJフィナンシャル"},
+    {"C": "🇯🇵 Japan", "T": "8316.T", "N": "三井住友フィナンシャル"},
+    {"C": "🇯🇵 Japan", "T": "8411.T", "N": "みずほフィナンシャル"},
+    {"C": "🇯🇵 Japan", "T": "8035.T", "N": "東京エレクトロン"},
+    {"C": "🇯🇵 Japan", "T": "6857.T", "N": "アドバンテスト"},
+    {"C": "🇯🇵 Japan", "T": "6146.T", "N": "ディスコ"},
+    {"C": "🇯🇵 Japan", "T": "7735.T", "N": "SCREENホールディングス"},
+    {"C": "🇯🇵 Japan", "T": "6920.T", "N": "レーザーテック"},
+    {"C": "🇯🇵 Japan", "T": "6861.T", "N": "キーエンス"},
+    {"C": "🇯🇵 Japan", "T": "4063.T", "N": "信越化学工業"},
+    {"C": "🇯🇵 Japan", "T": "6594.T", "N": "ニデック"},
+    {"C": "🇯🇵 Japan", "T": "6981.T", "N": "村田製作所"},
+    {"C": "🇯🇵 Japan", "T": "6954.T", "N": "ファナック"},
+    {"C": "🇯🇵 Japan", "T": "6301.T", "N": "小松製作所 (コマツ)"},
+    {"C": "🇯🇵 Japan", "T": "7011.T", "N": "三菱重工業"},
+    {"C": "🇯🇵 Japan", "T": "7012.T", "N": "川崎重工業"},
+    {"C": "🇯🇵 Japan", "T": "7013.T", "N": "IHI"},
+    {"C": "🇯🇵 Japan", "T": "6501.T", "N": "日立製作所"},
+    {"C": "🇯🇵 Japan", "T": "6701.T", "N": "NEC"},
+    {"C": "🇯🇵 Japan", "T": "6702.T", "N": "富士通"},
+    {"C": "🇯🇵 Japan", "T": "7741.T", "N": "HOYA"},
+    {"C": "🇯🇵 Japan", "T": "7751.T", "N": "キヤノン"},
+    {"C": "🇯🇵 Japan", "T": "6902.T", "N": "デンソー"},
+    {"C": "🇯🇵 Japan", "T": "7267.T", "N": "本田技研工業 (ホンダ)"},
+    {"C": "🇯🇵 Japan", "T": "7201.T", "N": "日産自動車"},
+    {"C": "🇯🇵 Japan", "T": "7270.T", "N": "SUBARU"},
+    {"C": "🇯🇵 Japan", "T": "7202.T", "N": "いすゞ自動車"},
+    {"C": "🇯🇵 Japan", "T": "7269.T", "N": "スズキ"},
+    {"C": "🇯🇵 Japan", "T": "9983.T", "N": "ファーストリテイリング"},
+    {"C": "🇯🇵 Japan", "T": "7974.T", "N": "任天堂"},
+    {"C": "🇯🇵 Japan", "T": "9766.T", "N": "コナミグループ"},
+    {"C": "🇯🇵 Japan", "T": "9684.T", "N": "スクウェア・エニックス"},
+    {"C": "🇯🇵 Japan", "T": "7832.T", "N": "バンダイナムコ"},
+    {"C": "🇯🇵 Japan", "T": "9613.T", "N": "NTTデータ"},
+    {"C": "🇯🇵 Japan", "T": "8001.T", "N": "伊藤忠商事"},
+    {"C": "🇯🇵 Japan", "T": "8058.T", "N": "三菱商事"},
+    {"C": "🇯🇵 Japan", "T": "8031.T", "N": "三井物産"},
+    {"C": "🇯🇵 Japan", "T": "8002.T", "N": "丸紅"},
+    {"C": "🇯🇵 Japan", "T": "8053.T", "N": "住友商事"},
+    {"C": "🇯🇵 Japan", "T": "2768.T", "N": "双日"},
+    {"C": "🇯🇵 Japan", "T": "8015.T", "N": "豊田通商"},
+    {"C": "🇯🇵 Japan", "T": "6098.T", "N": "リクルートホールディングス"},
+    {"C": "🇯🇵 Japan", "T": "4661.T", "N": "オリエンタルランド"},
+    {"C": "🇯🇵 Japan", "T": "2914.T", "N": "日本たばこ産業 (JT)"},
+    {"C": "🇯🇵 Japan", "T": "4502.T", "N": "武田薬品工業"},
+    {"C": "🇯🇵 Japan", "T": "4519.T", "N": "中外製薬"},
+    {"C": "🇯🇵 Japan", "T": "4568.T", "N": "第一三共"},
+    {"C": "🇯🇵 Japan", "T": "4503.T", "N": "アステラス製薬"},
+    {"C": "🇯🇵 Japan", "T": "4523.T", "N": "エーザイ"},
+    {"C": "🇯🇵 Japan", "T": "4911.T", "N": "資生堂"},
+    {"C": "🇯🇵 Japan", "T": "4452.T", "N": "花王"},
+    {"C": "🇯🇵 Japan", "T": "8766.T", "N": "東京海上ホールディングス"},
+    {"C": "🇯🇵 Japan", "T": "8725.T", "N": "MS&AD"},
+    {"C": "🇯🇵 Japan", "T": "8630.T", "N": "SOMPO"},
+    {"C": "🇯🇵 Japan", "T": "8801.T", "N": "三井不動産"},
+    {"C": "🇯🇵 Japan", "T": "8802.T", "N": "三菱地所"},
+    {"C": "🇯🇵 Japan", "T": "1925.T", "N": "大和ハウス工業"},
+    {"C": "🇯🇵 Japan", "T": "1928.T", "N": "積水ハウス"},
+    {"C": "🇯🇵 Japan", "T": "9020.T", "N": "JR東日本"},
+    {"C": "🇯🇵 Japan", "T": "9022.T", "N": "JR東海"},
+    {"C": "🇯🇵 Japan", "T": "9021.T", "N": "JR西日本"},
+    {"C": "🇯🇵 Japan", "T": "9201.T", "N": "日本航空 (JAL)"},
+    {"C": "🇯🇵 Japan", "T": "9202.T", "N": "ANAホールディングス"},
+    {"C": "🇯🇵 Japan", "T": "9101.T", "N": "日本郵船"},
+    {"C": "🇯🇵 Japan", "T": "9104.T", "N": "商船三井"},
+    {"C": "🇯🇵 Japan", "T": "9107.T", "N": "川崎汽船"},
+    {"C": "🇯🇵 Japan", "T": "1605.T", "N": "INPEX"},
+    {"C": "🇯🇵 Japan", "T": "5020.T", "N": "ENEOS"},
+    {"C": "🇯🇵 Japan", "T": "5401.T", "N": "日本製鉄"},
+    {"C": "🇯🇵 Japan", "T": "5411.T", "N": "JFE"},
+    {"C": "🇯🇵 Japan", "T": "3402.T", "N": "東レ"},
+    {"C": "🇯🇵 Japan", "T": "3407.T", "N": "旭化成"},
+    {"C": "🇯🇵 Japan", "T": "6367.T", "N": "ダイキン工業"},
+    {"C": "🇯🇵 Japan", "T": "2802.T", "N": "味の素"},
+]
+# --- ETF / 指数 ---
+ETF = [
+    {"C": "📊 ETF", "T": "^GSPC", "N": "S&P 500 Index"},
+    {"C": "📊 ETF", "T": "^DJI", "N": "Dow Jones Industrial Average"},
+    {"C": "📊 ETF", "T": "^IXIC", "N": "NASDAQ Composite"},
+    {"C": "📊 ETF", "T": "^NDX", "N": "NASDAQ 100"},
+    {"C": "📊 ETF", "T": "^RUT", "N": "Russell 2000"},
+    {"C": "📊 ETF", "T": "^VIX", "N": "CBOE Volatility Index"},
+    {"C": "📊 ETF", "T": "^N225", "N": "Nikkei 225"},
+    {"C": "📊 ETF", "T": "^STOXX50E", "N": "Euro Stoxx 50"},
+    {"C": "📊 ETF", "T": "^FTSE", "N": "FTSE 100 (UK)"},
+    {"C": "📊 ETF", "T": "^GDAXI", "N": "DAX (Germany)"},
+    {"C": "📊 ETF", "T": "^FCHI", "N": "CAC 40 (France)"},
+    {"C": "📊 ETF", "T": "^HSI", "N": "Hang Seng Index"},
+    {"C": "📊 ETF", "T": "000001.SS", "N": "SSE Composite (China)"},
+    {"C": "📊 ETF", "T": "^BSESN", "N": "BSE SENSEX (India)"},
+    {"C": "📊 ETF", "T": "VOO", "N": "Vanguard S&P 500 ETF"},
+    {"C": "📊 ETF", "T": "IVV", "N": "iShares Core S&P 500 ETF"},
+    {"C": "📊 ETF", "T": "SPY", "N": "SPDR S&P 500 ETF Trust"},
+    {"C": "📊 ETF", "T": "VTI", "N": "Vanguard Total Stock Market"},
+    {"C": "📊 ETF", "T": "VT", "N": "Vanguard Total World Stock"},
+    {"C": "📊 ETF", "T": "QQQ", "N": "Invesco QQQ Trust"},
+    {"C": "📊 ETF", "T": "DIA", "N": "SPDR Dow Jones Industrial Average"},
+    {"C": "📊 ETF", "T": "IWM", "N": "iShares Russell 2000 ETF"},
+    {"C": "📊 ETF", "T": "VTV", "N": "Vanguard Value ETF"},
+    {"C": "📊 ETF", "T": "VUG", "N": "Vanguard Growth ETF"},
+    {"C": "📊 ETF", "T": "VYM", "N": "Vanguard High Dividend Yield"},
+    {"C": "📊 ETF", "T": "VIG", "N": "Vanguard Dividend Appreciation"},
+    {"C": "📊 ETF", "T": "SPYD", "N": "SPDR Portfolio S&P 500 High Dividend"},
+    {"C": "📊 ETF", "T": "HDV", "N": "iShares Core High Dividend"},
+    {"C": "📊 ETF", "T": "DVY", "N": "iShares Select Dividend"},
+    {"C": "📊 ETF", "T": "XLK", "N": "Technology Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLF", "N": "Financial Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLV", "N": "Health Care Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLE", "N": "Energy Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLI", "N": "Industrial Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLP", "N": "Consumer Staples Select Sector"},
+    {"C": "📊 ETF", "T": "XLY", "N": "Consumer Discret Select Sector"},
+    {"C": "📊 ETF", "T": "XLC", "N": "Communication Services Select"},
+    {"C": "📊 ETF", "T": "XLB", "N": "Materials Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLU", "N": "Utilities Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "XLRE", "N": "Real Estate Select Sector SPDR"},
+    {"C": "📊 ETF", "T": "SMH", "N": "VanEck Semiconductor ETF"},
+    {"C": "📊 ETF", "T": "SOXX", "N": "iShares Semiconductor ETF"},
+    {"C": "📊 ETF", "T": "ARKK", "N": "ARK Innovation ETF"},
+    {"C": "📊 ETF", "T": "GLD", "N": "SPDR Gold Shares"},
+    {"C": "📊 ETF", "T": "IAU", "N": "iShares Gold Trust"},
+    {"C": "📊 ETF", "T": "SLV", "N": "iShares Silver Trust"},
+    {"C": "📊 ETF", "T": "USO", "N": "United States Oil Fund"},
+    {"C": "📊 ETF", "T": "VEA", "N": "Vanguard FTSE Developed Markets"},
+    {"C": "📊 ETF", "T": "VWO", "N": "Vanguard FTSE Emerging Markets"},
+    {"C": "📊 ETF", "T": "EEM", "N": "iShares MSCI Emerging Markets"},
+    {"C": "📊 ETF", "T": "EFA", "N": "iShares MSCI EAFE ETF"},
+    {"C": "📊 ETF", "T": "EWJ", "N": "iShares MSCI Japan ETF"},
+    {"C": "📊 ETF", "T": "FXI", "N": "iShares China Large-Cap ETF"},
+    {"C": "📊 ETF", "T": "INDA", "N": "iShares MSCI India ETF"},
+    {"C": "📊 ETF", "T": "EPI", "N": "WisdomTree India Earnings"},
+    {"C": "📊 ETF", "T": "VNQ", "N": "Vanguard Real Estate ETF"},
+    {"C": "📊 ETF", "T": "AGG", "N": "iShares Core US Aggregate Bond"},
+    {"C": "📊 ETF", "T": "BND", "N": "Vanguard Total Bond Market"},
+    {"C": "📊 ETF", "T": "LQD", "N": "iShares iBoxx Investment Grade"},
+    {"C": "📊 ETF", "T": "HYG", "N": "iShares iBoxx High Yield"},
+]
+# --- 暗号資産 ---
+CRYPTO = [
+    {"C": "🪙 Crypto", "T": "BTC-USD", "N": "Bitcoin"},
+    {"C": "🪙 Crypto", "T": "ETH-USD", "N": "Ethereum"},
+    {"C": "🪙 Crypto", "T": "USDT-USD", "N": "Tether"},
+    {"C": "🪙 Crypto", "T": "BNB-USD", "N": "BNB"},
+    {"C": "🪙 Crypto", "T": "XRP-USD", "N": "XRP"},
+    {"C": "🪙 Crypto", "T": "SOL-USD", "N": "Solana"},
+    {"C": "🪙 Crypto", "T": "USDC-USD", "N": "USDC"},
+    {"C": "🪙 Crypto", "T": "ADA-USD", "N": "Cardano"},
+    {"C": "🪙 Crypto", "T": "AVAX-USD", "N": "Avalanche"},
+    {"C": "🪙 Crypto", "T": "DOGE-USD", "N": "Dogecoin"},
+    {"C": "🪙 Crypto", "T": "TRX-USD", "N": "TRON"},
+    {"C": "🪙 Crypto", "T": "DOT-USD", "N": "Polkadot"},
+    {"C": "🪙 Crypto", "T": "LINK-USD", "N": "Chainlink"},
+    {"C": "🪙 Crypto", "T": "MATIC-USD", "N": "Polygon"},
+    {"C": "🪙 Crypto", "T": "WBTC-USD", "N": "Wrapped Bitcoin"},
+    {"C": "🪙 Crypto", "T": "LTC-USD", "N": "Litecoin"},
+    {"C": "🪙 Crypto", "T": "SHIB-USD", "N": "Shiba Inu"},
+    {"C": "🪙 Crypto", "T": "DAI-USD", "N": "Dai"},
+    {"C": "🪙 Crypto", "T": "BCH-USD", "N": "Bitcoin Cash"},
+    {"C": "🪙 Crypto", "T": "UNI7083-USD", "N": "Uniswap"},
+    {"C": "🪙 Crypto", "T": "ATOM-USD", "N": "Cosmos"},
+    {"C": "🪙 Crypto", "T": "XLM-USD", "N": "Stellar"},
+    {"C": "🪙 Crypto", "T": "XMR-USD", "N": "Monero"},
+    {"C": "🪙 Crypto", "T": "ETC-USD", "N": "Ethereum Classic"},
+    {"C": "🪙 Crypto", "T": "FIL-USD", "N": "Filecoin"},
+]
+# --- 欧州・その他 ---
+GLOBAL = [
+    {"C": "🇪🇺 Global", "T": "NESN.SW", "N": "Nestle (Swiss)"},
+    {"C": "🇪🇺 Global", "T": "ROG.SW", "N": "Roche (Swiss)"},
+    {"C": "🇪🇺 Global", "T": "NOVN.SW", "N": "Novartis (Swiss)"},
+    {"C": "🇪🇺 Global", "T": "MC.PA", "N": "LVMH (France)"},
+    {"C": "🇪🇺 Global", "T": "OR.PA", "N": "L'Oreal (France)"},
+    {"C": "🇪🇺 Global", "T": "RMS.PA", "N": "Hermes (France)"},
+    {"C": "🇪🇺 Global", "T": "TTE.PA", "N": "TotalEnergies (France)"},
+    {"C": "🇪🇺 Global", "T": "SAN.PA", "N": "Sanofi (France)"},
+    {"C": "🇪🇺 Global", "T": "AIR.PA", "N": "Airbus (France)"},
+    {"C": "🇪🇺 Global", "T": "ASML.AS", "N": "ASML (Netherlands)"},
+    {"C": "🇪🇺 Global", "T": "SIE.DE", "N": "Siemens (Germany)"},
+    {"C": "🇪🇺 Global", "T": "SAP.DE", "N": "SAP (Germany)"},
+    {"C": "🇪🇺 Global", "T": "DTE.DE", "N": "Deutsche Telekom (Germany)"},
+    {"C": "🇪🇺 Global", "T": "ALV.DE", "N": "Allianz (Germany)"},
+    {"C": "🇪🇺 Global", "T": "VOW3.DE", "N": "Volkswagen (Germany)"},
+    {"C": "🇪🇺 Global", "T": "MBG.DE", "N": "Mercedes-Benz (Germany)"},
+    {"C": "🇪🇺 Global", "T": "BMW.DE", "N": "BMW (Germany)"},
+    {"C": "🇪🇺 Global", "T": "AZN.L", "N": "AstraZeneca (UK)"},
+    {"C": "🇪🇺 Global", "T": "SHEL.L", "N": "Shell (UK)"},
+    {"C": "🇪🇺 Global", "T": "HSBA.L", "N": "HSBC (UK)"},
+    {"C": "🇪🇺 Global", "T": "ULVR.L", "N": "Unilever (UK)"},
+    {"C": "🇪🇺 Global", "T": "BP.L", "N": "BP (UK)"},
+    {"C": "🇪🇺 Global", "T": "RIO.L", "N": "Rio Tinto (UK)"},
+    {"C": "🇪🇺 Global", "T": "GSK.L", "N": "GSK (UK)"},
+    {"C": "🇪🇺 Global", "T": "005930.KS", "N": "Samsung Electronics (Korea)"},
+    {"C": "🇪🇺 Global", "T": "000660.KS", "N": "SK Hynix (Korea)"},
+    {"C": "🇪🇺 Global", "T": "2330.TW", "N": "TSMC (Taiwan)"},
+    {"C": "🇪🇺 Global", "T": "BABA", "N": "Alibaba (China/ADR)"},
+    {"C": "🇪🇺 Global", "T": "PDD", "N": "PDD Holdings (China/ADR)"},
+    {"C": "🇪🇺 Global", "T": "JD", "N": "JD.com (China/ADR)"},
+    {"C": "🇪🇺 Global", "T": "BIDU", "N": "Baidu (China/ADR)"},
+    {"C": "🇪🇺 Global", "T": "NIO", "N": "NIO (China/ADR)"},
+    {"C": "🇪🇺 Global", "T": "INFY", "N": "Infosys (India/ADR)"},
+    {"C": "🇪🇺 Global", "T": "HDB", "N": "HDFC Bank (India/ADR)"},
+    {"C": "🇪🇺 Global", "T": "VALE", "N": "Vale (Brazil/ADR)"},
+    {"C": "🇪🇺 Global", "T": "PBR", "N": "Petrobras (Brazil/ADR)"},
+    {"C": "🇪🇺 Global", "T": "RY", "N": "Royal Bank of Canada"},
+    {"C": "🇪🇺 Global", "T": "TD", "N": "TD Bank (Canada)"},
+    {"C": "🇪🇺 Global", "T": "SHOP", "N": "Shopify (Canada)"},
+]
+
+@resource
+def load_ticker_master():
+    # マスター表は固定なのでプロセスで1回だけ構築
+    raw = BONDS + FOREX + US_TECH + US_MAJOR + JAPAN + ETF + CRYPTO + GLOBAL
+    df = pd.DataFrame(raw).rename(columns={"C": "Category", "T": "Ticker", "N": "Name"})
+    return raw, df, {item['T']: item['N'] for item in raw}
+
+TICKER_DATA_RAW, ticker_df_master, TICKER_NAME_MAP = load_ticker_master()
+
+# --- 3. 関数群 ---
+
+# --- テクニカル指標エンジン (NumPy) ---
+# 入力は (時間 T × 銘柄 N) の2次元配列。累積和・差分などの中間結果を指標間で共有し、
+# state (直近バーと EMA の分子/分母) を渡せば新しいバーの分だけ計算を延長できる。
+IND_TAIL = 50   # 最大ウィンドウ (SMA50)
+
+def _prefix(x):
+    # NaN を除いた累積和と有効数 (先頭に0行)
+    ok = np.isfinite(x)
+    z = np.zeros((1, x.shape[1]))
+    return (np.concatenate([z, np.cumsum(np.where(ok, x, 0.0), axis=0)]),
+            np.concatenate([z, np.cumsum(ok, axis=0)]))
+
+def _rolling_sum(pre, n):
+    # pandas rolling(n) と同じく、窓内の値がすべて揃った位置のみ有効
+    cs, cnt = pre
+    out = np.full((len(cs) - 1, cs.shape[1]), np.nan)
+    if len(cs) > n:
+        s = cs[n:] - cs[:-n]
+        out[n-1:] = np.where(cnt[n:] - cnt[:-n] == n, s, np.nan)
+    return out
+
+def _ema(x, span, state=None):
+    """ewm(span=span, adjust=True).mean() と同じ値。state=(分子, 分母) で続きから計算"""
+    a = 1 - 2 / (span + 1)
+    ok = np.isfinite(x)
+    xv, vv = np.where(ok, x, 0.0), ok.astype(float)
+    num, den = state if state is not None else (np.zeros(x.shape[1]), np.zeros(x.shape[1]))
+    out = np.empty(x.shape)
+    # a^-k がオーバーフローしない長さのブロックごとに閉形式で計算
+    blk = max(1, int(200 / -np.log(a)))
+    for s in range(0, len(x), blk):
+        k = np.arange(1, min(blk, len(x) - s) + 1)[:, None]
+        pw, inv = a ** k, a ** -k
+        nb = pw * (num + np.cumsum(xv[s:s+len(k)] * inv, axis=0))
+        db = pw * (den + np.cumsum(vv[s:s+len(k)] * inv, axis=0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[s:s+len(k)] = np.where(db > 0, nb / db, np.nan)
+        num, den = nb[-1], db[-1]
+    return out, (num, den)
+
+def _rsi(c, n):
+    # RSI (n本の単純平均)
+    delta = np.full(c.shape, np.nan)
+    delta[1:] = c[1:] - c[:-1]
+    with np.errstate(invalid="ignore"):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    g = _rolling_sum(_prefix(gain), n)
+    l = _rolling_sum(_prefix(loss), n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 - 100 / (1 + g / l)
+
+def compute_indicators(close, high=None, low=None, volume=None, state=None):
+    """
+    指標をまとめて計算する。close 等は (T, N) 配列。
+    state を渡すと直前までの続きとして新しい T 行分だけを計算する。
+    戻り値: ({指標名: (T, N) 配列}, 次回用の state)
+    """
+    state = state or {}
+    tail = state.get("tail", {})
+    n_new = len(close)
+
+    def ext(name, x):
+        # 直近バー (最大 IND_TAIL 行) の後ろに新しいバーを連結
+        t = tail.get(name)
+        return x if t is None else np.concatenate([t, x])
+
+    c = ext("close", close)
+    k = len(c) - n_new
+    pre_c = _prefix(c)
+    s20 = _rolling_sum(pre_c, 20)
+    res = {"SMA20": s20 / 20, "SMA50": _rolling_sum(pre_c, 50) / 50}
+
+    res["RSI"] = _rsi(c, 14)
+
+    # ボリンジャーバンド (SMA20 の累積和を共有)
+    v20 = (_rolling_sum(_prefix(c * c), 20) - s20 * s20 / 20) / 19
+    sd = np.sqrt(np.clip(v20, 0, None))
+    res["BB_Upper"], res["BB_Lower"] = res["SMA20"] + 2 * sd, res["SMA20"] - 2 * sd
+
+    if high is not None and low is not None:
+        h, lo = ext("high", high), ext("low", low)
+        prev = np.full(c.shape, np.nan)
+        prev[1:] = c[:-1]
+        tr = np.fmax(h - lo, np.fmax(np.abs(h - prev), np.abs(lo - prev)))
+        res["ATR"] = _rolling_sum(_prefix(tr), 14) / 14
+        if volume is not None:
+            v = ext("volume", volume)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res["VWAP"] = _rolling_sum(_prefix((h + lo + c) / 3 * v), 20) / _rolling_sum(_prefix(v), 20)
+
+    res = {name: arr[k:] for name, arr in res.items()}
+
+    # EMA 系は分子/分母の状態だけで延長できる
+    e12, st12 = _ema(close, 12, state.get("e12"))
+    e26, st26 = _ema(close, 26, state.get("e26"))
+    res["MACD"] = e12 - e26
+    res["Signal"], st_sig = _ema(res["MACD"], 9, state.get("sig"))
+
+    new_tail = {"close": c[-IND_TAIL:]}
+    if high is not None and low is not None:
+        new_tail["high"], new_tail["low"] = h[-IND_TAIL:], lo[-IND_TAIL:]
+        if volume is not None: new_tail["volume"] = v[-IND_TAIL:]
+    return res, {"tail": new_tail, "e12": st12, "e26": st26, "sig": st_sig}
+
+def technicals_frame(df, state=None):
+    """OHLCV の DataFrame に指標列を付けた新しい DataFrame と state を返す (元の df は変更しない)"""
+    col = lambda name: df[name].to_numpy(dtype=float)[:, None] if name in df.columns else None
+    ind, state = compute_indicators(col("Close"), col("High"), col("Low"), col("Volume"), state)
+    return df.assign(**{name: arr[:, 0] for name, arr in ind.items()}), state
+
+def technicals_matrix(close, high=None, low=None, volume=None):
+    """複数銘柄を一括計算: 入力は 日付×銘柄 の DataFrame、戻り値は {指標名: 日付×銘柄 の DataFrame}"""
+    arr = lambda x: None if x is None else x.reindex(index=close.index, columns=close.columns).to_numpy(dtype=float)
+    ind, _ = compute_indicators(arr(close), arr(high), arr(low), arr(volume))
+    return {name: pd.DataFrame(a, index=close.index, columns=close.columns) for name, a in ind.items()}
+
+def calculate_technicals(df):
+    return technicals_frame(df)[0]
+
+def technicals_with_checkpoint(df, state=None):
+    # 最終バーは未確定で上書きされることがあるので、その直前の state を保存用に返す
+    head, ckpt = technicals_frame(df.iloc[:-1], state)
+    last, _ = technicals_frame(df.iloc[-1:], ckpt)
+    return pd.concat([head, last]), ckpt
+
+I_MAP = {"1日": "15m", "1週間": "60m"}
+# 日中足は取引日数で、日足は最終バーからの期間で保存済み履歴を切り出す
+PERIOD_DAYS = {"1日": 1, "1週間": 5}
+PERIOD_OFFSETS = {
+    "1ヶ月": pd.DateOffset(months=1), "3ヶ月": pd.DateOffset(months=3),
+    "6ヶ月": pd.DateOffset(months=6), "1年": pd.DateOffset(years=1),
+    "3年": pd.DateOffset(years=3), "5年": pd.DateOffset(years=5),
+    "10年": pd.DateOffset(years=10)
+}
+PERIODS = [*PERIOD_DAYS, *PERIOD_OFFSETS, "全期間"]   # 画面の選択肢
+PRICE_TTL = 300
+DOWNLOAD_THREADS = 8
+LIVE_POLL_SECONDS = int(setting("LIVE_POLL_SECONDS", 30))   # ライブ表示の更新間隔
+
+# --- チャート描画 (間引き) ---
+# 画面幅 (約1200px) で見分けられる点数までサーバー側で間引いてから描画する
+CANDLE_MAX_POINTS = 400    # ローソク足 1本 ≒ 3px
+LINE_MAX_POINTS = 1500
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: 折れ線の形を保ったまま n_out 点に間引いたインデックスを返す"""
+    n = len(y)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    xs, ys = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # 各バケットの重心 (最後のバケットの次は終点)
+    cnt = np.diff(np.append(edges, n - 1))
+    cx = np.append(np.add.reduceat(xs[:n-1], edges[:-1]) / cnt[:-1], xs[-1])
+    cy = np.append(np.add.reduceat(ys[:n-1], edges[:-1]) / cnt[:-1], ys[-1])
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((xs[a] - cx[i + 1]) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (cy[i + 1] - ys[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def downsample_line(s, n_out=LINE_MAX_POINTS):
+    s = s.dropna()
+    if len(s) <= n_out: return s
+    return s.iloc[lttb(s.index.asi8, s.to_numpy(), n_out)]
+
+def downsample_ohlc(df, n_out=CANDLE_MAX_POINTS):
+    """連続する足 (n/n_out 本ずつ、端数はバケットごとに1本差) を1本に集約 (始値=最初, 高値=最大, 安値=最小, 終値・指標=最後)"""
+    n = len(df)
+    if n <= n_out: return df
+    starts = np.unique(np.linspace(0, n, n_out + 1).astype(int)[:-1])
+    ends = np.append(starts[1:], n) - 1
+    out = df.iloc[ends].copy()
+    out.index = df.index[starts]
+    out['Open'] = df['Open'].to_numpy()[starts]
+    out['High'] = np.fmax.reduceat(df['High'].to_numpy(dtype=float), starts)
+    out['Low'] = np.fmin.reduceat(df['Low'].to_numpy(dtype=float), starts)
+    if 'Volume' in df.columns: out['Volume'] = np.add.reduceat(df['Volume'].to_numpy(dtype=float), starts)
+    return out
+
+# --- ローカル OHLCV ストア (SQLite) ---
+DATA_DIR = os.environ.get("DASHBOARD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
+OHLCV_DB = os.path.join(DATA_DIR, "ohlcv.sqlite")
+# 初回取得の範囲 (以降は最終バー以降のみ追加取得)
+BASE_PERIOD = {"15m": "5d", "60m": "1mo", "1d": "max"}
+# 日中足はYahooの取得上限があるため、これ以上空いたら取り直す
+INTRADAY_GAP_DAYS = 30
+# 日中足は表示する最長の期間 (15分足=1日・60分足=1週間) を休場日込みで覆う日数だけ読み、それより古いバーは保存時に消す
+INTRADAY_KEEP_DAYS = {"15m": 7, "60m": 31}
+OHLCV_COLS = ["Open", "High", "Low", "Close", "Volume"]
+
+def _ohlcv_db():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    con = sqlite3.connect(OHLCV_DB, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""CREATE TABLE IF NOT EXISTS ohlcv (
+        ticker TEXT, interval TEXT, ts INTEGER,
+        open REAL, high REAL, low REAL, close REAL, volume REAL,
+        PRIMARY KEY (ticker, interval, ts))""")
+    con.execute("""CREATE TABLE IF NOT EXISTS ohlcv_meta (
+        ticker TEXT, interval TEXT, tz TEXT, last_ts INTEGER, updated_at REAL,
+        PRIMARY KEY (ticker, interval))""")
+    con.execute("""CREATE TABLE IF NOT EXISTS indicators (
+        ticker TEXT, period TEXT, updated_at REAL, data BLOB,
+        PRIMARY KEY (ticker, period))""")
+    return con
+
+@timed("store.read")
+def store_read(ticker, interval):
+    """保存済み履歴を返す: (df, meta) / 未保存なら (空df, None)。日中足は最終バーから INTRADAY_KEEP_DAYS 日分だけ"""
+    with _ohlcv_db() as con:
+        row = con.execute("SELECT tz, last_ts, updated_at FROM ohlcv_meta WHERE ticker=? AND interval=?",
+                          (ticker, interval)).fetchone()
+        if row is None: return pd.DataFrame(columns=OHLCV_COLS), None
+        tz, last_ts, updated_at = row
+        keep = INTRADAY_KEEP_DAYS.get(interval)
+        window = " AND ts >= ?" if keep and last_ts is not None else ""
+        df = pd.read_sql_query(f"SELECT ts, open, high, low, close, volume FROM ohlcv WHERE ticker=? AND interval=?{window} ORDER BY ts",
+                               con, params=(ticker, interval, *([last_ts - keep * 86400] if window else [])))
+    idx = pd.to_datetime(df.pop("ts"), unit="s", utc=True)
+    idx = idx.dt.tz_convert(tz) if tz else idx.dt.tz_localize(None)
+    df.index = pd.DatetimeIndex(idx, name="Date")
+    df.columns = OHLCV_COLS
+    df.attrs["as_of"] = updated_at   # 最後に上流から取得した時刻
+    return df, {"tz": tz, "last_ts": last_ts, "updated_at": updated_at}
+
+def store_meta(tickers, interval):
+    """保存済み銘柄の {ticker: meta} (履歴本体は読まない)"""
+    if not tickers: return {}
+    with _ohlcv_db() as con:
+        rows = con.execute(f"SELECT ticker, tz, last_ts, updated_at FROM ohlcv_meta WHERE interval=? AND ticker IN ({','.join('?' * len(tickers))})",
+                           [interval, *tickers]).fetchall()
+    return {tk: {"tz": tz, "last_ts": last_ts, "updated_at": updated_at} for tk, tz, last_ts, updated_at in rows}
+
+@timed("store.read")
+def store_tails(tickers, interval, seconds, cols=OHLCV_COLS):
+    """
+    各銘柄の最終バーから seconds 秒前までを、最終バーを最終行にそろえた (T × N) 配列で返す (足りない先頭は NaN)。
+    戻り値: (保存済みの銘柄リスト, {"ts", *cols: 配列})
+    """
+    if not tickers: return [], {}
+    with _ohlcv_db() as con:
+        df = pd.read_sql_query(f"""SELECT o.ticker, o.ts, {', '.join('o.' + c.lower() for c in cols)}
+            FROM ohlcv_meta m JOIN ohlcv o ON o.ticker=m.ticker AND o.interval=m.interval AND o.ts >= m.last_ts - ?
+            WHERE m.interval=? AND m.ticker IN ({','.join('?' * len(tickers))}) ORDER BY o.ticker, o.ts""",
+            con, params=[int(seconds), interval, *tickers])
+    if df.empty: return [], {}
+    codes, names = pd.factorize(df.pop("ticker"))
+    counts = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rows = counts.max() - counts[codes] + np.arange(len(codes)) - starts[codes]
+    out = {}
+    for col, name in zip(df.columns, ["ts", *cols]):
+        out[name] = np.full((counts.max(), len(names)), np.nan)
+        out[name][rows, codes] = df[col].to_numpy(dtype=float)
+    return list(names), out
+
+def _epoch_seconds(index):
+    epoch = pd.Timestamp(0, tz="UTC") if index.tz is not None else pd.Timestamp(0)
+    return (index - epoch) // pd.Timedelta(seconds=1)
+
+# 重なったバーの保存値との許容差 (これを超えたら分割・配当で過去の調整値が変わったとみなす)
+ADJUST_RTOL = 1e-4
+
+def store_overlap_matches(ticker, interval, df):
+    """
+    追加取得した df のうち保存済みのバーと重なる部分が保存値と一致するか。
+    調整済み価格は分割・配当のたびに過去分が変わるため、一致しなければ保存済み履歴は使えない。
+    未確定の最終バーは終値が動くので始値だけを比べる。
+    """
+    df = df.dropna(subset=["Close"])
+    if df.empty: return True
+    ts = _epoch_seconds(df.index)
+    with _ohlcv_db() as con:
+        last = con.execute("SELECT last_ts FROM ohlcv_meta WHERE ticker=? AND interval=?", (ticker, interval)).fetchone()
+        rows = con.execute("SELECT ts, open, close FROM ohlcv WHERE ticker=? AND interval=? AND ts BETWEEN ? AND ?",
+                           (ticker, interval, int(ts.min()), int(ts.max()))).fetchall()
+    if last is None or not rows: return True
+    got = dict(zip(ts, zip(df["Open"].to_numpy(dtype=float), df["Close"].to_numpy(dtype=float))))
+    for t, o, c in rows:
+        if t not in got: continue
+        o2, c2 = got[t]
+        if not np.isclose(o2, o, rtol=ADJUST_RTOL): return False
+        if t < last[0] and not np.isclose(c2, c, rtol=ADJUST_RTOL): return False
+    return True
+
+@timed("store.write")
+def store_write(ticker, interval, df, replace=False):
+    """新しいバーを追記 (同時刻は上書き) し、最終バー時刻を更新する。replace=True なら保存済みの履歴を置き換える"""
+    df = df[OHLCV_COLS].dropna(subset=["Close"])
+    if df.empty: return
+    tz = str(df.index.tz) if df.index.tz is not None else None
+    ts = _epoch_seconds(df.index)
+    rows = [(ticker, interval, int(t), *map(float, v)) for t, v in zip(ts, df.to_numpy())]
+    with _ohlcv_db() as con:
+        if replace: con.execute("DELETE FROM ohlcv WHERE ticker=? AND interval=?", (ticker, interval))
+        con.executemany("INSERT OR REPLACE INTO ohlcv VALUES (?,?,?,?,?,?,?,?)", rows)
+        con.execute("""INSERT OR REPLACE INTO ohlcv_meta VALUES (?, ?, ?,
+            (SELECT MAX(ts) FROM ohlcv WHERE ticker=? AND interval=?), ?)""",
+            (ticker, interval, tz, ticker, interval, time.time()))
+        keep = INTRADAY_KEEP_DAYS.get(interval)
+        if keep:
+            con.execute("""DELETE FROM ohlcv WHERE ticker=? AND interval=?
+                AND ts < (SELECT last_ts FROM ohlcv_meta WHERE ticker=? AND interval=?) - ?""",
+                (ticker, interval, ticker, interval, keep * 86400))
+
+# 指標スナップショット: 期間で切り出した履歴に指標を付けたものと延長用の state (一括更新で保存し、画面は読むだけ)
+@timed("store.snapshot")
+def snapshot_write(period_key, snaps):
+    """{ticker: (指標付き df, state)} を保存する"""
+    rows = [(tk, period_key, time.time(), pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)) for tk, v in snaps.items()]
+    with _ohlcv_db() as con:
+        con.executemany("INSERT OR REPLACE INTO indicators VALUES (?,?,?,?)", rows)
+
+@timed("store.snapshot")
+def snapshot_read(tickers, period_key):
+    """保存済みの {ticker: (指標付き df, state)}"""
+    if not tickers: return {}
+    with _ohlcv_db() as con:
+        rows = con.execute(f"SELECT ticker, data FROM indicators WHERE period=? AND ticker IN ({','.join('?' * len(tickers))})",
+                           [period_key, *tickers]).fetchall()
+    out = {}
+    for tk, data in rows:
+        try: out[tk] = pickle.loads(data)
+        except: pass
+    return out
+
+def snapshot_matches(snap, df):
+    """スナップショットが今の履歴 (期間で切り出したもの) と同じバー・同じ値から計算されたものか"""
+    return (len(snap) == len(df) and snap.index.equals(df.index)
+            and np.array_equal(snap[OHLCV_COLS].to_numpy(dtype=float), df[OHLCV_COLS].to_numpy(dtype=float), equal_nan=True))
+
+def slice_period(df, period_key):
+    if df.empty: return df
+    if period_key in PERIOD_DAYS:
+        days = df.index.normalize()
+        return df[days >= days.unique()[-PERIOD_DAYS[period_key]:][0]]
+    off = PERIOD_OFFSETS.get(period_key)
+    if off is None: return df
+    return df[df.index > df.index[-1] - off]
+
+# --- yfinance 呼び出しの制御 (同一リクエストの合流・レート制限) ---
+YF_RATE = float(setting("YF_RATE", 2.0))   # 1秒あたりのリクエスト数 (銘柄数換算)
+YF_BURST = int(setting("YF_BURST", 20))
+YF_RETRIES = 3
+YF_WAIT = 60   # 他のスレッドの取得完了を待つ上限 (秒)
+
+class TokenBucket:
+    """プロセス共通のトークンバケット。取得失敗時は pause() で全体を一時停止 (バックオフ)"""
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.stamp, self.until = float(burst), time.monotonic(), 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, n=1):
+        n = min(n, self.burst)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                wait = max(self.until - now, (n - self.tokens) / self.rate)
+                if wait <= 0:
+                    self.tokens -= n
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock: self.until = max(self.until, time.monotonic() + seconds)
+
+@resource
+def _yf_bucket():
+    return TokenBucket(YF_RATE, YF_BURST)
+
+CB_THRESHOLD = 3        # 連続失敗でオープン
+CB_COOLDOWN = 30        # オープン後、再試行 (ハーフオープン) までの秒数
+CB_MAX_COOLDOWN = 600   # 失敗が続くと倍々で延ばす上限
+
+class CircuitBreaker:
+    """
+    上流が失敗し続けている間は呼び出しを止める。
+    クールダウン後に1本だけ試し (ハーフオープン)、成功すれば復帰、失敗すれば待ち時間を延ばす。
+    """
+    def __init__(self):
+        self.failures, self.open_until, self.cooldown, self.probing = 0, 0.0, CB_COOLDOWN, False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < CB_THRESHOLD: return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+    def allow(self):
+        with self.lock:
+            if self.failures < CB_THRESHOLD: return True
+            if time.monotonic() < self.open_until or self.probing: return False
+            self.probing = True
+            return True
+
+    def record(self, ok):
+        # ok=None は成否不明 (新規銘柄が空だった等): 状態は変えない
+        with self.lock:
+            self.probing = False
+            if ok is None: return
+            if ok:
+                self.failures, self.cooldown = 0, CB_COOLDOWN
+                return
+            self.failures += 1
+            if self.failures >= CB_THRESHOLD:
+                self.open_until = time.monotonic() + self.cooldown
+                self.cooldown = min(self.cooldown * 2, CB_MAX_COOLDOWN)
+
+@resource
+def _yf_breaker():
+    return CircuitBreaker()
+
+def market_data_state():
+    """市場データ取得のサーキットブレーカーの状態 ("closed" / "open" / "half-open")"""
+    return _yf_breaker().state
+
+@resource
+def _inflight():
+    # 取得中の (ticker, interval) -> 完了通知
+    return {"lock": threading.Lock(), "events": {}}
+
+def download_prices(tickers, expect_data=False, **kwargs):
+    """
+    yf.download 1回 (スレッド並列) で複数銘柄を取得し {ticker: df} を返す。
+    レート制限を守り、expect_data (既存銘柄の更新) で全滅した場合はバックオフして再試行。
+    サーキットブレーカーがオープンの間は上流を呼ばずに空を返す。
+    """
+    bucket, breaker = _yf_bucket(), _yf_breaker()
+    raw = pd.DataFrame()
+    for attempt in range(YF_RETRIES):
+        if not breaker.allow(): break
+        bucket.acquire(len(tickers))
+        try:
+            with perf_span("yf.download"):
+                raw = yf.download(tickers, group_by="ticker", auto_adjust=True, progress=False,
+                                  threads=min(len(tickers), DOWNLOAD_THREADS), **kwargs)
+            breaker.record(True if not raw.empty else (False if expect_data else None))
+        except:
+            raw = pd.DataFrame()
+            breaker.record(False)
+        if not raw.empty or not expect_data: break
+        bucket.pause(2 ** attempt)
+    got = set(raw.columns.get_level_values(0)) if not raw.empty else set()
+    out = {}
+    for tk in tickers:
+        if tk not in got: continue
+        df = raw[tk].dropna(how="all")
+        if not df.empty: out[tk] = df
+    return out
+
+def refresh_store(tickers, interval, max_age=PRICE_TTL, stale_ok=False, read=True):
+    """
+    保存済み履歴を読み、TTL切れの銘柄は最終バー以降だけを追加取得して保存する。
+    未保存の銘柄は BASE_PERIOD 分をまとめて取得。{ticker: 全履歴df} を返す。
+    同じ銘柄を別のセッション・スレッドが取得中なら、新たに取得せずその完了を待つ。
+    stale_ok=True なら保存済みの銘柄は古くてもそのまま返す (未保存の銘柄だけ取得)。
+    read=False なら保存の更新だけを行い、履歴は読まない (空の dict を返す)。
+    """
+    now = time.time()
+    hist, new, stale = {}, [], []
+    metas = store_meta(tickers, interval)
+    for tk in tickers:
+        meta = metas.get(tk)
+        if meta is None:
+            new.append(tk)
+            continue
+        if read:
+            df = store_read(tk, interval)[0]
+            if df.empty:
+                new.append(tk)
+                continue
+            hist[tk] = df
+        if now - meta["updated_at"] < max_age or stale_ok: continue
+        if interval != "1d" and now - meta["last_ts"] > INTRADAY_GAP_DAYS * 86400: new.append(tk)
+        else: stale.append((tk, meta["last_ts"]))
+
+    fl = _inflight()
+    mine, waiting = set(), []
+    with fl["lock"]:
+        for tk in new + [tk for tk, _ in stale]:
+            ev = fl["events"].get((tk, interval))
+            if ev is None:
+                fl["events"][(tk, interval)] = threading.Event()
+                mine.add(tk)
+            else:
+                waiting.append((tk, ev))
+    new = [tk for tk in new if tk in mine]
+    stale = [(tk, ts) for tk, ts in stale if tk in mine]
+    # 読み込みから取得権の確保までの間に他スレッドが更新を終えていれば取得しない
+    metas = store_meta(list(mine), interval)
+    for tk in list(mine):
+        meta = metas.get(tk)
+        if meta is not None and time.time() - meta["updated_at"] < max(max_age, 1):
+            if read: hist[tk] = store_read(tk, interval)[0]
+            new = [t for t in new if t != tk]
+            stale = [(t, ts) for t, ts in stale if t != tk]
+
+    try:
+        batches = []
+        if new: batches.append((new, {"period": BASE_PERIOD[interval]}))
+        if stale:
+            # 日足は最終バーの前日から、日中足は最終バーの時刻から取り直す (未確定の最終バーも上書きされる)
+            last = min(ts for _, ts in stale)
+            start = (datetime.fromtimestamp(last, timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d") if interval == "1d" else last
+            batches.append(([tk for tk, _ in stale], {"start": start, "expect_data": True}))
+        for group, kw in batches:
+            got = download_prices(group, interval=interval, **kw)
+            # 重なったバーが保存値と違う銘柄 (分割・配当で調整値が変わった) は全期間を取り直して置き換える。
+            # 取り直せなければ継ぎ目ができるので追記もしない (古いまま次の更新で再試行)
+            reload = [tk for tk, df in got.items() if "start" in kw and not store_overlap_matches(tk, interval, df)]
+            for tk in reload: got.pop(tk)
+            full = download_prices(reload, interval=interval, period=BASE_PERIOD[interval], expect_data=True) if reload else {}
+            for tk, df in [*got.items(), *full.items()]:
+                try:
+                    store_write(tk, interval, df, replace=tk in full)
+                    if read: hist[tk] = store_read(tk, interval)[0]
+                except: pass
+    finally:
+        with fl["lock"]:
+            for tk in mine: fl["events"].pop((tk, interval)).set()
+
+    for tk, ev in waiting:
+        ev.wait(YF_WAIT)
+        if not read: continue
+        df, meta = store_read(tk, interval)
+        if meta is not None and not df.empty: hist[tk] = df
+    return hist
+
+STORE_BATCH = 100   # まとめて更新するときの1回の取得銘柄数 (レート制限は1回あたり YF_BURST までしか数えない)
+
+def refresh_daily(tickers, max_age=PRICE_TTL, stale_ok=False, progress=None):
+    """多数の銘柄の日足を STORE_BATCH ずつ更新して保存する (履歴は読まない)。progress(割合) で進み具合を受け取れる"""
+    batches = [tickers[i:i+STORE_BATCH] for i in range(0, len(tickers), STORE_BATCH)]
+    for i, batch in enumerate(batches):
+        try: refresh_store(batch, "1d", max_age, stale_ok, read=False)
+        except: pass
+        if progress: progress((i + 1) / len(batches))
+
+@resource
+def _price_cache():
+    # 銘柄ごとの価格キャッシュ (プロセス共有): {(ticker, period_key): (取得時刻, df, 指標state)}
+    return {}
+
+@resource
+def _revalidator():
+    return {"pool": ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate"),
+            "pending": set(), "lock": threading.Lock()}
+
+def schedule_revalidate(tickers, period_key):
+    """古いデータを返した銘柄をバックグラウンドで更新 (同じ銘柄・期間の重複投入はしない)"""
+    r = _revalidator()
+    with r["lock"]:
+        todo = [tk for tk in tickers if (tk, period_key) not in r["pending"]]
+        r["pending"].update((tk, period_key) for tk in todo)
+    if not todo: return
+    def job():
+        try: get_prices(todo, period_key)
+        finally:
+            with r["lock"]: r["pending"].difference_update((tk, period_key) for tk in todo)
+    r["pool"].submit(job)
+
+@timed("get_prices")
+def get_prices(tickers, period_key, max_age=PRICE_TTL, stale_ok=False):
+    """
+    複数銘柄の株価をまとめて取得する。
+    キャッシュに無い銘柄だけをローカルストアから読み (必要なら差分のみ取得)、
+    期間で切り出して銘柄ごとのキャッシュに格納し、{ticker: df} を返す。max_age=0 で強制更新。
+    stale_ok=True (画面用) は期限切れでも手元のデータを即座に返し、更新はバックグラウンドで行う。
+    df.attrs["as_of"] が上流から取得した時刻。
+    """
+    cache = _price_cache()
+    now = time.time()
+    out, missing, stale = {}, [], []
+    for tk in dict.fromkeys(t for t in tickers if t):
+        hit = cache.get((tk, period_key))
+        if hit and now - hit[0] < max_age: out[tk] = hit[1]
+        elif hit and stale_ok:
+            out[tk] = hit[1]
+            stale.append(tk)
+        else: missing.append(tk)
+    cache_event("price", "hit", len(out) - len(stale))
+    cache_event("price", "stale", len(stale))
+    cache_event("price", "miss", len(missing))
+
+    if missing:
+        # キャッシュに無い銘柄は、一括更新で保存した指標があれば (履歴が同じなら) 計算せずに使う
+        snaps = snapshot_read([tk for tk in missing if (tk, period_key) not in cache], period_key)
+        for tk, full in refresh_store(missing, I_MAP.get(period_key, "1d"), max_age, stale_ok).items():
+            df = slice_period(full, period_key)
+            if df.empty: continue
+            prev = cache.get((tk, period_key))
+            snap = snaps.get(tk)
+            if prev and prev[1].index[-1] in df.index and prev[1].index[-1] >= df.index[0]:
+                # 前回の最終バー (未確定) 以降だけ指標を延長する
+                with perf_span("technicals"):
+                    new, ckpt = technicals_with_checkpoint(df[df.index >= prev[1].index[-1]], prev[2])
+                df = pd.concat([prev[1].iloc[:-1], new]).loc[df.index[0]:]
+            elif snap is not None and snapshot_matches(snap[0], df):
+                df, ckpt = snap
+                cache_event("snapshot", "hit")
+            else:
+                if prev is None: cache_event("snapshot", "miss")
+                with perf_span("technicals"): df, ckpt = technicals_with_checkpoint(df)
+            as_of = full.attrs.get("as_of") or now
+            df.attrs["as_of"] = as_of
+            cache[(tk, period_key)] = (as_of, df, ckpt)
+            out[tk] = df
+            if now - as_of >= max_age: stale.append(tk)
+
+    if stale and stale_ok: schedule_revalidate(stale, period_key)
+    return out
+
+PROGRESSIVE_BATCH = 25     # 画面用の逐次取得で1回に取得する銘柄数の上限
+PROGRESSIVE_WORKERS = 4
+PRICE_DEADLINE = 20        # 逐次取得でこの秒数を過ぎても届かない銘柄は「遅延」として先に進む
+
+@resource
+def _progressive_pool():
+    return ThreadPoolExecutor(max_workers=PROGRESSIVE_WORKERS, thread_name_prefix="prices")
+
+def iter_prices(tickers, period_key, deadline=PRICE_DEADLINE):
+    """
+    画面用 (stale_ok) の get_prices を、届いた銘柄から順に (ticker, df, 状態) で返すジェネレータ。
+    状態は "ok" / "error" (取得できず、df=None) / "timeout" (締め切りまでに届かず、df=None)。
+    上流の応答待ちに入る前に一度だけ (None, None, "waiting") を返す (手元の分を描くきっかけ)。
+    上流から取得する銘柄は少数ずつのバッチで先に並列に投げ、キャッシュ・ローカル保存にある銘柄を
+    その間に返す。締め切りに間に合わなかったバッチは裏で取得を続け、届けばキャッシュに入る (次の実行で表示)。
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    cache = _price_cache()
+    local = [tk for tk in tickers if (tk, period_key) in cache]
+    metas = store_meta([tk for tk in tickers if tk not in local], I_MAP.get(period_key, "1d"))
+    local += [tk for tk in tickers if tk in metas and tk not in local]
+    remote = [tk for tk in tickers if tk not in local]
+    size = max(1, min(PROGRESSIVE_BATCH, -(-len(remote) // PROGRESSIVE_WORKERS)))
+    pool = _progressive_pool()
+    futures = {pool.submit(perf_bind(get_prices), batch, period_key, stale_ok=True): batch
+               for batch in (remote[i:i+size] for i in range(0, len(remote), size))}
+    end = time.monotonic() + deadline
+
+    for batch in (local[i:i+PROGRESSIVE_BATCH] for i in range(0, len(local), PROGRESSIVE_BATCH)):
+        got = get_prices(batch, period_key, stale_ok=True)
+        for tk in batch: yield (tk, got[tk], "ok") if tk in got else (tk, None, "error")
+    if not futures: return
+    yield None, None, "waiting"
+    done = set()
+    try:
+        for f in as_completed(futures, timeout=max(0.0, end - time.monotonic())):
+            done.add(f)
+            try: got = f.result()
+            except: got = {}
+            for tk in futures[f]: yield (tk, got[tk], "ok") if tk in got else (tk, None, "error")
+    except FutureTimeout:
+        for f, batch in futures.items():
+            if f in done: continue
+            for tk in batch: yield tk, None, "timeout"
+
+def data_age(df):
+    """データ取得からの経過秒数"""
+    return time.time() - df.attrs.get("as_of", time.time())
+
+def get_stock_data(ticker, period_key):
+    """株価 + テクニカルのみ (財務・銘柄情報は fetch_fundamentals / fetch_ticker_info。画面では st.cache_data で包んで使う)"""
+    if not ticker: return None
+    return get_prices([ticker], period_key, stale_ok=True).get(ticker)
+
+def current_report_period():
+    # 決算期 (四半期) ごとに財務キャッシュのキーを切り替える
+    now = datetime.now()
+    return f"{now.year}Q{(now.month - 1) // 3 + 1}"
+
+def fetch_fundamentals(ticker):
+    """財務諸表 (失敗時は例外)"""
+    with perf_span("fundamentals"):
+        _yf_bucket().acquire()
+        return yf.Ticker(ticker).financials
+
+def fetch_ticker_info(ticker):
+    with perf_span("info"):
+        _yf_bucket().acquire()
+        return yf.Ticker(ticker).info
+
+# --- 相関エンジン ---
+CORR_MIN_COVERAGE = 0.5   # この割合以上の銘柄が取引した日を共通カレンダーとする
+CORR_MIN_PERIODS = 20
+
+def align_log_returns(closes, intraday=False):
+    """
+    {ticker: 終値Series} を共通カレンダー上の対数リターン (日付×銘柄) に揃える。
+    東証・24時間の暗号資産・為替などの休日差は、半数以上の銘柄が取引した日だけを残し、
+    欠けた日を直前の価格で埋めることで吸収する (週末の暗号資産の値動きは月曜に集約)。
+    """
+    cols = {}
+    for tk, s in closes.items():
+        s = s[s > 0].dropna()
+        if s.empty: continue
+        if intraday:
+            idx = s.index.tz_convert("UTC").tz_localize(None) if s.index.tz is not None else s.index
+        else:
+            idx = s.index.tz_localize(None) if s.index.tz is not None else s.index
+            idx = pd.DatetimeIndex(idx.to_numpy().astype("datetime64[D]"))
+        s = pd.Series(s.to_numpy(), index=idx)
+        cols[tk] = s[~idx.duplicated(keep="last")] if idx.has_duplicates else s
+    if len(cols) < 2: return pd.DataFrame()
+    wide = pd.DataFrame(cols).sort_index()
+    wide = wide[wide.notna().mean(axis=1) >= CORR_MIN_COVERAGE]
+    return np.log(wide).ffill().diff().iloc[1:]
+
+def corr_matrix(ret, min_periods=CORR_MIN_PERIODS):
+    """欠損 (上場前など) を銘柄ペアごとに除いた相関行列を行列積だけで計算する"""
+    x = ret.to_numpy(dtype=float)
+    m = np.isfinite(x).astype(float)
+    x0 = np.where(m > 0, x, 0.0)
+    n = m.T @ m
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mi = (x0.T @ m) / n                    # 銘柄 j も有効な行での i の平均
+        vi = ((x0 * x0).T @ m) / n - mi * mi
+        cov = (x0.T @ x0) / n - mi * mi.T
+        c = cov / np.sqrt(vi * vi.T)
+    c[n < min_periods] = np.nan
+    return pd.DataFrame(np.clip(c, -1, 1), index=ret.columns, columns=ret.columns)
+
+def cluster_order(corr):
+    """似た銘柄が隣り合う並び順 (類似度グラフのフィードラーベクトルで並べ替え)"""
+    c = np.nan_to_num(np.asarray(corr, dtype=float))
+    if len(c) < 3: return np.arange(len(c))
+    w = (1 + c) / 2
+    _, vecs = np.linalg.eigh(np.diag(w.sum(axis=1)) - w)
+    return np.argsort(vecs[:, 1], kind="stable")
+
+def rolling_corr(ret, base, window):
+    """基準銘柄と各銘柄のローリング相関 (日付×銘柄)"""
+    x = ret[base].to_numpy(dtype=float)[:, None]
+    y = ret.drop(columns=base).to_numpy(dtype=float)
+    both = np.isfinite(x) & np.isfinite(y)
+    x, y = np.where(both, x, np.nan), np.where(both, y, np.nan)
+    sx, sy = _rolling_sum(_prefix(x), window), _rolling_sum(_prefix(y), window)
+    sxx, syy = _rolling_sum(_prefix(x * x), window), _rolling_sum(_prefix(y * y), window)
+    sxy = _rolling_sum(_prefix(x * y), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c = (window * sxy - sx * sy) / np.sqrt((window * sxx - sx * sx) * (window * syy - sy * sy))
+    return pd.DataFrame(np.clip(c, -1, 1), index=ret.index, columns=ret.columns.drop(base))
+
+@resource
+def _corr_cache():
+    # {(期間, 各銘柄のデータ範囲): (リターン, クラスタ順の相関行列)}
+    return {}
+
+@timed("correlation")
+def correlation_analysis(tickers, period_key, prices=None):
+    """
+    対数リターンと (クラスタ順に並べた) 相関行列を返す。データの日付範囲が同じならキャッシュを使う。
+    prices ({ticker: df}、iter_prices で集めたもの等) を渡すと取得せずにそれで計算する。
+    """
+    if prices is None: prices = get_prices(tickers, period_key, stale_ok=True)
+    # 未確定の最終バーは時刻が同じまま値だけ変わるので、最終バーの終値も含める
+    key = (period_key, tuple(sorted((tk, df.index[0], df.index[-1], df['Close'].iloc[-1]) for tk, df in prices.items())))
+    cache = _corr_cache()
+    cache_event("correlation", "hit" if key in cache else "miss")
+    if key in cache: return cache[key]
+
+    ret = align_log_returns({tk: df['Close'] for tk, df in prices.items()}, intraday=period_key in I_MAP)
+    if ret.shape[1] < 2: return None, None
+    corr = corr_matrix(ret)
+    order = cluster_order(corr)
+    corr = corr.iloc[order, order]
+    if len(cache) >= 32: cache.pop(next(iter(cache)))
+    cache[key] = (ret, corr)
+    return ret, corr
+
+# --- スクリーナー (銘柄マスター全体) ---
+# 日足の保存済み履歴から、各銘柄の末尾だけを (T × 銘柄) の配列に読み込み、指標エンジンで一括計算する。
+SCREEN_PERIODS = {"1週間": pd.DateOffset(weeks=1), **{k: PERIOD_OFFSETS[k] for k in ["1ヶ月", "3ヶ月", "6ヶ月", "1年"]}}
+SCREEN_WARMUP_DAYS = 120   # SMA50・RSI のために騰落率の期間より前に読む日数 (暦日)
+
+@resource
+def _screen_cache():
+    # {(tickers, period_key): (計算時刻, df)}
+    return {}
+
+def screen_metrics(names, data, offset, tzs=None):
+    """store_tails の配列から銘柄ごとの指標 (終値・騰落率・ボラティリティ・RSI・SMA50乖離) を計算する。tzs は {ticker: 取引所のタイムゾーン}"""
+    ts, close = data["ts"], data["Close"]
+    ind, _ = compute_indicators(close)
+    last = close[-1]
+    # 期間の起点 = 最終バーから offset 前の時点以前で最後のバー (履歴が足りなければ NaN)
+    start = (pd.to_datetime(ts[-1], unit="s") - offset).as_unit("s").asi8
+    with np.errstate(invalid="ignore"):
+        n_before = (ts <= start).sum(axis=0)
+        base = np.where(n_before > 0, close[np.maximum(np.isnan(ts).sum(axis=0) + n_before - 1, 0), np.arange(len(names))], np.nan)
+        logret = np.full(close.shape, np.nan)
+        logret[1:] = np.log(close[1:] / close[:-1])
+        window = np.where(ts > start, logret, np.nan)
+        vol = np.nanstd(window, axis=0, ddof=1) * np.sqrt(252) if len(window) > 1 else np.full(len(names), np.nan)
+        return pd.DataFrame({
+            "Ticker": names,
+            "終値": last,
+            "騰落率": (last / base - 1) * 100,
+            "ボラティリティ": vol * 100,
+            "RSI": ind["RSI"][-1],
+            "SMA50乖離": (last / ind["SMA50"][-1] - 1) * 100,
+            "最終日": [pd.Timestamp(t, unit="s", tz="UTC").tz_convert((tzs or {}).get(tk) or "UTC").date() for tk, t in zip(names, ts[-1])],
+        })
+
+def schedule_screen_refresh(tickers):
+    """期限切れの銘柄の保存済み日足をバックグラウンドで更新し、終わったら計算結果のキャッシュを捨てる"""
+    r = _revalidator()
+    with r["lock"]:
+        todo = [tk for tk in tickers if (tk, "screen") not in r["pending"]]
+        r["pending"].update((tk, "screen") for tk in todo)
+    if not todo: return
+    def job():
+        try: refresh_daily(todo)
+        finally:
+            _screen_cache().clear()
+            with r["lock"]: r["pending"].difference_update((tk, "screen") for tk in todo)
+    r["pool"].submit(job)
+
+@timed("screen")
+def screen_universe(tickers, period_key, max_age=PRICE_TTL, progress=None):
+    """
+    tickers 全体の指標表を返す (保存済みの全履歴は読まない)。計算結果は max_age の間キャッシュする。
+    未保存の銘柄はその場で STORE_BATCH ずつ取得し、期限切れの銘柄は手元の日足で計算して更新は
+    バックグラウンドで行う (レート制限があるため、全銘柄の更新を待つと数分かかる)。
+    max_age=0 なら全銘柄をその場で更新する。progress(割合) で取得の進み具合を受け取れる。
+    """
+    key = (tuple(tickers), period_key)
+    hit = _screen_cache().get(key)
+    if hit and time.time() - hit[0] < max_age:
+        cache_event("screen", "hit")
+        return hit[1]
+    cache_event("screen", "miss")
+
+    metas, now = store_meta(tickers, "1d"), time.time()
+    if max_age == 0:
+        refresh_daily(tickers, 0, progress=progress)
+    else:
+        refresh_daily([tk for tk in tickers if tk not in metas], max_age, progress=progress)
+        schedule_screen_refresh([tk for tk, m in metas.items() if now - m["updated_at"] >= max_age])
+    offset = SCREEN_PERIODS[period_key]
+    span = (pd.Timestamp(0) + offset).timestamp() + SCREEN_WARMUP_DAYS * 86400
+    names, data = store_tails(tickers, "1d", span, ["Close"])
+    if not names: return pd.DataFrame()
+    tzs = {tk: m["tz"] for tk, m in store_meta(names, "1d").items()}
+    with perf_span("screen.metrics"): df = screen_metrics(names, data, offset, tzs)
+    df = ticker_df_master.drop_duplicates("Ticker")[["Ticker", "Name", "Category"]].merge(df, on="Ticker", how="right")
+    cache = _screen_cache()
+    if len(cache) >= 16: cache.pop(next(iter(cache)))
+    cache[key] = (time.time(), df)
+    return df
+
+# --- バックテスト ---
+# 指標からポジション (0/1) を配列演算で作り、(バー × 銘柄) のまま成績を計算する。
+# パラメータの組ごとの計算はスレッドで並列化する (NumPy の配列演算は GIL を解放する)。
+# 同じ期間の移動平均・RSI・EMA は組の間で共有する。
+BT_YEARS = [1, 3, 5, 10]
+BT_WARMUP_DAYS = 400   # 指標のウォームアップに検証期間より前に読む日数 (暦日)
+BT_WORKERS = os.cpu_count() or 1
+BT_MAX_COMBOS = 400
+
+def _fill_positions(entry, exit_):
+    """entry で 1、exit で 0 になり、どちらでもないバーは直前の値を保つ"""
+    sig = np.where(entry, 1.0, np.where(exit_, 0.0, np.nan))
+    idx = np.where(np.isnan(sig), 0, np.arange(len(sig))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return np.nan_to_num(np.take_along_axis(sig, idx, axis=0))
+
+def _bt_sma_prep(close, grid):
+    pre = _prefix(close)
+    return {w: _rolling_sum(pre, w) / w for w in {w for p in grid for w in p}}
+
+def _bt_sma_pos(close, ind, fast, slow):
+    with np.errstate(invalid="ignore"): return (ind[fast] > ind[slow]).astype(float)
+
+def _bt_rsi_prep(close, grid):
+    return {w: _rsi(close, w) for w in {p[0] for p in grid}}
+
+def _bt_rsi_pos(close, ind, window, low, high):
+    with np.errstate(invalid="ignore"): return _fill_positions(ind[window] < low, ind[window] > high)
+
+def _bt_macd_prep(close, grid):
+    # EMA は線形なので シグナル = EMA(短期EMA) - EMA(長期EMA)。期間×シグナル期間ごとに1回だけ計算する
+    ema = {span: _ema(close, span)[0] for p in grid for span in p[:2]}
+    return {**ema, **{(span, sig): _ema(ema[span], sig)[0] for sig in {p[2] for p in grid} for span in ema}}
+
+def _bt_macd_pos(close, ind, fast, slow, signal):
+    with np.errstate(invalid="ignore"):
+        return (ind[fast] - ind[slow] > ind[(fast, signal)] - ind[(slow, signal)]).astype(float)
+
+# 戦略名: ({パラメータ名: (下限, 上限, 既定のスイープ範囲, 刻み)}, 有効な組か, 共有する指標の前計算, ポジション)
+BT_STRATEGIES = {
+    "SMA クロス": ({"短期": (2, 100, (5, 50), 5), "長期": (10, 300, (60, 240), 20)},
+                   lambda fast, slow: fast < slow, _bt_sma_prep, _bt_sma_pos),
+    "RSI 逆張り": ({"期間": (2, 50, (7, 21), 7), "買い": (5, 50, (20, 40), 5), "売り": (50, 95, (60, 80), 5)},
+                   lambda window, low, high: low < high, _bt_rsi_prep, _bt_rsi_pos),
+    "MACD": ({"短期": (2, 30, (8, 16), 2), "長期": (10, 60, (20, 35), 5), "シグナル": (3, 20, (5, 13), 2)},
+             lambda fast, slow, signal: fast < slow, _bt_macd_prep, _bt_macd_pos),
+}
+
+def backtest_grid(strategy, ranges):
+    """{パラメータ名: (最小, 最大, 刻み)} から有効な組のリストを作る"""
+    params, valid, _, _ = BT_STRATEGIES[strategy]
+    axes = [range(lo, hi + 1, max(step, 1)) for lo, hi, step in (ranges[name] for name in params)]
+    return [p for p in itertools.product(*axes) if valid(*p)]
+
+def backtest_stats(ret, pos, cost=0.0):
+    """
+    ret: (T, N) バーごとのリターン (ret[t] は t-1 → t、検証期間外は NaN)、pos: 各バー終値時点のポジション。
+    cost はポジションを1単位動かすたびに引く割合。戻り値: ({指標名: (N,)}, 戦略の累積対数リターン (T, N))
+    """
+    # 大きな配列を何度も確保しないよう、途中結果は同じ配列に上書きしていく
+    ok = np.isfinite(ret)
+    okf = ok.astype(float)
+    n = ok.sum(axis=0)
+    sr = np.zeros(pos.shape)
+    np.multiply(pos[:-1], np.where(ok, ret, 0.0)[1:], out=sr[1:])
+    trades = np.abs(np.diff(pos, axis=0, prepend=0))
+    trades *= okf
+    sr -= cost * trades
+    exposure = np.einsum("ij,ij->j", pos[:-1], okf[1:])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        years = n / 252
+        mean = sr.sum(axis=0) / n
+        sd = np.sqrt((np.einsum("ij,ij->j", sr, sr) - n * mean * mean) / (n - 1))
+        logeq = np.cumsum(np.log1p(sr, out=sr), axis=0, out=sr)
+        dd = np.maximum.accumulate(logeq, axis=0)
+        np.subtract(logeq, dd, out=dd)
+        return {
+            "CAGR": np.expm1(logeq[-1] / years),
+            "Sharpe": mean / sd * np.sqrt(252),
+            "最大DD": np.expm1(dd.min(axis=0)),
+            "売買回数": trades.sum(axis=0) / years,
+            "保有率": exposure / n,
+        }, logeq
+
+@resource
+def _backtest_cache():
+    # {(戦略, grid, 年数, コスト, 銘柄と最終バー): DataFrame} と {("inputs", 銘柄, 年数, 最終バー): 配列}
+    return {}
+
+def backtest_inputs(tickers, years, version=None):
+    """
+    保存済み日足から (銘柄, 終値 (T, N), 検証期間のリターン (T, N), 時刻 (T, N)) を作る。
+    version (銘柄ごとの最終バー) を渡すと、同じ version の間は読み込んだ配列を使い回す。
+    """
+    key = ("inputs", tuple(tickers), years, version)
+    cache = _backtest_cache()
+    if version is not None and key in cache: return cache[key]
+    names, data = store_tails(tickers, "1d", (years * 365.25 + BT_WARMUP_DAYS) * 86400, ["Close"])
+    if not names: return [], None, None, None
+    close, ts = data["Close"], data["ts"]
+    ret = np.full(close.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret[1:] = close[1:] / close[:-1] - 1
+    # 検証期間 (各銘柄の最終バーから years 年) より前は指標のウォームアップにだけ使う
+    ret[ts <= ts[-1] - years * 365.25 * 86400] = np.nan
+    if version is not None:
+        if len(cache) >= 8: cache.pop(next(iter(cache)))
+        cache[key] = names, close, ret, ts
+    return names, close, ret, ts
+
+
+@timed("backtest")
+def backtest_sweep(tickers, strategy, grid, years=10, cost_bps=5.0):
+    """
+    tickers × grid (パラメータの組のリスト) をまとめて検証する。保存済みの日足を使い、最終バーが
+    変わるまで結果をキャッシュする。戻り値: 組×銘柄ごとの成績 (超過 = 同じ期間のバイ&ホールドとの CAGR 差)
+    """
+    params, _, prep, positions = BT_STRATEGIES[strategy]
+    grid = [tuple(p) for p in grid]
+    version = tuple(sorted((tk, m["last_ts"]) for tk, m in store_meta(tickers, "1d").items()))
+    key = (strategy, tuple(grid), years, cost_bps, version)
+    cache = _backtest_cache()
+    cache_event("backtest", "hit" if key in cache else "miss")
+    if key in cache: return cache[key]
+
+    names, close, ret, _ = backtest_inputs(tickers, years, version)
+    if not names or not grid: return pd.DataFrame()
+    cost = cost_bps / 10000
+    with perf_span("backtest.indicators"): ind = prep(close, grid)
+    # 成績は検証期間の直前のバーから計算する (ウォームアップ部分は指標にだけ使う)
+    lo = max(int(np.isfinite(ret).any(axis=1).argmax()) - 1, 0)
+    ret = ret[lo:]
+    bh = backtest_stats(ret, np.ones(ret.shape))[0]["CAGR"]
+
+    def run(chunk):
+        return [(p, backtest_stats(ret, positions(close, ind, *p)[lo:], cost)[0]) for p in chunk]
+    with ThreadPoolExecutor(max_workers=BT_WORKERS, thread_name_prefix="backtest") as pool:
+        done = [r for part in pool.map(run, [grid[i::BT_WORKERS] for i in range(BT_WORKERS)]) for r in part]
+
+    n = len(names)
+    df = pd.DataFrame({
+        **{name: np.repeat([p[i] for p, _ in done], n) for i, name in enumerate(params)},
+        "Ticker": np.tile(names, len(done)),
+        **{k: np.concatenate([stats[k] for _, stats in done]) for k in done[0][1]},
+    })
+    df["超過"] = df["CAGR"] - np.tile(bh, len(done))
+    if len(cache) >= 8: cache.pop(next(iter(cache)))
+    cache[key] = df
+    return df
+
+def backtest_curve(ticker, strategy, params, years=10, cost_bps=5.0):
+    """1銘柄・1組の資産曲線 (戦略 / バイ&ホールド、開始=1) とドローダウン"""
+    _, _, prep, positions = BT_STRATEGIES[strategy]
+    names, close, ret, ts = backtest_inputs([ticker], years)
+    if not names: return pd.DataFrame()
+    logeq = backtest_stats(ret, positions(close, prep(close, [params]), *params), cost_bps / 10000)[1][:, 0]
+    bh = backtest_stats(ret, np.ones(close.shape))[1][:, 0]
+    live = np.isfinite(ret[:, 0])
+    eq = pd.DataFrame({"戦略": np.exp(logeq), "バイ&ホールド": np.exp(bh)},
+                      index=pd.to_datetime(ts[:, 0], unit="s"))[live]
+    eq["ドローダウン"] = eq["戦略"] / eq["戦略"].cummax() - 1
+    return eq
+
+# --- ポートフォリオ分析 (ウォッチリスト) ---
+# get_prices と同じ価格データの日次リターンから、共分散・VaR/CVaR・効率的フロンティア・モンテカルロを計算する。
+# モンテカルロはパスと日数をブロックに分けて生成し、メモリはブロックの大きさまでしか使わない。
+RISK_PERIODS = ["6ヶ月", "1年", "3年", "5年"]
+RISK_LEVELS = [0.95, 0.99]
+MC_PATHS = [10_000, 100_000, 250_000]
+MC_BLOCK_PATHS = 10_000        # 一度に進めるパス数
+MC_BLOCK_VALUES = 2_000_000    # 一度に生成する乱数の上限 (パス × 日数 × 銘柄)
+MC_CHECKPOINTS = 60            # 途中経過の分布を残す時点の数 (ファンチャート用)
+MC_BANDS = [5, 25, 50, 75, 95]    # 推移のグラフに描くパーセンタイル
+MC_SEED = 42
+FRONTIER_SAMPLES = 20_000
+
+@resource
+def _risk_cache():
+    # {(銘柄と最終バー, ウェイト, 期間, ...): 結果}
+    return {}
+
+def portfolio_weights(w_df):
+    """
+    ウォッチリストの weight 列から {ticker: 比率 (合計1)}。同じ銘柄の行は合算する。
+    どの行にも設定がなければ等ウェイト、いずれかに設定があれば未設定は 0。
+    """
+    if w_df.empty: return {}
+    w = pd.to_numeric(w_df["weight"], errors="coerce") if "weight" in w_df.columns else pd.Series(np.nan, index=w_df.index)
+    if w.isna().all(): w = pd.Series(1.0, index=w_df.index)
+    w = w.fillna(0).clip(lower=0).groupby(w_df["ticker"]).sum()
+    w = w[w > 0]
+    return (w / w.sum()).to_dict() if not w.empty else {}
+
+def portfolio_returns(weights, period_key):
+    """
+    (共通カレンダーの日次対数リターン (日付×銘柄), ウェイト配列, キャッシュ用の版)。価格は get_prices と同じもの。
+    版は各銘柄の最終バーの時刻と終値 (未確定の最終バーは時刻が同じまま値が変わる)
+    """
+    prices = get_prices(list(weights), period_key, stale_ok=True)
+    closes = {tk: df['Close'] for tk, df in prices.items() if tk in weights}
+    version = tuple(sorted((tk, df.index[-1], df['Close'].iloc[-1]) for tk, df in prices.items()))
+    if len(closes) >= 2: ret = align_log_returns(closes)
+    elif closes: ret = np.log(pd.DataFrame(closes)).diff().iloc[1:]
+    else: return pd.DataFrame(), np.array([]), version
+    ret = ret.dropna()
+    w = np.array([weights[tk] for tk in ret.columns])
+    return ret, w / w.sum(), version
+
+def var_cvar(r, level):
+    """損失を正の値で返す: (VaR, CVaR)。r は期間リターンの標本"""
+    q = np.quantile(r, 1 - level)
+    return -q, -r[r <= q].mean()
+
+def risk_stats(ret, w):
+    """年率リターン・ボラティリティ、1日の VaR/CVaR (ヒストリカル・正規分布)、銘柄ごとのリスク寄与"""
+    simple = np.expm1(ret.to_numpy())
+    mu, cov = simple.mean(axis=0), np.atleast_2d(np.cov(simple, rowvar=False))
+    rp = simple @ w
+    mp, sp = rp.mean(), np.sqrt(w @ cov @ w)
+    var = {}
+    for lv in RISK_LEVELS:
+        z = NormalDist().inv_cdf(1 - lv)
+        var[lv] = {"ヒストリカル": var_cvar(rp, lv),
+                   "正規分布": (-(mp + z * sp), sp * NormalDist().pdf(z) / (1 - lv) - mp)}
+    contrib = w * (cov @ w) / (sp * sp) if sp > 0 else np.zeros(len(w))
+    return {
+        "return": mp * 252, "vol": sp * np.sqrt(252), "var": var, "days": len(rp),
+        "assets": pd.DataFrame({"ウェイト": w, "年率リターン": mu * 252, "ボラティリティ": np.sqrt(np.diag(cov) * 252),
+                                "リスク寄与": contrib}, index=ret.columns),
+        "cov": pd.DataFrame(cov * 252, index=ret.columns, columns=ret.columns),
+    }
+
+def efficient_frontier(ret, samples=FRONTIER_SAMPLES, seed=MC_SEED):
+    """
+    空売りなしの効率的フロンティア。ランダムなウェイト (ディリクレ分布・各銘柄だけの端点を含む) を
+    まとめて評価し、リターンの区間ごとに最小ボラティリティの点を結ぶ。
+    戻り値: (全サンプル [年率リターン, ボラティリティ], フロンティア, 最小分散のウェイト, 最大シャープのウェイト)
+    """
+    simple = np.expm1(ret.to_numpy())
+    mu, cov = simple.mean(axis=0) * 252, np.atleast_2d(np.cov(simple, rowvar=False)) * 252
+    n = len(mu)
+    rng = np.random.default_rng(seed)
+    W = np.vstack([np.eye(n), rng.dirichlet(np.full(n, 0.5), samples)])
+    r = W @ mu
+    v = np.sqrt(((W @ cov) * W).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"): sharpe = r / v
+    bins = np.linspace(r.min(), r.max(), 60)
+    k = np.digitize(r, bins)
+    front = [(r[k == b][np.argmin(v[k == b])], v[k == b].min()) for b in np.unique(k)]
+    front = pd.DataFrame(front, columns=["リターン", "ボラティリティ"])
+    front = front[front["リターン"] >= front.loc[front["ボラティリティ"].idxmin(), "リターン"]]   # 効率的な側だけ残す
+    pts = pd.DataFrame({"リターン": r, "ボラティリティ": v, "シャープ": sharpe})
+    return pts, front, W[np.argmin(v)], W[np.nanargmax(sharpe)]
+
+@timed("montecarlo")
+def monte_carlo(ret, w, horizon, paths, method="正規分布", seed=MC_SEED):
+    """
+    ポートフォリオ (開始時のウェイトで買い持ち) の将来 horizon 日の価値を paths 本シミュレーションする。
+    日次対数リターンは 正規分布 (平均・共分散) か ヒストリカル (過去の日をまとめて復元抽出) で生成する。
+    正規分布は途中時点の間の増分 (日数分の正規分布の和も正規分布) を直接引くので、日数によらず時点の数だけで済む。
+    MC_BLOCK_PATHS 本 (銘柄が多いときはもっと少なく) ずつ、乱数が MC_BLOCK_VALUES 個を超えない範囲ずつ進める。
+    途中の計算は float32 (分布の推定には十分で、乱数の生成・行列積が速い)。
+    戻り値: (満期の価値 (paths,), 途中時点の日数, 途中時点の価値 (時点 × paths, float32))
+    """
+    x = ret.to_numpy()
+    n = x.shape[1]
+    mu, chol = x.mean(axis=0), np.linalg.cholesky(np.atleast_2d(np.cov(x, rowvar=False)) + 1e-12 * np.eye(n))
+    x, mu, chol, w32 = x.astype(np.float32), mu.astype(np.float32), chol.T.astype(np.float32), w.astype(np.float32)
+    rng = np.random.default_rng(seed)
+    marks = np.unique(np.linspace(1, horizon, min(MC_CHECKPOINTS, horizon)).round().astype(int))
+    gaps = np.diff(marks, prepend=0)
+    at = np.empty((len(marks), paths), dtype=np.float32)
+    final = np.empty(paths)
+    block = max(1, min(MC_BLOCK_PATHS, MC_BLOCK_VALUES // n))
+    for p0 in range(0, paths, block):
+        b = min(block, paths - p0)
+        step = max(1, MC_BLOCK_VALUES // (b * n))
+        logv = np.zeros((b, n), dtype=np.float32)    # 銘柄ごとの累積対数リターン
+        # 乱数は (時点, パス, 銘柄) の順に並べ、時点方向の累積和を連続したメモリで取る
+        if method == "ヒストリカル":
+            m = 0
+            for d0 in range(0, horizon, step):
+                d = min(step, horizon - d0)
+                cum = np.cumsum(x[rng.integers(0, len(x), size=(d, b))], axis=0)
+                cum += logv
+                # 途中時点の価値 (買い持ちなので各銘柄の価値の加重和)
+                while m < len(marks) and marks[m] <= d0 + d:
+                    at[m, p0:p0 + b] = np.exp(cum[marks[m] - d0 - 1]) @ w32
+                    m += 1
+                logv = cum[-1]
+        else:
+            for m0 in range(0, len(marks), step):
+                g = gaps[m0:m0 + step]
+                cum = (rng.standard_normal((len(g) * b, n), dtype=np.float32) @ chol).reshape(len(g), b, n)
+                cum *= np.sqrt(g).astype(np.float32)[:, None, None]
+                cum += (g[:, None] * mu)[:, None, :]
+                np.cumsum(cum, axis=0, out=cum)
+                cum += logv
+                at[m0:m0 + len(g), p0:p0 + b] = np.exp(cum) @ w32
+                logv = cum[-1]
+        final[p0:p0 + b] = np.exp(logv.astype(np.float64)) @ w
+    return final, marks, at
+
+def portfolio_analysis(weights, period_key, horizon, paths, method):
+    """リスク指標・フロンティア・モンテカルロをまとめて計算する。価格 (最終バーの時刻・終値) とウェイトが変わるまでキャッシュ"""
+    ret, w, version = portfolio_returns(weights, period_key)
+    key = (version, tuple(sorted(weights.items())), period_key, horizon, paths, method)
+    cache = _risk_cache()
+    cache_event("portfolio", "hit" if key in cache else "miss")
+    if key in cache: return cache[key]
+    if ret.empty or len(ret) < CORR_MIN_PERIODS: return None
+    out = {"ret": ret, "w": w, "stats": risk_stats(ret, w)}
+    if len(w) >= 2: out["frontier"] = efficient_frontier(ret)
+    final, marks, at = monte_carlo(ret, w, horizon, paths, method)
+    out["mc"] = (final, marks, np.percentile(at, MC_BANDS, axis=1))   # 途中時点はパーセンタイルだけ残す
+    if len(cache) >= 8: cache.pop(next(iter(cache)))
+    cache[key] = out
+    return out
+
+# --- 銘柄DB 検索インデックス ---
+_KANA = dict(zip(
+    "あいうえおかきくけこがぎぐげごさしすせそざじずぜぞたちつてとだぢづでどなにぬねのはひふへほ"
+    "ばびぶべぼぱぴぷぺぽまみむめもやゆよらりるれろわをんゔ",
+    "a i u e o ka ki ku ke ko ga gi gu ge go sa shi su se so za ji zu ze zo ta chi tsu te to "
+    "da ji zu de do na ni nu ne no ha hi fu he ho ba bi bu be bo pa pi pu pe po ma mi mu me mo "
+    "ya yu yo ra ri ru re ro wa o n vu".split()))
+_SMALL_Y = {"ゃ": "a", "ゅ": "u", "ょ": "o"}
+_SMALL_V = {"ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o"}
+
+def to_romaji(text):
+    """かな (カタカナ含む) をヘボン式ローマ字に変換。漢字などはそのまま残す"""
+    out, double = [], False
+    for ch in text:
+        if "ァ" <= ch <= "ヶ": ch = chr(ord(ch) - 0x60)   # カタカナ → ひらがな
+        if ch == "っ": double = True; continue
+        if ch == "ー": continue
+        if ch in _SMALL_Y and out and out[-1].endswith("i"):
+            b = out[-1][:-1]
+            out[-1] = b + _SMALL_Y[ch] if b.endswith(("sh", "ch", "j")) else b + "y" + _SMALL_Y[ch]
+            continue
+        if ch in _SMALL_V:
+            if out and out[-1][-1:] in "aiueo": out[-1] = out[-1][:-1] + _SMALL_V[ch]
+            else: out.append(_SMALL_V[ch])
+            continue
+        r = _KANA.get(ch, ch)
+        if double and r[:1].isalpha() and r[0] not in "aiueon":
+            r = ("t" if r.startswith("ch") else r[0]) + r
+        double = False
+        out.append(r)
+    return "".join(out)
+
+def _skeleton(token):
+    # 英語表記とローマ字表記の揺れを吸収する子音骨格 (softbank ≒ sofutobanku)
+    t = re.sub(r"[^a-z]", "", token).translate(str.maketrans("clv", "krb"))
+    if not t: return ""
+    t = t[0] + re.sub(r"[aeiouy]", "", t[1:])
+    return re.sub(r"(.)\1+", r"\1", t)
+
+def _grams(token):
+    t = f" {token} "
+    return {t[i:i+3] for i in range(len(t) - 2)}
+
+def _norm(text):
+    return unicodedata.normalize("NFKC", str(text)).lower()
+
+def _tokens(text):
+    return [w for w in re.split(r"[^\w.\-^=&]+", _norm(text)) if w]
+
+class TickerIndex:
+    """
+    銘柄DB (ticker / name / category) の検索インデックス。プロセスで1回だけ構築する。
+    前方一致・部分一致 (3-gram)・タイプミス許容 (3-gram 類似度)・かな/ローマ字の揺れに対応し、
+    スコア順に返す。語彙単位で索引するので銘柄数が増えても検索は辞書引き中心で済む。
+    """
+    PREFIX_MAX = 8
+    SHORT_QUERY = 2   # これ以下の文字数の検索語は前方一致だけで候補を絞る (3-gram では何も増えない)
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.short_ranked = {}             # 短い接頭辞 -> 短い語順の token id (初回の検索時に作る)
+        self.columns = {c: self.df[c].to_numpy(dtype=object) for c in self.df.columns}
+        self.tickers = [_norm(t) for t in self.df['Ticker']]
+        self.vocab = {}                    # token -> token id
+        self.token_list = []               # token id -> token
+        self.token_docs = []               # token id -> {doc}
+        self.gram_tokens = defaultdict(set)
+        self.prefix_tokens = defaultdict(set)
+        self.skeleton_docs = defaultdict(set)
+        for doc, row in self.df.iterrows():
+            words = set(_tokens(row['Ticker']) + _tokens(row['Name']) + _tokens(row['Category']))
+            words |= {to_romaji(w) for w in words}
+            words |= {w.split(".")[0] for w in words if "." in w}   # 7203.t -> 7203
+            for w in words:
+                self._add(w, doc)
+                sk = _skeleton(w)
+                if len(sk) >= 3: self.skeleton_docs[sk].add(doc)
+
+    def _add(self, token, doc):
+        tid = self.vocab.get(token)
+        if tid is None:
+            tid = self.vocab[token] = len(self.token_list)
+            self.token_list.append(token)
+            self.token_docs.append(set())
+            for g in _grams(token): self.gram_tokens[g].add(tid)
+            for i in range(1, min(len(token), self.PREFIX_MAX) + 1): self.prefix_tokens[token[:i]].add(tid)
+        self.token_docs[tid].add(doc)
+
+    def _match_short(self, q, limit=None):
+        """
+        1〜2文字の検索語: 前方一致のスコアは語が短いほど高いので、短い語から順に見て
+        limit 件そろったらそれより長い語は見ない (何万銘柄あっても候補は limit 件程度で済む)
+        """
+        ranked = self.short_ranked.get(q)
+        if ranked is None:
+            ranked = self.short_ranked[q] = sorted(self.prefix_tokens.get(q, ()), key=lambda tid: len(self.token_list[tid]))
+        scores, cut = {}, None
+        for tid in ranked:
+            n = len(self.token_list[tid])
+            if cut is not None and n > cut: break
+            sc = 80 if n == len(q) else 60 + 20 * len(q) / n
+            for doc in self.token_docs[tid]: scores.setdefault(doc, sc)
+            if limit and cut is None and len(scores) >= limit: cut = n
+        return scores
+
+    def _match(self, q, limit=None):
+        """検索語1つに対する {doc: score}。limit は短い検索語の候補の打ち切り件数"""
+        if len(q) <= self.SHORT_QUERY: return self._match_short(q, limit)
+        tok_score = {}
+        def hit(tid, sc):
+            if sc > tok_score.get(tid, 0): tok_score[tid] = sc
+        # 完全一致 / 前方一致
+        for tid in self.prefix_tokens.get(q[:self.PREFIX_MAX], ()):
+            tok = self.token_list[tid]
+            if tok == q: hit(tid, 80)
+            elif tok.startswith(q): hit(tid, 60 + 20 * len(q) / len(tok))
+        # 部分一致・タイプミス (3-gram)
+        qg = _grams(q)
+        shared = Counter(tid for g in qg for tid in self.gram_tokens.get(g, ()))
+        for tid, n in shared.items():
+            tok = self.token_list[tid]
+            if len(q) >= 3 and q in tok: hit(tid, 45)
+            sim = n / (len(qg) + len(tok) - n)   # 語の 3-gram 数 = 文字数
+            if sim >= 0.3: hit(tid, 50 * sim)
+        scores = defaultdict(float)
+        for tid, sc in tok_score.items():
+            for doc in self.token_docs[tid]:
+                scores[doc] = max(scores[doc], sc)
+        sk = _skeleton(q)
+        if len(sk) >= 3:
+            for doc in self.skeleton_docs.get(sk, ()): scores[doc] = max(scores[doc], 35)
+        return scores
+
+    def search_ids(self, query, limit=200):
+        """[(行番号, スコア)] をスコア順に返す。複数語は AND"""
+        total = None
+        words = _tokens(query)
+        # 1語なら上位 limit 件だけあればよい (複数語は AND で絞るので打ち切らない)
+        cap = limit if len(words) == 1 else None
+        for w in words:
+            sc = self._match(w, cap)
+            r = to_romaji(w)
+            if r != w:
+                for doc, v in self._match(r, cap).items(): sc[doc] = max(sc.get(doc, 0), v)
+            total = sc if total is None else {d: total[d] + v for d, v in sc.items() if d in total}
+        if not total: return []
+        qn = _norm(query).strip()
+        for doc in total:
+            if self.tickers[doc] == qn: total[doc] += 100
+        return heapq.nlargest(limit, total.items(), key=lambda kv: kv[1])
+
+    def search(self, query, limit=200):
+        """スコア順の DataFrame (Score 列付き) を返す"""
+        ranked = self.search_ids(query, limit)
+        ids = np.array([d for d, _ in ranked], dtype=int)
+        # iloc + 列追加より列ごとの配列から組み立てるほうが速い (検索は入力のたびに走る)
+        return pd.DataFrame({**{c: v[ids] for c, v in self.columns.items()}, 'Score': [round(v, 1) for _, v in ranked]}, index=ids)
+
+@resource
+def ticker_index():
+    return TickerIndex(ticker_df_master)
+
+def clean_search_term(text):
+    if not text: return ""
+    text = text.replace('（', '(').split('(')[0].strip()
+    stopwords = ["Inc", "Corp", "Corporation", "Ltd", "Limited", "Holdings", "Group", "Company"]
+    words = text.split()
+    cleaned = [w for w in words if w.strip(',.') not in stopwords]
+    return " ".join(cleaned)
+
+NEWS_TTL = 600
+NEWS_PARTIAL_TTL = 60      # タイムアウト・失敗したソースは短めに保持
+NEWS_SOURCE_TIMEOUT = 4    # ソースごとのタイムアウト (秒)
+NEWS_DEADLINE = 6          # 全体の締め切り (秒)
+NEWSAPI_QUERY_CHARS = 500  # NewsAPI の検索語 (q) の文字数上限
+NEWSAPI_MAX_QUERIES = 3    # 1回の取得で言語ごとに投げるクエリ数の上限 (残りのキーワードは次回に回す)
+NEWSAPI_PAGE_SIZE = 20
+NEWSAPI_MAX_PAGES = 3      # ページが埋まっている間に読む上限 (それでも埋まっていれば取り込み位置を進めない)
+
+@resource
+def _news_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="news")
+
+@resource
+def _http():
+    """keep-alive の接続を使い回す共有セッション (プールはニュースの並列取得数に合わせる)"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0"
+    return session
+
+@resource
+def _feed_validators():
+    # {url: {"etag": ..., "modified": ...}} 前回の応答の検証子
+    return {}
+
+def fetch_feed(url):
+    """
+    条件付き GET (ETag / If-Modified-Since)。戻り値: (本文 (変化がなければ (304) None), {url: 新しい検証子})
+    検証子は記事をストアに保存してから _feed_validators() に入れる (保存前に失敗しても次回取り直せるように)
+    """
+    v = _feed_validators().get(url, {})
+    headers = {}
+    if v.get("etag"): headers["If-None-Match"] = v["etag"]
+    if v.get("modified"): headers["If-Modified-Since"] = v["modified"]
+    r = _http().get(url, timeout=NEWS_SOURCE_TIMEOUT, headers=headers)
+    if r.status_code == 304:
+        cache_event("feed", "hit")
+        return None, {}
+    r.raise_for_status()
+    cache_event("feed", "miss")
+    return r.content, {url: {"etag": r.headers.get("ETag"), "modified": r.headers.get("Last-Modified")}}
+
+@resource
+def _news_cache():
+    # {ソースキー: 有効期限} RSS は銘柄ごと、NewsAPI は言語×キーワードごとの鮮度
+    return {}
+
+# --- ニュース記事ストア (SQLite + FTS5) ---
+# 取得した記事を蓄積し、ほぼ同じタイトルの記事 (配信先違い・URL違い) は SimHash でひとまとめにする。
+# ソースごとに取得済みの最新時刻 (high-water mark) を持ち、それより新しい記事だけを取り込む。
+NEWS_DB = os.path.join(DATA_DIR, "news.sqlite")
+NEWS_SHOW = 60                 # 画面に出す件数 (まとめた後)
+NEWS_DUP_BITS = 3              # SimHash のハミング距離がこれ以下なら同じ記事
+NEWS_DUP_WINDOW = 3 * 86400    # 同じ記事とみなす公開時刻の差 (秒)
+NEWS_RETENTION_DAYS = 180
+
+def _news_db():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    con = sqlite3.connect(NEWS_DB, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS news_articles (
+            id INTEGER PRIMARY KEY, link TEXT UNIQUE, title TEXT, source TEXT, published TEXT, ts INTEGER,
+            simhash INTEGER, b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER, cluster INTEGER);
+        CREATE INDEX IF NOT EXISTS news_articles_ts ON news_articles (ts);
+        CREATE INDEX IF NOT EXISTS news_articles_b0 ON news_articles (b0);
+        CREATE INDEX IF NOT EXISTS news_articles_b1 ON news_articles (b1);
+        CREATE INDEX IF NOT EXISTS news_articles_b2 ON news_articles (b2);
+        CREATE INDEX IF NOT EXISTS news_articles_b3 ON news_articles (b3);
+        CREATE TABLE IF NOT EXISTS news_tickers (ticker TEXT, article INTEGER, PRIMARY KEY (ticker, article)) WITHOUT ROWID;
+        CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5 (title, tokenize='trigram');
+        CREATE TABLE IF NOT EXISTS news_hwm (source TEXT PRIMARY KEY, ts INTEGER);
+    """)
+    return con
+
+def _title_features(title):
+    """タイトルの特徴語 (単語と隣接2語)。末尾の「 - 配信元」は除き、日本語などは2文字ずつに分ける"""
+    t = re.sub(r"\s+[-|–—]\s+[^-|–—]{1,30}$", "", _norm(title))
+    feats = []
+    for w in re.findall(r"\w+", t):
+        if w.isascii(): feats.append(w)
+        else: feats += [w[i:i+2] for i in range(max(1, len(w) - 1))]
+    return feats + [a + " " + b for a, b in zip(feats, feats[1:])]
+
+def simhash(title):
+    """64bit SimHash (似たタイトルほどビットの差が小さい)"""
+    feats = _title_features(title)
+    if not feats: return 0
+    h = np.array([int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in feats], dtype=np.uint64)
+    bits = np.unpackbits(h.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return int(np.packbits(bits.sum(axis=0) * 2 > len(feats), bitorder="little").view("<u8")[0])
+
+def news_hwm(sources):
+    """{ソースキー: 取り込み済みの最新公開時刻}"""
+    if not sources: return {}
+    with _news_db() as con:
+        rows = con.execute(f"SELECT source, ts FROM news_hwm WHERE source IN ({','.join('?' * len(sources))})", list(sources)).fetchall()
+    return dict(rows)
+
+@timed("news.store")
+def news_store_add(batches):
+    """
+    [({ソースキー: 取り込み位置}, 記事リスト)] を保存する。記事は tickers (紐付ける銘柄) と ts (公開時刻) を持つ。
+    取り込み位置 (high-water mark, 公開時刻) は _news_batch が決め、ここでは後ろに戻さずに記録するだけ。
+    既存リンクは銘柄の紐付けだけ追加し、新しい記事は4分割したハッシュのどれかが一致する記事
+    (距離 NEWS_DUP_BITS 以下なら必ず含まれる) と比べて、同じ記事なら同じ cluster に入れる。
+    """
+    now = time.time()
+    with _news_db() as con:
+        for sources, items in batches:
+            for a in items:
+                row = con.execute("SELECT id FROM news_articles WHERE link=?", (a['link'],)).fetchone()
+                if row is None:
+                    h = simhash(a['title'])
+                    bands = [(h >> (16 * i)) & 0xFFFF for i in range(4)]
+                    cluster = None
+                    for cid, other in con.execute(
+                            "SELECT cluster, simhash FROM news_articles WHERE (b0=? OR b1=? OR b2=? OR b3=?) AND ts BETWEEN ? AND ?",
+                            (*bands, a['ts'] - NEWS_DUP_WINDOW, a['ts'] + NEWS_DUP_WINDOW)):
+                        if bin((other % 2**64) ^ h).count("1") <= NEWS_DUP_BITS:
+                            cluster = cid
+                            break
+                    aid = con.execute(
+                        "INSERT INTO news_articles (link, title, source, published, ts, simhash, b0, b1, b2, b3) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                        (a['link'], a['title'], a['source'], a['published'], a['ts'], h - 2**64 if h >= 2**63 else h, *bands)).lastrowid
+                    con.execute("UPDATE news_articles SET cluster=? WHERE id=?", (cluster or aid, aid))
+                    con.execute("INSERT INTO news_fts (rowid, title) VALUES (?, ?)", (aid, a['title']))
+                else:
+                    aid = row[0]
+                con.executemany("INSERT OR IGNORE INTO news_tickers VALUES (?, ?)", [(t, aid) for t in a['tickers']])
+            con.executemany("INSERT INTO news_hwm VALUES (?, ?) ON CONFLICT (source) DO UPDATE SET ts=max(ts, excluded.ts)",
+                            list(sources.items()))
+        # 古い記事は1日1回まとめて削除
+        last = con.execute("SELECT ts FROM news_hwm WHERE source='_prune'").fetchone()
+        if last is None or now - last[0] > 86400:
+            old = ("SELECT id FROM news_articles WHERE ts < ?", (now - NEWS_RETENTION_DAYS * 86400,))
+            con.execute(f"DELETE FROM news_fts WHERE rowid IN ({old[0]})", old[1])
+            con.execute(f"DELETE FROM news_tickers WHERE article IN ({old[0]})", old[1])
+            con.execute("DELETE FROM news_articles WHERE ts < ?", old[1])
+            con.execute("INSERT OR REPLACE INTO news_hwm VALUES ('_prune', ?)", (int(now),))
+
+@timed("news.store")
+def news_store_query(tickers=None, q=None, limit=NEWS_SHOW):
+    """
+    保存済み記事を新しい順に返す。tickers で銘柄を、q でタイトルの全文検索を絞り込む。
+    同じ cluster の記事は最初に保存した1件にまとめ、まとめた件数を dups に入れる。
+    """
+    where, params = [], []
+    if tickers:
+        where.append(f"id IN (SELECT article FROM news_tickers WHERE ticker IN ({','.join('?' * len(tickers))}))")
+        params += list(tickers)
+    if q and len(q) >= 3:
+        where.append("id IN (SELECT rowid FROM news_fts WHERE news_fts MATCH ?)")
+        params.append('"' + q.replace('"', '""') + '"')
+    elif q:
+        where.append("title LIKE ?")   # trigram は3文字未満を検索できない
+        params.append(f"%{q}%")
+    sql = f"""SELECT MIN(id), title, link, source, published, ts, COUNT(*) FROM news_articles
+              {'WHERE ' + ' AND '.join(where) if where else ''}
+              GROUP BY cluster ORDER BY ts DESC LIMIT ?"""
+    with _news_db() as con:
+        rows = con.execute(sql, params + [limit]).fetchall()
+    return [{"title": t, "link": l, "source": src, "published": p, "dups": n} for _, t, l, src, p, _, n in rows]
+
+@timed("news.rss")
+def _fetch_rss(t, since=None):
+    """
+    フィードのうち since (公開時刻) より新しい記事。前回から変わっていなければ解析せずに空。
+    戻り値: (記事リスト, 取りこぼしが無いか (フィードは全件なので常に True), 保存後に記録する検証子)
+    """
+    body, validators = fetch_feed(f"https://finance.yahoo.com/rss/headline?s={t}")
+    if body is None: return [], True, validators
+    feed = feedparser.parse(body)
+    out = []
+    for entry in feed.entries:
+        ts = calendar.timegm(entry.published_parsed) if entry.get('published_parsed') else int(time.time())
+        if since and ts <= since: continue
+        out.append({
+            "title": entry.title,
+            "link": entry.link,
+            "published": entry.published[:16] if 'published' in entry else "Recent",
+            "source": f"Yahoo RSS ({t})",
+            "ts": ts,
+        })
+    return out, True, validators
+
+@timed("news.newsapi")
+def _fetch_newsapi(query, language, label, since=None):
+    """
+    since より新しい記事を新しい順に。ページが埋まっていれば次のページも読む (NEWSAPI_MAX_PAGES まで)。
+    戻り値: (記事リスト, 取りこぼしが無いか (最後のページまで埋まっていれば False), 検証子 (なし))
+    """
+    kw = {"from_param": datetime.fromtimestamp(since, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")} if since else {}
+    arts = []
+    for page in range(1, NEWSAPI_MAX_PAGES + 1):
+        got = get_newsapi().get_everything(q=query, language=language, sort_by='publishedAt',
+                                           page_size=NEWSAPI_PAGE_SIZE, page=page, **kw).get('articles', [])
+        arts += got
+        if len(got) < NEWSAPI_PAGE_SIZE: break
+    complete = len(got) < NEWSAPI_PAGE_SIZE
+    return [{
+        "title": a['title'],
+        "link": a['url'],
+        "published": a['publishedAt'][:10],
+        "source": f"{label} ({a['source']['name']})",
+        "description": a.get('description'),
+        "ts": int(datetime.fromisoformat(a['publishedAt'].replace("Z", "+00:00")).timestamp()),
+    } for a in arts if a.get('title') and a.get('url')], complete, {}
+
+def _tag_tickers(items, owners):
+    # キーワード検索の記事は、タイトル・概要に名前が出てくる銘柄に紐付ける。出てこない記事は、
+    # 1キーワードだけの検索なら検索した銘柄に、複数まとめた検索ならどの銘柄にも紐付けない (全文検索では出る)
+    names = {t: clean_search_term(TICKER_NAME_MAP.get(t, t)).lower() for t in owners}
+    single = len(set(names.values())) == 1
+    for a in items:
+        text = (a['title'] + " " + (a.pop('description', None) or "")).lower()
+        a['tickers'] = [t for t in owners if names[t] in text] or (owners if single else [])
+    return items
+
+def _news_batch(keys, owners, result, since):
+    """
+    取得結果を news_store_add の1件 ({ソースキー: 取り込み位置}, 記事リスト) にする。keys は {ソースキー: 銘柄リスト}。
+    取り込み位置は、そのキーの銘柄に紐付いた記事の最新時刻まで (まとめた検索で他のキーワードの記事しか
+    無かったキーワードは進めない)。ページが埋まったまま終わった (取りこぼしがあり得る) 場合は、
+    初回 (since なし) はそのまま最新記事まで、2回目以降は受け取った最古の記事までにする
+    (それより前の取りこぼしは諦め、忙しいキーワードでも毎回全ページを読み直さずに差分取得に移れるように)。
+    """
+    items, complete, _ = result
+    items = _tag_tickers(items, owners)
+    if complete or since is None:
+        marks = {k: max((a['ts'] for a in items if set(ks) & set(a['tickers'])), default=None) for k, ks in keys.items()}
+    else:
+        oldest = min((a['ts'] for a in items), default=None)
+        marks = {k: oldest for k in keys}
+    return {k: ts for k, ts in marks.items() if ts is not None}, items
+
+def _store_late(sources, owners, since, f):
+    try:
+        news_store_add([_news_batch(sources, owners, f.result(), since)])
+        _feed_validators().update(f.result()[2])
+    except: pass
+
+def plan_newsapi_queries(keywords, max_chars=NEWSAPI_QUERY_CHARS, max_queries=NEWSAPI_MAX_QUERIES):
+    """キーワードを順に " OR " でつなぎ、max_chars に収まるクエリ (キーワードのリスト) に詰める"""
+    queries, cur = [], []
+    for k in keywords:
+        if cur and len(" OR ".join(cur + [k])) > max_chars:
+            queries.append(cur)
+            cur = []
+            if len(queries) == max_queries: return queries
+        cur.append(k)
+    if cur: queries.append(cur)
+    return queries
+
+@timed("news")
+def fetch_news_hybrid(tickers, force=False, deadline=NEWS_DEADLINE):
+    """
+    【最強ハイブリッド版】
+    1. Yahoo RSS (Ticker直結) -> 確実性重視
+    2. NewsAPI (Keyword検索) -> 関連性重視 (APIキー使用)
+    鮮度はソース (銘柄ごとの RSS、言語×キーワードごとの NewsAPI) 単位で持ち、期限切れのものだけを
+    並列取得する (銘柄の追加・並べ替えでは増えた分しか取得しない)。NewsAPI は期限切れのキーワードを
+    古い順にクエリへ詰めて投げる。締め切り (deadline 秒、None なら全部届くまで) までに届いた分を記事ストアに追加して、
+    選択銘柄の記事をストアから新しい順に (ほぼ同じ記事はまとめて) 返す。
+    各ソースからは前回取り込んだ最新記事より新しいものだけを取得する。
+    戻り値: (articles, 締め切りに間に合わなかったソース名のリスト)
+    """
+    if not tickers: return [], []
+    fresh = _news_cache()
+    now = time.time()
+    stale = lambda key: force or fresh.get(key, 0) <= now
+    
+    # (表示名, {high-water mark のキー: そのキーの銘柄}, 関数, 引数, 記事を紐付ける銘柄)
+    # --- A. Yahoo Finance RSS (バックアップ・確実) ---
+    sources = [(f"Yahoo RSS ({t})", {f"rss:{t}": [t]}, _fetch_rss, (t,), [t]) for t in tickers if stale(f"rss:{t}")]
+    
+    # --- B. NewsAPI (APIキー使用・広範) ---
+    search_keywords = {}
+    for t in tickers:
+        name = TICKER_NAME_MAP.get(t, t)
+        clean = clean_search_term(name)
+        if len(clean) >= 2: search_keywords.setdefault(clean, []).append(t)
+    for lang, label in (('en', "NewsAPI"), ('jp', "NewsAPI JP")):   # 英語・日本語
+        todo = sorted((k for k in search_keywords if stale(f"newsapi:{lang}:{k}")), key=lambda k: fresh.get(f"newsapi:{lang}:{k}", 0))
+        for chunk in plan_newsapi_queries(todo):
+            query = " OR ".join(chunk)
+            owners = [t for k in chunk for t in search_keywords[k]]
+            sources.append((label, {f"newsapi:{lang}:{k}": search_keywords[k] for k in chunk}, _fetch_newsapi, (query, lang, label), owners))
+    cache_event("news", "hit", len(tickers) + 2 * len(search_keywords) - sum(len(keys) for _, keys, _, _, _ in sources))
+    cache_event("news", "miss", sum(len(keys) for _, keys, _, _, _ in sources))
+    
+    skipped = []
+    if sources:
+        hwm = news_hwm([k for _, keys, _, _, _ in sources for k in keys])
+        pool = _news_pool()
+        # まとめて検索するキーワードは、取り込みが一番遅れているものに合わせる
+        since = lambda keys: None if any(k not in hwm for k in keys) else min(hwm[k] for k in keys)
+        futures = []
+        for label, keys, fn, args, owners in sources:
+            s = since(keys)
+            futures.append((label, keys, owners, s, pool.submit(perf_bind(fn), *args, since=s)))
+        wait([f for *_, f in futures], timeout=deadline)
+        
+        batches, validators = [], {}
+        for label, keys, owners, s, f in futures:
+            ttl = NEWS_TTL
+            if not f.done():
+                # 間に合わなかったソースも、届いたらストアに入れる (取得済みの検証子と記事がずれないように)
+                if not f.cancel(): f.add_done_callback(lambda f, keys=keys, owners=owners, s=s: _store_late(keys, owners, s, f))
+                skipped.append(label)
+                ttl = NEWS_PARTIAL_TTL
+            else:
+                try:
+                    batches.append(_news_batch(keys, owners, f.result(), s))
+                    validators.update(f.result()[2])
+                except: ttl = NEWS_PARTIAL_TTL
+            for k in keys: fresh[k] = now + ttl
+        # フィードの検証子は記事を保存できてから記録する (保存に失敗したら次回は 304 にせず取り直す)
+        try:
+            news_store_add(batches)
+            _feed_validators().update(validators)
+        except: pass
+    try: articles = news_store_query(tickers)
+    except: articles = []
+    return articles, list(dict.fromkeys(skipped))
+
+WATCHLIST_TTL = 600   # 他プロセス・外部からの変更を拾うための保険
+
+@resource
+def _watchlist_cache():
+    # 書き込み (追加・削除) 時に更新する共有キャッシュ
+    return {"df": None, "at": 0.0, "lock": threading.Lock()}
+
+def fetch_watchlist():
+    c = _watchlist_cache()
+    if c["df"] is not None and time.time() - c["at"] < WATCHLIST_TTL:
+        cache_event("watchlist", "hit")
+        return c["df"]
+    cache_event("watchlist", "miss")
+    try:
+        with perf_span("supabase.select"):
+            df = pd.DataFrame(get_supabase().table("watchlist").select("*").order("created_at", desc=True).execute().data)
+    except:
+        return c["df"] if c["df"] is not None else pd.DataFrame()
+    with c["lock"]:
+        c["df"], c["at"] = df, time.time()
+    return df
+
+def add_to_watchlist(ticker, note, weight=None):
+    row = {"ticker": ticker, "note": note}
+    if weight is not None: row["weight"] = weight   # weight 列がないテーブルでも、指定しなければ従来どおり追加できる
+    try:
+        with perf_span("supabase.insert"):
+            res = get_supabase().table("watchlist").insert(row).execute()
+    except:
+        return False
+    c = _watchlist_cache()
+    with c["lock"]:
+        # 挿入された行をそのまま先頭 (新しい順) に反映。取れなければ次回取り直す
+        if c["df"] is not None and res.data:
+            c["df"] = pd.concat([pd.DataFrame(res.data), c["df"]], ignore_index=True)
+        else:
+            c["df"] = None
+    return True
+
+def set_watchlist_weights(rows):
+    """
+    [{"id", "weight" (None で未設定)}] を保存する。既存の行の weight だけを更新し (同じ値の行は1回の
+    update にまとめる)、他のセッションが削除した行は作り直さない。
+    watchlist テーブルに weight 列がなければ False
+    """
+    weights = {r["id"]: r["weight"] for r in rows}
+    if not weights: return True
+    groups = defaultdict(list)
+    for i, w in weights.items(): groups[w].append(i)
+    c = _watchlist_cache()
+    updated = set()
+    try:
+        with perf_span("supabase.update"):
+            for w, ids in groups.items():
+                res = get_supabase().table("watchlist").update({"weight": w}).in_("id", ids).execute()
+                updated |= {r["id"] for r in res.data or []} & set(ids)
+    except:
+        return False
+    with c["lock"]:
+        if c["df"] is not None and not c["df"].empty:
+            if updated != set(weights): c["df"] = None   # 他で削除された行がある: 次回取り直す
+            else:
+                df = c["df"].copy()
+                if "weight" not in df.columns: df["weight"] = None
+                hit = df["id"].isin(list(weights))
+                df.loc[hit, "weight"] = df.loc[hit, "id"].map(weights)
+                c["df"] = df
+    return True
+
+def delete_from_watchlist(item_ids):
+    """選択した行を1回のリクエストでまとめて削除 (画面には先に反映)"""
+    ids = list(item_ids)
+    if not ids: return
+    c = _watchlist_cache()
+    with c["lock"]:
+        if c["df"] is not None and not c["df"].empty:
+            c["df"] = c["df"][~c["df"]['id'].isin(ids)].reset_index(drop=True)
+    try:
+        with perf_span("supabase.delete"):
+            get_supabase().table("watchlist").delete().in_("id", ids).execute()
+    except:
+        with c["lock"]: c["df"] = None   # 失敗したら次回取り直す
+
+# --- 4. バックグラウンド先読み ---
+# ウォッチリストの全銘柄を TTL が切れる前に更新しておき、画面からの要求はキャッシュで返す
+PREFETCH_ENABLED = bool(setting("PREFETCH_ENABLED", True))
+PREFETCH_INTERVAL = int(setting("PREFETCH_INTERVAL", PRICE_TTL - 60))  # 秒
+PREFETCH_CONCURRENCY = int(setting("PREFETCH_CONCURRENCY", 2))
+PREFETCH_BATCH = int(setting("PREFETCH_BATCH", 10))        # 1リクエストあたりの銘柄数
+PREFETCH_PERIODS = list(setting("PREFETCH_PERIODS", ["1年"]))
+PREFETCH_NEWS = bool(setting("PREFETCH_NEWS", False))
+
+def prefetch_cycle(tickers):
+    """
+    1周期分の先読み。銘柄を PREFETCH_BATCH ずつに分け、周期の8割の時間に均等な間隔で投入する
+    (レート制限対策)。同時実行数は PREFETCH_CONCURRENCY まで。
+    """
+    jobs = [(get_prices, (tickers[i:i+PREFETCH_BATCH], pk), {"max_age": 0})
+            for pk in PREFETCH_PERIODS for i in range(0, len(tickers), PREFETCH_BATCH)]
+    if PREFETCH_NEWS:
+        jobs += [(fetch_news_hybrid, (tickers[i:i+PREFETCH_BATCH],), {}) for i in range(0, len(tickers), PREFETCH_BATCH)]
+    if not jobs: return
+    gap = PREFETCH_INTERVAL * 0.8 / len(jobs)
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="prefetch") as pool:
+        for fn, args, kw in jobs:
+            pool.submit(fn, *args, **kw)
+            time.sleep(gap)
+
+@resource
+def start_prefetcher():
+    """先読みスレッドをプロセスで1つだけ起動し、状況 (最終実行時刻・銘柄数) を返す"""
+    status = {"last": None, "tickers": 0}
+    if not PREFETCH_ENABLED: return status
+    def loop():
+        while True:
+            started = time.time()
+            try:
+                w = fetch_watchlist()
+                tickers = w['ticker'].dropna().unique().tolist() if not w.empty else []
+                prefetch_cycle(tickers)
+                status.update(last=time.time(), tickers=len(tickers))
+            except: pass
+            time.sleep(max(1.0, PREFETCH_INTERVAL - (time.time() - started)))
+    threading.Thread(target=loop, name="prefetch", daemon=True).start()
+    return status
+
+def clear_caches():
+    """取得・計算結果のキャッシュ (プロセス共有) を捨てる。ローカル保存はそのまま"""
+    for c in (_price_cache(), _news_cache(), _corr_cache(), _screen_cache(), _backtest_cache(), _risk_cache()): c.clear()
+    _watchlist_cache()["df"] = None
+
+# --- 一括更新 (画面の外から・CLI 用) ---
+PRECOMPUTE_WORKERS = 4
+
+def precompute_prices(tickers, period_key, max_age=PRICE_TTL):
+    """価格をローカル保存に更新し、期間で切り出して指標を付けたスナップショットを保存する。戻り値: 保存した銘柄"""
+    snaps = {}
+    for tk, full in refresh_store(tickers, I_MAP.get(period_key, "1d"), max_age).items():
+        df = slice_period(full, period_key)
+        if not df.empty: snaps[tk] = technicals_with_checkpoint(df)
+    snapshot_write(period_key, snaps)
+    return list(snaps)
+
+@timed("precompute")
+def precompute(tickers, periods=PREFETCH_PERIODS, news=True, max_age=PRICE_TTL, workers=PRECOMPUTE_WORKERS, progress=None):
+    """
+    価格・指標 (期間ごと STORE_BATCH 銘柄ずつ) とニュース (PREFETCH_BATCH 銘柄ずつ) を並列に更新して
+    ローカル保存に書き込む。画面はそれを読むだけで済む (夜間の一括更新など)。
+    上流のレート制限は画面と同じ (プロセス内で共有)。progress(完了数, 全体数, 内容) で進み具合を受け取れる。
+    戻り値: {"prices": {期間: 保存した銘柄数}, "news": 記事を取得した銘柄数, "missing": {期間: 取得できなかった銘柄}, "errors": [...]}
+    """
+    jobs = [(f"{pk} {batch[0]}..", precompute_prices, (batch, pk, max_age), pk)
+            for pk in periods for batch in (tickers[i:i+STORE_BATCH] for i in range(0, len(tickers), STORE_BATCH))]
+    if news:
+        jobs += [(f"news {batch[0]}..", fetch_news_hybrid, (batch, True, None), "news")
+                 for batch in (tickers[i:i+PREFETCH_BATCH] for i in range(0, len(tickers), PREFETCH_BATCH))]
+    out = {"prices": dict.fromkeys(periods, 0), "news": 0, "missing": {pk: [] for pk in periods}, "errors": []}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="precompute") as pool:
+        futures = {pool.submit(fn, *args): (label, args, kind) for label, fn, args, kind in jobs}
+        for done, f in enumerate(as_completed(futures), 1):
+            label, args, kind = futures[f]
+            try:
+                res = f.result()
+                if kind == "news":
+                    out["news"] += len(args[0])
+                else:
+                    out["prices"][kind] += len(res)
+                    out["missing"][kind] += [tk for tk in args[0] if tk not in res]
+            except Exception as e:
+                out["errors"].append(f"{label}: {e}")
+            if progress: progress(done, len(jobs), label)
+    return out
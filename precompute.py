@@ -0,0 +1,67 @@
+"""
+価格・指標・ニュースの一括更新 (Streamlit なしで実行)
+ダッシュボードが読むローカル保存 (DASHBOARD_DATA_DIR、既定は .data/) を画面の外で更新する。
+夜間の cron などから:
+
+    python precompute.py --watchlist                       # ウォッチリストの銘柄
+    python precompute.py --all --periods 1年,3年 --no-news  # 銘柄マスター全体
+    python precompute.py AAPL MSFT 7203.T --workers 8
+
+設定 (Supabase / NewsAPI のキー、YF_RATE など) は .streamlit/secrets.toml と環境変数から読む。
+取得できなかった銘柄・失敗したバッチがあれば終了コード 1。
+"""
+import argparse
+import sys
+import time
+
+import dashboard_core as core
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="価格・指標・ニュースをローカル保存に一括で書き込む")
+    ap.add_argument("tickers", nargs="*", help="銘柄コード")
+    ap.add_argument("--watchlist", action="store_true", help="ウォッチリスト (Supabase) の銘柄を加える")
+    ap.add_argument("--all", action="store_true", help="銘柄マスター全体を加える")
+    ap.add_argument("--category", action="append", default=[], help="銘柄マスターのカテゴリ (例: japan) を加える (複数指定可)")
+    ap.add_argument("--periods", default=",".join(core.PREFETCH_PERIODS), help="指標を保存する期間 (カンマ区切り)")
+    ap.add_argument("--no-news", action="store_true", help="ニュースを取得しない")
+    ap.add_argument("--max-age", type=int, default=core.PRICE_TTL, help="この秒数以内に更新済みの銘柄は取得しない (0 で全て取得)")
+    ap.add_argument("--workers", type=int, default=core.PRECOMPUTE_WORKERS, help="同時に実行するバッチ数")
+    ap.add_argument("-q", "--quiet", action="store_true", help="進み具合を表示しない")
+    args = ap.parse_args(argv)
+
+    tickers = [t.upper().strip() for t in args.tickers]
+    if args.watchlist:
+        w = core.fetch_watchlist()
+        if w.empty: print("ウォッチリストを読めませんでした (空か、Supabase の設定がありません)", file=sys.stderr)
+        else: tickers += w['ticker'].dropna().tolist()
+    master = core.ticker_df_master
+    if args.all: tickers += master['Ticker'].tolist()
+    for cat in args.category:
+        hit = master[master['Category'].str.contains(cat, case=False, regex=False)]
+        if hit.empty: ap.error(f"カテゴリが見つかりません: {cat}")
+        tickers += hit['Ticker'].tolist()
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    if not tickers: ap.error("銘柄を指定してください (コード / --watchlist / --all / --category)")
+    periods = [p.strip() for p in args.periods.split(",") if p.strip()]
+    bad = [p for p in periods if p not in core.PERIODS]
+    if bad: ap.error(f"期間が不正です: {', '.join(bad)} (選択肢: {', '.join(core.PERIODS)})")
+
+    def progress(done, total, label):
+        if not args.quiet: print(f"[{done}/{total}] {label}", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    res = core.precompute(tickers, periods, news=not args.no_news, max_age=args.max_age,
+                          workers=args.workers, progress=progress)
+    print(f"{len(tickers)} 銘柄 ({time.perf_counter() - t0:.1f} 秒)")
+    for pk in periods:
+        missing = res["missing"][pk]
+        print(f"  {pk}: {res['prices'][pk]} 銘柄を保存" + (f" / 取得できず {len(missing)}: {' '.join(missing[:20])}" if missing else ""))
+    if not args.no_news: print(f"  ニュース: {res['news']} 銘柄")
+    for e in res["errors"]: print(f"  ! {e}", file=sys.stderr)
+    core.export_metrics()
+    return 1 if res["errors"] or any(res["missing"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
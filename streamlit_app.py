@@ -1,576 +1,47 @@
+"""
+Pro Investor Dashboard (画面)。データ取得・分析は dashboard_core にあり、ここは表示だけを行う。
+"""
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import plotly.graph_objects as go
-import plotly.express as px
-from supabase import create_client, Client
-from newsapi import NewsApiClient
-import feedparser
-from datetime import datetime, timedelta
-
-# --- 1. 設定 ---
+import numpy as np
+import time
+
+PERF_T0 = time.perf_counter()
 st.set_page_config(page_title="Pro Investor Dashboard v13.1", layout="wide")
 
-try:
-    SUPABASE_URL = st.secrets["SUPABASE_URL"]
-    SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-    NEWS_API_KEY = st.secrets["NEWS_API_KEY"]
-except:
+import dashboard_core as core  # noqa: E402
+
+go = core.lazy_module("plotly.graph_objects")
+px = core.lazy_module("plotly.express")
+PERF_RUN = core.perf_begin()   # この再実行で計測した区間
+
+if not (core.SUPABASE_URL and core.SUPABASE_KEY and core.NEWS_API_KEY):
     st.error("Secrets (Supabase/NewsAPI) が設定されていません。")
     st.stop()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-newsapi = NewsApiClient(api_key=NEWS_API_KEY)
-
-# ==============================================================================
-# 2. 銘柄データマスター (350種以上・固定)
-# ==============================================================================
-# (リストは長いので省略せず、前回のv13と同じ内容を使用します。
-#  以下のリスト部分は前回のv13のコードのまま、変更ありません)
-
-# --- 債券・金利 ---
-BONDS = [
-    {"C": "📉 Bonds", "T": "^TNX", "N": "US 10Y Yield"},
-    {"C": "📉 Bonds", "T": "^FVX", "N": "US 5Y Yield"},
-    {"C": "📉 Bonds", "T": "^IRX", "N": "US 3 Month Bill"},
-    {"C": "📉 Bonds", "T": "^TYX", "N": "US 30Y Yield"},
-    {"C": "📉 Bonds", "T": "TLT", "N": "20+ Year Treasury Bond"},
-    {"C": "📉 Bonds", "T": "IEF", "N": "7-10 Year Treasury Bond"},
-    {"C": "📉 Bonds", "T": "SHY", "N": "1-3 Year Treasury Bond"},
-    {"C": "📉 Bonds", "T": "GOVT", "N": "US Treasury Bond ETF"},
-    {"C": "📉 Bonds", "T": "SHV", "N": "Short Treasury Bond"},
-    {"C": "📉 Bonds", "T": "BIL", "N": "1-3 Month Treasury"},
-    {"C": "📉 Bonds", "T": "LQD", "N": "Inv Grade Corporate Bond"},
-    {"C": "📉 Bonds", "T": "VCIT", "N": "Interm-Term Corp Bond"},
-    {"C": "📉 Bonds", "T": "VCSH", "N": "Short-Term Corp Bond"},
-    {"C": "📉 Bonds", "T": "HYG", "N": "High Yield Bond"},
-    {"C": "📉 Bonds", "T": "JNK", "N": "High Yield Bond SPDR"},
-    {"C": "📉 Bonds", "T": "BKLN", "N": "Senior Loan ETF"},
-    {"C": "📉 Bonds", "T": "AGG", "N": "US Aggregate Bond"},
-    {"C": "📉 Bonds", "T": "BND", "N": "Total Bond Market"},
-    {"C": "📉 Bonds", "T": "BNDX", "N": "Total International Bond"},
-    {"C": "📉 Bonds", "T": "TIP", "N": "TIPS (Inflation-Protected)"},
-]
-# --- 為替 ---
-FOREX = [
-    {"C": "💱 Forex", "T": "USDJPY=X", "N": "USD/JPY (ドル円)"},
-    {"C": "💱 Forex", "T": "EURJPY=X", "N": "EUR/JPY (ユーロ円)"},
-    {"C": "💱 Forex", "T": "GBPJPY=X", "N": "GBP/JPY (ポンド円)"},
-    {"C": "💱 Forex", "T": "AUDJPY=X", "N": "AUD/JPY (豪ドル円)"},
-    {"C": "💱 Forex", "T": "NZDJPY=X", "N": "NZD/JPY (NZドル円)"},
-    {"C": "💱 Forex", "T": "CADJPY=X", "N": "CAD/JPY (カナダドル円)"},
-    {"C": "💱 Forex", "T": "CHFJPY=X", "N": "CHF/JPY (フラン円)"},
-    {"C": "💱 Forex", "T": "EURUSD=X", "N": "EUR/USD (ユーロドル)"},
-    {"C": "💱 Forex", "T": "GBPUSD=X", "N": "GBP/USD (ポンドドル)"},
-    {"C": "💱 Forex", "T": "AUDUSD=X", "N": "AUD/USD (豪ドル米ドル)"},
-    {"C": "💱 Forex", "T": "NZDUSD=X", "N": "NZD/USD (NZドル米ドル)"},
-    {"C": "💱 Forex", "T": "USDCAD=X", "N": "USD/CAD (ドルカナダ)"},
-    {"C": "💱 Forex", "T": "USDCHF=X", "N": "USD/CHF (ドルフラン)"},
-    {"C": "💱 Forex", "T": "CNY=X", "N": "USD/CNY (ドル人民元)"},
-    {"C": "💱 Forex", "T": "HKD=X", "N": "USD/HKD (ドル香港ドル)"},
-    {"C": "💱 Forex", "T": "SGD=X", "N": "USD/SGD (ドルシンガポールドル)"},
-    {"C": "💱 Forex", "T": "INR=X", "N": "USD/INR (ドルルピー)"},
-    {"C": "💱 Forex", "T": "MXN=X", "N": "USD/MXN (ドルメキシコペソ)"},
-    {"C": "💱 Forex", "T": "BRL=X", "N": "USD/BRL (ドルレアル)"},
-    {"C": "💱 Forex", "T": "TRY=X", "N": "USD/TRY (ドルトルコリラ)"},
-    {"C": "💱 Forex", "T": "ZAR=X", "N": "USD/ZAR (ドルランド)"},
-    {"C": "💱 Forex", "T": "RUB=X", "N": "USD/RUB (ドルルーブル)"},
-    {"C": "💱 Forex", "T": "KRW=X", "N": "USD/KRW (ドルウォン)"},
-    {"C": "💱 Forex", "T": "TWD=X", "N": "USD/TWD (ドル台湾ドル)"},
-    {"C": "💱 Forex", "T": "DX-Y.NYB", "N": "Dollar Index (DXY)"},
-]
-# --- 米国株 ---
-US_TECH = [
-    {"C": "🇺🇸 Tech", "T": "AAPL", "N": "Apple"},
-    {"C": "🇺🇸 Tech", "T": "MSFT", "N": "Microsoft"},
-    {"C": "🇺🇸 Tech", "T": "NVDA", "N": "NVIDIA"},
-    {"C": "🇺🇸 Tech", "T": "GOOGL", "N": "Google (Alphabet)"},
-    {"C": "🇺🇸 Tech", "T": "AMZN", "N": "Amazon"},
-    {"C": "🇺🇸 Tech", "T": "META", "N": "Meta Platforms"},
-    {"C": "🇺🇸 Tech", "T": "TSLA", "N": "Tesla"},
-    {"C": "🇺🇸 Tech", "T": "AVGO", "N": "Broadcom"},
-    {"C": "🇺🇸 Tech", "T": "AMD", "N": "AMD"},
-    {"C": "🇺🇸 Tech", "T": "INTC", "N": "Intel"},
-    {"C": "🇺🇸 Tech", "T": "QCOM", "N": "Qualcomm"},
-    {"C": "🇺🇸 Tech", "T": "TXN", "N": "Texas Instruments"},
-    {"C": "🇺🇸 Tech", "T": "MU", "N": "Micron Technology"},
-    {"C": "🇺🇸 Tech", "T": "AMAT", "N": "Applied Materials"},
-    {"C": "🇺🇸 Tech", "T": "LRCX", "N": "Lam Research"},
-    {"C": "🇺🇸 Tech", "T": "ADI", "N": "Analog Devices"},
-    {"C": "🇺🇸 Tech", "T": "KLAC", "N": "KLA Corp"},
-    {"C": "🇺🇸 Tech", "T": "ASML", "N": "ASML Holding"},
-    {"C": "🇺🇸 Tech", "T": "TSM", "N": "TSMC"},
-    {"C": "🇺🇸 Tech", "T": "ARM", "N": "Arm Holdings"},
-    {"C": "🇺🇸 Tech", "T": "ORCL", "N": "Oracle"},
-    {"C": "🇺🇸 Tech", "T": "CRM", "N": "Salesforce"},
-    {"C": "🇺🇸 Tech", "T": "ADBE", "N": "Adobe"},
-    {"C": "🇺🇸 Tech", "T": "CSCO", "N": "Cisco Systems"},
-    {"C": "🇺🇸 Tech", "T": "IBM", "N": "IBM"},
-    {"C": "🇺🇸 Tech", "T": "NOW", "N": "ServiceNow"},
-    {"C": "🇺🇸 Tech", "T": "INTU", "N": "Intuit"},
-    {"C": "🇺🇸 Tech", "T": "SAP", "N": "SAP"},
-    {"C": "🇺🇸 Tech", "T": "UBER", "N": "Uber Technologies"},
-    {"C": "🇺🇸 Tech", "T": "ABNB", "N": "Airbnb"},
-    {"C": "🇺🇸 Tech", "T": "BKNG", "N": "Booking Holdings"},
-    {"C": "🇺🇸 Tech", "T": "PANW", "N": "Palo Alto Networks"},
-    {"C": "🇺🇸 Tech", "T": "CRWD", "N": "CrowdStrike"},
-    {"C": "🇺🇸 Tech", "T": "FTNT", "N": "Fortinet"},
-    {"C": "🇺🇸 Tech", "T": "ZS", "N": "Zscaler"},
-    {"C": "🇺🇸 Tech", "T": "PLTR", "N": "Palantir"},
-    {"C": "🇺🇸 Tech", "T": "SNOW", "N": "Snowflake"},
-    {"C": "🇺🇸 Tech", "T": "DDOG", "N": "Datadog"},
-    {"C": "🇺🇸 Tech", "T": "SQ", "N": "Block (Square)"},
-    {"C": "🇺🇸 Tech", "T": "PYPL", "N": "PayPal"},
-    {"C": "🇺🇸 Tech", "T": "SHOP", "N": "Shopify"},
-    {"C": "🇺🇸 Tech", "T": "COIN", "N": "Coinbase"},
-    {"C": "🇺🇸 Tech", "T": "HOOD", "N": "Robinhood"},
-    {"C": "🇺🇸 Tech", "T": "RBLX", "N": "Roblox"},
-    {"C": "🇺🇸 Tech", "T": "U", "N": "Unity Software"},
-    {"C": "🇺🇸 Tech", "T": "NET", "N": "Cloudflare"},
-    {"C": "🇺🇸 Tech", "T": "MDB", "N": "MongoDB"},
-    {"C": "🇺🇸 Tech", "T": "TEAM", "N": "Atlassian"},
-    {"C": "🇺🇸 Tech", "T": "WDAY", "N": "Workday"},
-    {"C": "🇺🇸 Tech", "T": "ZM", "N": "Zoom Video"},
-    {"C": "🇺🇸 Tech", "T": "DOCU", "N": "DocuSign"},
-    {"C": "🇺🇸 Tech", "T": "OKTA", "N": "Okta"},
-    {"C": "🇺🇸 Tech", "T": "TWLO", "N": "Twilio"},
-    {"C": "🇺🇸 Tech", "T": "SPOT", "N": "Spotify"},
-    {"C": "🇺🇸 Tech", "T": "SNAP", "N": "Snap"},
-    {"C": "🇺🇸 Tech", "T": "PINS", "N": "Pinterest"},
-    {"C": "🇺🇸 Tech", "T": "ROKU", "N": "Roku"},
-    {"C": "🇺🇸 Tech", "T": "EA", "N": "Electronic Arts"},
-    {"C": "🇺🇸 Tech", "T": "ATVI", "N": "Activision Blizzard"},
-]
-US_MAJOR = [
-    {"C": "🇺🇸 Major", "T": "JPM", "N": "JPMorgan Chase"},
-    {"C": "🇺🇸 Major", "T": "BAC", "N": "Bank of America"},
-    {"C": "🇺🇸 Major", "T": "WFC", "N": "Wells Fargo"},
-    {"C": "🇺🇸 Major", "T": "C", "N": "Citigroup"},
-    {"C": "🇺🇸 Major", "T": "GS", "N": "Goldman Sachs"},
-    {"C": "🇺🇸 Major", "T": "MS", "N": "Morgan Stanley"},
-    {"C": "🇺🇸 Major", "T": "BLK", "N": "BlackRock"},
-    {"C": "🇺🇸 Major", "T": "V", "N": "Visa"},
-    {"C": "🇺🇸 Major", "T": "MA", "N": "Mastercard"},
-    {"C": "🇺🇸 Major", "T": "AXP", "N": "American Express"},
-    {"C": "🇺🇸 Major", "T": "BRK-B", "N": "Berkshire Hathaway"},
-    {"C": "🇺🇸 Major", "T": "WMT", "N": "Walmart"},
-    {"C": "🇺🇸 Major", "T": "TGT", "N": "Target"},
-    {"C": "🇺🇸 Major", "T": "COST", "N": "Costco"},
-    {"C": "🇺🇸 Major", "T": "HD", "N": "Home Depot"},
-    {"C": "🇺🇸 Major", "T": "LOW", "N": "Lowe's"},
-    {"C": "🇺🇸 Major", "T": "PG", "N": "Procter & Gamble"},
-    {"C": "🇺🇸 Major", "T": "KO", "N": "Coca-Cola"},
-    {"C": "🇺🇸 Major", "T": "PEP", "N": "PepsiCo"},
-    {"C": "🇺🇸 Major", "T": "MCD", "N": "McDonald's"},
-    {"C": "🇺🇸 Major", "T": "SBUX", "N": "Starbucks"},
-    {"C": "🇺🇸 Major", "T": "CMG", "N": "Chipotle"},
-    {"C": "🇺🇸 Major", "T": "YUM", "N": "Yum! Brands"},
-    {"C": "🇺🇸 Major", "T": "NKE", "N": "Nike"},
-    {"C": "🇺🇸 Major", "T": "LULU", "N": "Lululemon"},
-    {"C": "🇺🇸 Major", "T": "DIS", "N": "Disney"},
-    {"C": "🇺🇸 Major", "T": "CMCSA", "N": "Comcast"},
-    {"C": "🇺🇸 Major", "T": "NFLX", "N": "Netflix"},
-    {"C": "🇺🇸 Major", "T": "WBD", "N": "Warner Bros. Discovery"},
-    {"C": "🇺🇸 Major", "T": "JNJ", "N": "Johnson & Johnson"},
-    {"C": "🇺🇸 Major", "T": "LLY", "N": "Eli Lilly"},
-    {"C": "🇺🇸 Major", "T": "UNH", "N": "UnitedHealth"},
-    {"C": "🇺🇸 Major", "T": "PFE", "N": "Pfizer"},
-    {"C": "🇺🇸 Major", "T": "MRK", "N": "Merck"},
-    {"C": "🇺🇸 Major", "T": "ABBV", "N": "AbbVie"},
-    {"C": "🇺🇸 Major", "T": "AMGN", "N": "Amgen"},
-    {"C": "🇺🇸 Major", "T": "GILD", "N": "Gilead Sciences"},
-    {"C": "🇺🇸 Major", "T": "CVX", "N": "Chevron"},
-    {"C": "🇺🇸 Major", "T": "XOM", "N": "Exxon Mobil"},
-    {"C": "🇺🇸 Major", "T": "COP", "N": "ConocoPhillips"},
-    {"C": "🇺🇸 Major", "T": "SLB", "N": "Schlumberger"},
-    {"C": "🇺🇸 Major", "T": "GE", "N": "General Electric"},
-    {"C": "🇺🇸 Major", "T": "CAT", "N": "Caterpillar"},
-    {"C": "🇺🇸 Major", "T": "DE", "N": "John Deere"},
-    {"C": "🇺🇸 Major", "T": "HON", "N": "Honeywell"},
-    {"C": "🇺🇸 Major", "T": "UPS", "N": "UPS"},
-    {"C": "🇺🇸 Major", "T": "FDX", "N": "FedEx"},
-    {"C": "🇺🇸 Major", "T": "BA", "N": "Boeing"},
-    {"C": "🇺🇸 Major", "T": "LMT", "N": "Lockheed Martin"},
-    {"C": "🇺🇸 Major", "T": "RTX", "N": "Raytheon"},
-    {"C": "🇺🇸 Major", "T": "GD", "N": "General Dynamics"},
-    {"C": "🇺🇸 Major", "T": "NOC", "N": "Northrop Grumman"},
-    {"C": "🇺🇸 Major", "T": "MMM", "N": "3M"},
-    {"C": "🇺🇸 Major", "T": "F", "N": "Ford Motor"},
-    {"C": "🇺🇸 Major", "T": "GM", "N": "General Motors"},
-    {"C": "🇺🇸 Major", "T": "TM", "N": "Toyota Motor (ADR)"},
-    {"C": "🇺🇸 Major", "T": "HMC", "N": "Honda Motor (ADR)"},
-    {"C": "🇺🇸 Major", "T": "T", "N": "AT&T"},
-    {"C": "🇺🇸 Major", "T": "VZ", "N": "Verizon"},
-    {"C": "🇺🇸 Major", "T": "TMUS", "N": "T-Mobile US"},
-]
-# --- 日本株 ---
-JAPAN = [
-    {"C": "🇯🇵 Japan", "T": "7203.T", "N": "トヨタ自動車"},
-    {"C": "🇯🇵 Japan", "T": "6758.T", "N": "ソニーグループ"},
-    {"C": "🇯🇵 Japan", "T": "9984.T", "N": "ソフトバンクグループ"},
-    {"C": "🇯🇵 Japan", "T": "9434.T", "N": "ソフトバンク"},
-    {"C": "🇯🇵 Japan", "T": "9432.T", "N": "NTT"},
-    {"C": "🇯🇵 Japan", "T": "9433.T", "N": "KDDI"},
-    {"C": "🇯🇵 Japan", "T": "8306.T", "N": "三菱UFJフィナンシャル"},
-    {"C": "🇯🇵 Japan", "T": "8316.T", "N": "三井住友フィナンシャル"},
-    {"C": "🇯🇵 Japan", "T": "8411.T", "N": "みずほフィナンシャル"},
-    {"C": "🇯🇵 Japan", "T": "8035.T", "N": "東京エレクトロン"},
-    {"C": "🇯🇵 Japan", "T": "6857.T", "N": "アドバンテスト"},
-    {"C": "🇯🇵 Japan", "T": "6146.T", "N": "ディスコ"},
-    {"C": "🇯🇵 Japan", "T": "7735.T", "N": "SCREENホールディングス"},
-    {"C": "🇯🇵 Japan", "T": "6920.T", "N": "レーザーテック"},
-    {"C": "🇯🇵 Japan", "T": "6861.T", "N": "キーエンス"},
-    {"C": "🇯🇵 Japan", "T": "4063.T", "N": "信越化学工業"},
-    {"C": "🇯🇵 Japan", "T": "6594.T", "N": "ニデック"},
-    {"C": "🇯🇵 Japan", "T": "6981.T", "N": "村田製作所"},
-    {"C": "🇯🇵 Japan", "T": "6954.T", "N": "ファナック"},
-    {"C": "🇯🇵 Japan", "T": "6301.T", "N": "小松製作所 (コマツ)"},
-    {"C": "🇯🇵 Japan", "T": "7011.T", "N": "三菱重工業"},
-    {"C": "🇯🇵 Japan", "T": "7012.T", "N": "川崎重工業"},
-    {"C": "🇯🇵 Japan", "T": "7013.T", "N": "IHI"},
-    {"C": "🇯🇵 Japan", "T": "6501.T", "N": "日立製作所"},
-    {"C": "🇯🇵 Japan", "T": "6701.T", "N": "NEC"},
-    {"C": "🇯🇵 Japan", "T": "6702.T", "N": "富士通"},
-    {"C": "🇯🇵 Japan", "T": "7741.T", "N": "HOYA"},
-    {"C": "🇯🇵 Japan", "T": "7751.T", "N": "キヤノン"},
-    {"C": "🇯🇵 Japan", "T": "6902.T", "N": "デンソー"},
-    {"C": "🇯🇵 Japan", "T": "7267.T", "N": "本田技研工業 (ホンダ)"},
-    {"C": "🇯🇵 Japan", "T": "7201.T", "N": "日産自動車"},
-    {"C": "🇯🇵 Japan", "T": "7270.T", "N": "SUBARU"},
-    {"C": "🇯🇵 Japan", "T": "7202.T", "N": "いすゞ自動車"},
-    {"C": "🇯🇵 Japan", "T": "7269.T", "N": "スズキ"},
-    {"C": "🇯🇵 Japan", "T": "9983.T", "N": "ファーストリテイリング"},
-    {"C": "🇯🇵 Japan", "T": "7974.T", "N": "任天堂"},
-    {"C": "🇯🇵 Japan", "T": "9766.T", "N": "コナミグループ"},
-    {"C": "🇯🇵 Japan", "T": "9684.T", "N": "スクウェア・エニックス"},
-    {"C": "🇯🇵 Japan", "T": "7832.T", "N": "バンダイナムコ"},
-    {"C": "🇯🇵 Japan", "T": "9613.T", "N": "NTTデータ"},
-    {"C": "🇯🇵 Japan", "T": "8001.T", "N": "伊藤忠商事"},
-    {"C": "🇯🇵 Japan", "T": "8058.T", "N": "三菱商事"},
-    {"C": "🇯🇵 Japan", "T": "8031.T", "N": "三井物産"},
-    {"C": "🇯🇵 Japan", "T": "8002.T", "N": "丸紅"},
-    {"C": "🇯🇵 Japan", "T": "8053.T", "N": "住友商事"},
-    {"C": "🇯🇵 Japan", "T": "2768.T", "N": "双日"},
-    {"C": "🇯🇵 Japan", "T": "8015.T", "N": "豊田通商"},
-    {"C": "🇯🇵 Japan", "T": "6098.T", "N": "リクルートホールディングス"},
-    {"C": "🇯🇵 Japan", "T": "4661.T", "N": "オリエンタルランド"},
-    {"C": "🇯🇵 Japan", "T": "2914.T", "N": "日本たばこ産業 (JT)"},
-    {"C": "🇯🇵 Japan", "T": "4502.T", "N": "武田薬品工業"},
-    {"C": "🇯🇵 Japan", "T": "4519.T", "N": "中外製薬"},
-    {"C": "🇯🇵 Japan", "T": "4568.T", "N": "第一三共"},
-    {"C": "🇯🇵 Japan", "T": "4503.T", "N": "アステラス製薬"},
-    {"C": "🇯🇵 Japan", "T": "4523.T", "N": "エーザイ"},
-    {"C": "🇯🇵 Japan", "T": "4911.T", "N": "資生堂"},
-    {"C": "🇯🇵 Japan", "T": "4452.T", "N": "花王"},
-    {"C": "🇯🇵 Japan", "T": "8766.T", "N": "東京海上ホールディングス"},
-    {"C": "🇯🇵 Japan", "T": "8725.T", "N": "MS&AD"},
-    {"C": "🇯🇵 Japan", "T": "8630.T", "N": "SOMPO"},
-    {"C": "🇯🇵 Japan", "T": "8801.T", "N": "三井不動産"},
-    {"C": "🇯🇵 Japan", "T": "8802.T", "N": "三菱地所"},
-    {"C": "🇯🇵 Japan", "T": "1925.T", "N": "大和ハウス工業"},
-    {"C": "🇯🇵 Japan", "T": "1928.T", "N": "積水ハウス"},
-    {"C": "🇯🇵 Japan", "T": "9020.T", "N": "JR東日本"},
-    {"C": "🇯🇵 Japan", "T": "9022.T", "N": "JR東海"},
-    {"C": "🇯🇵 Japan", "T": "9021.T", "N": "JR西日本"},
-    {"C": "🇯🇵 Japan", "T": "9201.T", "N": "日本航空 (JAL)"},
-    {"C": "🇯🇵 Japan", "T": "9202.T", "N": "ANAホールディングス"},
-    {"C": "🇯🇵 Japan", "T": "9101.T", "N": "日本郵船"},
-    {"C": "🇯🇵 Japan", "T": "9104.T", "N": "商船三井"},
-    {"C": "🇯🇵 Japan", "T": "9107.T", "N": "川崎汽船"},
-    {"C": "🇯🇵 Japan", "T": "1605.T", "N": "INPEX"},
-    {"C": "🇯🇵 Japan", "T": "5020.T", "N": "ENEOS"},
-    {"C": "🇯🇵 Japan", "T": "5401.T", "N": "日本製鉄"},
-    {"C": "🇯🇵 Japan", "T": "5411.T", "N": "JFE"},
-    {"C": "🇯🇵 Japan", "T": "3402.T", "N": "東レ"},
-    {"C": "🇯🇵 Japan", "T": "3407.T", "N": "旭化成"},
-    {"C": "🇯🇵 Japan", "T": "6367.T", "N": "ダイキン工業"},
-    {"C": "🇯🇵 Japan", "T": "2802.T", "N": "味の素"},
-]
-# --- ETF / 指数 ---
-ETF = [
-    {"C": "📊 ETF", "T": "^GSPC", "N": "S&P 500 Index"},
-    {"C": "📊 ETF", "T": "^DJI", "N": "Dow Jones Industrial Average"},
-    {"C": "📊 ETF", "T": "^IXIC", "N": "NASDAQ Composite"},
-    {"C": "📊 ETF", "T": "^NDX", "N": "NASDAQ 100"},
-    {"C": "📊 ETF", "T": "^RUT", "N": "Russell 2000"},
-    {"C": "📊 ETF", "T": "^VIX", "N": "CBOE Volatility Index"},
-    {"C": "📊 ETF", "T": "^N225", "N": "Nikkei 225"},
-    {"C": "📊 ETF", "T": "^STOXX50E", "N": "Euro Stoxx 50"},
-    {"C": "📊 ETF", "T": "^FTSE", "N": "FTSE 100 (UK)"},
-    {"C": "📊 ETF", "T": "^GDAXI", "N": "DAX (Germany)"},
-    {"C": "📊 ETF", "T": "^FCHI", "N": "CAC 40 (France)"},
-    {"C": "📊 ETF", "T": "^HSI", "N": "Hang Seng Index"},
-    {"C": "📊 ETF", "T": "000001.SS", "N": "SSE Composite (China)"},
-    {"C": "📊 ETF", "T": "^BSESN", "N": "BSE SENSEX (India)"},
-    {"C": "📊 ETF", "T": "VOO", "N": "Vanguard S&P 500 ETF"},
-    {"C": "📊 ETF", "T": "IVV", "N": "iShares Core S&P 500 ETF"},
-    {"C": "📊 ETF", "T": "SPY", "N": "SPDR S&P 500 ETF Trust"},
-    {"C": "📊 ETF", "T": "VTI", "N": "Vanguard Total Stock Market"},
-    {"C": "📊 ETF", "T": "VT", "N": "Vanguard Total World Stock"},
-    {"C": "📊 ETF", "T": "QQQ", "N": "Invesco QQQ Trust"},
-    {"C": "📊 ETF", "T": "DIA", "N": "SPDR Dow Jones Industrial Average"},
-    {"C": "📊 ETF", "T": "IWM", "N": "iShares Russell 2000 ETF"},
-    {"C": "📊 ETF", "T": "VTV", "N": "Vanguard Value ETF"},
-    {"C": "📊 ETF", "T": "VUG", "N": "Vanguard Growth ETF"},
-    {"C": "📊 ETF", "T": "VYM", "N": "Vanguard High Dividend Yield"},
-    {"C": "📊 ETF", "T": "VIG", "N": "Vanguard Dividend Appreciation"},
-    {"C": "📊 ETF", "T": "SPYD", "N": "SPDR Portfolio S&P 500 High Dividend"},
-    {"C": "📊 ETF", "T": "HDV", "N": "iShares Core High Dividend"},
-    {"C": "📊 ETF", "T": "DVY", "N": "iShares Select Dividend"},
-    {"C": "📊 ETF", "T": "XLK", "N": "Technology Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLF", "N": "Financial Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLV", "N": "Health Care Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLE", "N": "Energy Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLI", "N": "Industrial Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLP", "N": "Consumer Staples Select Sector"},
-    {"C": "📊 ETF", "T": "XLY", "N": "Consumer Discret Select Sector"},
-    {"C": "📊 ETF", "T": "XLC", "N": "Communication Services Select"},
-    {"C": "📊 ETF", "T": "XLB", "N": "Materials Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLU", "N": "Utilities Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "XLRE", "N": "Real Estate Select Sector SPDR"},
-    {"C": "📊 ETF", "T": "SMH", "N": "VanEck Semiconductor ETF"},
-    {"C": "📊 ETF", "T": "SOXX", "N": "iShares Semiconductor ETF"},
-    {"C": "📊 ETF", "T": "ARKK", "N": "ARK Innovation ETF"},
-    {"C": "📊 ETF", "T": "GLD", "N": "SPDR Gold Shares"},
-    {"C": "📊 ETF", "T": "IAU", "N": "iShares Gold Trust"},
-    {"C": "📊 ETF", "T": "SLV", "N": "iShares Silver Trust"},
-    {"C": "📊 ETF", "T": "USO", "N": "United States Oil Fund"},
-    {"C": "📊 ETF", "T": "VEA", "N": "Vanguard FTSE Developed Markets"},
-    {"C": "📊 ETF", "T": "VWO", "N": "Vanguard FTSE Emerging Markets"},
-    {"C": "📊 ETF", "T": "EEM", "N": "iShares MSCI Emerging Markets"},
-    {"C": "📊 ETF", "T": "EFA", "N": "iShares MSCI EAFE ETF"},
-    {"C": "📊 ETF", "T": "EWJ", "N": "iShares MSCI Japan ETF"},
-    {"C": "📊 ETF", "T": "FXI", "N": "iShares China Large-Cap ETF"},
-    {"C": "📊 ETF", "T": "INDA", "N": "iShares MSCI India ETF"},
-    {"C": "📊 ETF", "T": "EPI", "N": "WisdomTree India Earnings"},
-    {"C": "📊 ETF", "T": "VNQ", "N": "Vanguard Real Estate ETF"},
-    {"C": "📊 ETF", "T": "AGG", "N": "iShares Core US Aggregate Bond"},
-    {"C": "📊 ETF", "T": "BND", "N": "Vanguard Total Bond Market"},
-    {"C": "📊 ETF", "T": "LQD", "N": "iShares iBoxx Investment Grade"},
-    {"C": "📊 ETF", "T": "HYG", "N": "iShares iBoxx High Yield"},
-]
-# --- 暗号資産 ---
-CRYPTO = [
-    {"C": "🪙 Crypto", "T": "BTC-USD", "N": "Bitcoin"},
-    {"C": "🪙 Crypto", "T": "ETH-USD", "N": "Ethereum"},
-    {"C": "🪙 Crypto", "T": "USDT-USD", "N": "Tether"},
-    {"C": "🪙 Crypto", "T": "BNB-USD", "N": "BNB"},
-    {"C": "🪙 Crypto", "T": "XRP-USD", "N": "XRP"},
-    {"C": "🪙 Crypto", "T": "SOL-USD", "N": "Solana"},
-    {"C": "🪙 Crypto", "T": "USDC-USD", "N": "USDC"},
-    {"C": "🪙 Crypto", "T": "ADA-USD", "N": "Cardano"},
-    {"C": "🪙 Crypto", "T": "AVAX-USD", "N": "Avalanche"},
-    {"C": "🪙 Crypto", "T": "DOGE-USD", "N": "Dogecoin"},
-    {"C": "🪙 Crypto", "T": "TRX-USD", "N": "TRON"},
-    {"C": "🪙 Crypto", "T": "DOT-USD", "N": "Polkadot"},
-    {"C": "🪙 Crypto", "T": "LINK-USD", "N": "Chainlink"},
-    {"C": "🪙 Crypto", "T": "MATIC-USD", "N": "Polygon"},
-    {"C": "🪙 Crypto", "T": "WBTC-USD", "N": "Wrapped Bitcoin"},
-    {"C": "🪙 Crypto", "T": "LTC-USD", "N": "Litecoin"},
-    {"C": "🪙 Crypto", "T": "SHIB-USD", "N": "Shiba Inu"},
-    {"C": "🪙 Crypto", "T": "DAI-USD", "N": "Dai"},
-    {"C": "🪙 Crypto", "T": "BCH-USD", "N": "Bitcoin Cash"},
-    {"C": "🪙 Crypto", "T": "UNI7083-USD", "N": "Uniswap"},
-    {"C": "🪙 Crypto", "T": "ATOM-USD", "N": "Cosmos"},
-    {"C": "🪙 Crypto", "T": "XLM-USD", "N": "Stellar"},
-    {"C": "🪙 Crypto", "T": "XMR-USD", "N": "Monero"},
-    {"C": "🪙 Crypto", "T": "ETC-USD", "N": "Ethereum Classic"},
-    {"C": "🪙 Crypto", "T": "FIL-USD", "N": "Filecoin"},
-]
-# --- 欧州・その他 ---
-GLOBAL = [
-    {"C": "🇪🇺 Global", "T": "NESN.SW", "N": "Nestle (Swiss)"},
-    {"C": "🇪🇺 Global", "T": "ROG.SW", "N": "Roche (Swiss)"},
-    {"C": "🇪🇺 Global", "T": "NOVN.SW", "N": "Novartis (Swiss)"},
-    {"C": "🇪🇺 Global", "T": "MC.PA", "N": "LVMH (France)"},
-    {"C": "🇪🇺 Global", "T": "OR.PA", "N": "L'Oreal (France)"},
-    {"C": "🇪🇺 Global", "T": "RMS.PA", "N": "Hermes (France)"},
-    {"C": "🇪🇺 Global", "T": "TTE.PA", "N": "TotalEnergies (France)"},
-    {"C": "🇪🇺 Global", "T": "SAN.PA", "N": "Sanofi (France)"},
-    {"C": "🇪🇺 Global", "T": "AIR.PA", "N": "Airbus (France)"},
-    {"C": "🇪🇺 Global", "T": "ASML.AS", "N": "ASML (Netherlands)"},
-    {"C": "🇪🇺 Global", "T": "SIE.DE", "N": "Siemens (Germany)"},
-    {"C": "🇪🇺 Global", "T": "SAP.DE", "N": "SAP (Germany)"},
-    {"C": "🇪🇺 Global", "T": "DTE.DE", "N": "Deutsche Telekom (Germany)"},
-    {"C": "🇪🇺 Global", "T": "ALV.DE", "N": "Allianz (Germany)"},
-    {"C": "🇪🇺 Global", "T": "VOW3.DE", "N": "Volkswagen (Germany)"},
-    {"C": "🇪🇺 Global", "T": "MBG.DE", "N": "Mercedes-Benz (Germany)"},
-    {"C": "🇪🇺 Global", "T": "BMW.DE", "N": "BMW (Germany)"},
-    {"C": "🇪🇺 Global", "T": "AZN.L", "N": "AstraZeneca (UK)"},
-    {"C": "🇪🇺 Global", "T": "SHEL.L", "N": "Shell (UK)"},
-    {"C": "🇪🇺 Global", "T": "HSBA.L", "N": "HSBC (UK)"},
-    {"C": "🇪🇺 Global", "T": "ULVR.L", "N": "Unilever (UK)"},
-    {"C": "🇪🇺 Global", "T": "BP.L", "N": "BP (UK)"},
-    {"C": "🇪🇺 Global", "T": "RIO.L", "N": "Rio Tinto (UK)"},
-    {"C": "🇪🇺 Global", "T": "GSK.L", "N": "GSK (UK)"},
-    {"C": "🇪🇺 Global", "T": "005930.KS", "N": "Samsung Electronics (Korea)"},
-    {"C": "🇪🇺 Global", "T": "000660.KS", "N": "SK Hynix (Korea)"},
-    {"C": "🇪🇺 Global", "T": "2330.TW", "N": "TSMC (Taiwan)"},
-    {"C": "🇪🇺 Global", "T": "BABA", "N": "Alibaba (China/ADR)"},
-    {"C": "🇪🇺 Global", "T": "PDD", "N": "PDD Holdings (China/ADR)"},
-    {"C": "🇪🇺 Global", "T": "JD", "N": "JD.com (China/ADR)"},
-    {"C": "🇪🇺 Global", "T": "BIDU", "N": "Baidu (China/ADR)"},
-    {"C": "🇪🇺 Global", "T": "NIO", "N": "NIO (China/ADR)"},
-    {"C": "🇪🇺 Global", "T": "INFY", "N": "Infosys (India/ADR)"},
-    {"C": "🇪🇺 Global", "T": "HDB", "N": "HDFC Bank (India/ADR)"},
-    {"C": "🇪🇺 Global", "T": "VALE", "N": "Vale (Brazil/ADR)"},
-    {"C": "🇪🇺 Global", "T": "PBR", "N": "Petrobras (Brazil/ADR)"},
-    {"C": "🇪🇺 Global", "T": "RY", "N": "Royal Bank of Canada"},
-    {"C": "🇪🇺 Global", "T": "TD", "N": "TD Bank (Canada)"},
-    {"C": "🇪🇺 Global", "T": "SHOP", "N": "Shopify (Canada)"},
-]
-
-TICKER_DATA_RAW = BONDS + FOREX + US_TECH + US_MAJOR + JAPAN + ETF + CRYPTO + GLOBAL
-ticker_df_master = pd.DataFrame(TICKER_DATA_RAW).rename(columns={"C": "Category", "T": "Ticker", "N": "Name"})
-TICKER_NAME_MAP = {item['T']: item['N'] for item in TICKER_DATA_RAW}
-
-# --- 3. 関数群 ---
-
-def calculate_technicals(df):
-    df['SMA20'] = df['Close'].rolling(20).mean()
-    df['SMA50'] = df['Close'].rolling(50).mean()
-    delta = df['Close'].diff()
-    gain = (delta.where(delta>0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta<0, 0)).rolling(14).mean()
-    rs = gain/loss
-    df['RSI'] = 100 - (100/(1+rs))
-    e12 = df['Close'].ewm(span=12).mean()
-    e26 = df['Close'].ewm(span=26).mean()
-    df['MACD'] = e12 - e26
-    df['Signal'] = df['MACD'].ewm(span=9).mean()
-    return df
-
-@st.cache_data(ttl=300)
-def get_stock_data(ticker, period_key):
-    if not ticker: return None, None, None
-    p_map = {
-        "1日": "1d", "1週間": "5d", "1ヶ月": "1mo", "3ヶ月": "3mo",
-        "6ヶ月": "6mo", "1年": "1y", "3年": "3y", "5年": "5y",
-        "10年": "10y", "全期間": "max"
-    }
-    i_map = {"1日": "15m", "1週間": "60m"}
-    yf_p = p_map.get(period_key, "1y")
-    yf_i = i_map.get(period_key, "1d")
-    
-    try:
-        stock = yf.Ticker(ticker)
-        if period_key == "3年":
-            start = datetime.now() - timedelta(days=365*3)
-            df = stock.history(start=start, interval=yf_i)
-        else:
-            df = stock.history(period=yf_p, interval=yf_i)
-            
-        if df.empty: return None, None, None
-        df = calculate_technicals(df)
-        
-        fin_df = pd.DataFrame()
-        try: fin_df = stock.financials
-        except: pass
-        
-        return df, fin_df, stock.info
-    except:
-        return None, None, None
-
-def clean_search_term(text):
-    if not text: return ""
-    text = text.replace('（', '(').split('(')[0].strip()
-    stopwords = ["Inc", "Corp", "Corporation", "Ltd", "Limited", "Holdings", "Group", "Company"]
-    words = text.split()
-    cleaned = [w for w in words if w.strip(',.') not in stopwords]
-    return " ".join(cleaned)
-
-@st.cache_data(ttl=600)
-def fetch_news_hybrid(tickers):
-    """
-    【最強ハイブリッド版】
-    1. Yahoo RSS (Ticker直結) -> 確実性重視
-    2. NewsAPI (Keyword検索) -> 関連性重視 (APIキー使用)
-    両方を結合して返す。
-    """
-    if not tickers: return []
-    
-    articles = []
-    seen_links = set()
-    target_tickers = tickers[:5]
-    
-    # --- A. Yahoo Finance RSS (バックアップ・確実) ---
-    for t in target_tickers:
-        try:
-            rss_url = f"https://finance.yahoo.com/rss/headline?s={t}"
-            feed = feedparser.parse(rss_url)
-            for entry in feed.entries[:5]:
-                if entry.link not in seen_links:
-                    pub = entry.published[:16] if 'published' in entry else "Recent"
-                    articles.append({
-                        "title": entry.title,
-                        "link": entry.link,
-                        "published": pub,
-                        "source": f"Yahoo RSS ({t})"
-                    })
-                    seen_links.add(entry.link)
-        except: pass
-
-    # --- B. NewsAPI (APIキー使用・広範) ---
-    try:
-        search_keywords = []
-        for t in target_tickers:
-            name = TICKER_NAME_MAP.get(t, t)
-            clean = clean_search_term(name)
-            if len(clean) >= 2: search_keywords.append(clean)
-            
-        unique_keywords = list(set(search_keywords))
-        if unique_keywords:
-            query = " OR ".join(unique_keywords[:8]) # API制限考慮
-            
-            # 英語
-            try:
-                en = newsapi.get_everything(q=query, language='en', sort_by='publishedAt', page_size=20)
-                for a in en.get('articles', []):
-                    if a['url'] not in seen_links:
-                        articles.append({
-                            "title": a['title'],
-                            "link": a['url'],
-                            "published": a['publishedAt'][:10],
-                            "source": f"NewsAPI ({a['source']['name']})"
-                        })
-                        seen_links.add(a['url'])
-            except: pass
-            
-            # 日本語
-            try:
-                jp = newsapi.get_everything(q=query, language='jp', sort_by='publishedAt', page_size=20)
-                for a in jp.get('articles', []):
-                    if a['url'] not in seen_links:
-                        articles.append({
-                            "title": a['title'],
-                            "link": a['url'],
-                            "published": a['publishedAt'][:10],
-                            "source": f"NewsAPI JP ({a['source']['name']})"
-                        })
-                        seen_links.add(a['url'])
-            except: pass
-    except: pass
+# --- 財務・銘柄情報 (四半期・日単位でしか変わらないので st.cache_data に長期キャッシュ) ---
+@st.cache_data(ttl=60*60*24*7)
+def get_fundamentals(ticker, report_period):
+    """財務諸表 (決算期ごとにキーを変える。失敗時は例外 = キャッシュしない)"""
+    return core.fetch_fundamentals(ticker)
 
-    return articles
+@st.cache_data(ttl=60*60*24)
+def get_ticker_info(ticker):
+    return core.fetch_ticker_info(ticker)
 
-def fetch_watchlist():
-    try:
-        return pd.DataFrame(supabase.table("watchlist").select("*").order("created_at", desc=True).execute().data)
-    except:
-        return pd.DataFrame()
+def cached_call(name, fn, *args):
+    """st.cache_data 関数を呼び、本体が実行されたか (miss) を数える"""
+    before = core.span_count(name)
+    out = fn(*args)
+    core.cache_event(name, "miss" if core.span_count(name) > before else "hit")
+    return out
 
-def add_to_watchlist(ticker, note):
-    try:
-        supabase.table("watchlist").insert({"ticker": ticker, "note": note}).execute()
-        return True
-    except:
-        return False
+# --- チャート描画 ---
+WEBGL_THRESHOLD = 5000     # 図全体の点数がこれを超えたら Scattergl
 
-def delete_from_watchlist(item_id):
-    try:
-        supabase.table("watchlist").delete().eq("id", item_id).execute()
-    except:
-        pass
+def line_trace(x, y, total_points=0, **kw):
+    # 点数が多い図は WebGL で描画
+    return (go.Scattergl if total_points > WEBGL_THRESHOLD else go.Scatter)(x=x, y=y, **kw)
 
 # --- 5. UI ---
 st.title("📈 Pro Investor Dashboard v13 (Hybrid Stable)")
@@ -578,13 +49,15 @@ st.title("📈 Pro Investor Dashboard v13 (Hybrid Stable)")
 if 'selected_tickers' not in st.session_state:
     st.session_state.selected_tickers = ["AAPL"]
 
-w_df = fetch_watchlist()
+w_df = core.fetch_watchlist().copy()
+prefetch_status = core.start_prefetcher()
 
 # サイドバー
 st.sidebar.header("🕹️ 管理パネル")
 # キャッシュクリアボタン
 if st.sidebar.button("⚡ キャッシュをクリア"):
     st.cache_data.clear()
+    core.clear_caches()
     st.rerun()
 
 with st.sidebar.expander("➕ 新規追加 (任意)", expanded=False):
@@ -592,9 +65,10 @@ with st.sidebar.expander("➕ 新規追加 (任意)", expanded=False):
     with st.form("add"):
         t = st.text_input("コード").upper().strip()
         n = st.text_input("メモ").strip()
+        wt = st.number_input("ウェイト (任意)", min_value=0.0, value=None, help="ポートフォリオ分析での比率 (合計が1でなくてもよい)")
         if st.form_submit_button("追加"):
             if t and n:
-                add_to_watchlist(t, n)
+                core.add_to_watchlist(t, n, wt)
                 st.success("追加しました")
                 st.rerun()
             else:
@@ -606,11 +80,17 @@ with st.sidebar.expander("🗑️ 削除", expanded=False):
         dels = st.multiselect("選択:", w_df['lbl'])
         if st.button("削除実行"):
             ids = w_df[w_df['lbl'].isin(dels)]['id'].tolist()
-            for i in ids: delete_from_watchlist(i)
+            core.delete_from_watchlist(ids)
             st.rerun()
 
+if prefetch_status["last"]:
+    st.sidebar.caption(f"🔄 先読み: {prefetch_status['tickers']}銘柄 ({int(time.time() - prefetch_status['last'])}秒前)")
+
+if core.market_data_state() != "closed":
+    st.sidebar.warning("⚠️ 市場データの取得が失敗続きのため一時停止中 (保存済みデータを表示)")
+
 st.sidebar.markdown("---")
-period = st.sidebar.selectbox("期間", ["1日","1週間","1ヶ月","3ヶ月","6ヶ月","1年","3年","5年","10年","全期間"], index=5)
+period = st.sidebar.selectbox("期間", core.PERIODS, index=core.PERIODS.index("1年"), key="period")
 st.sidebar.markdown("---")
 
 st.sidebar.subheader("📊 分析対象")
@@ -630,99 +110,450 @@ else:
     st.sidebar.info("リストが空です")
     current_tickers = []
 
-# メイン
-t1, t2, t3, t4 = st.tabs(["📊 チャート", "🔢 相関", "📰 ニュース (Hybrid)", "📋 DB"])
+def view_memo(name, key, build):
+    """ビューごとに最後に作った結果 (図など) をセッションに残し、入力 key が同じなら作り直さない"""
+    memo = st.session_state.setdefault("view_memo", {})
+    hit = memo.get(name)
+    core.cache_event("view", "hit" if hit is not None and hit[0] == key else "miss")
+    if hit is None or hit[0] != key: hit = memo[name] = (key, build())
+    return hit[1]
+
+PROGRESSIVE_REDRAW = 0.5   # 逐次表示で図を描き直す最短間隔 (秒)
+
+def load_progressive(tickers, period_key, draw):
+    """
+    core.iter_prices で届いた銘柄から順に draw(prices) の図を描き直し、取得中・取得できなかった・
+    締め切りに遅れた銘柄を状態欄に出す (全部が手元にあれば途中の描画はしない)。
+    戻り値: ({ticker: df}, 最終の図を置く場所)
+    """
+    status, area = st.empty(), st.empty()
+    prices, failed, slow = {}, [], []
+    last, drawn, n = time.perf_counter(), 0, 0
+    names = lambda tks: " ".join(tks[:10]) + (f" 他{len(tks) - 10}銘柄" if len(tks) > 10 else "")
+    def redraw():
+        nonlocal last, drawn
+        pending = [tk for tk in tickers if tk not in prices and tk not in failed]
+        status.caption(f"⏳ 取得中 {len(tickers) - len(pending)}/{len(tickers)}: {names(pending)}")
+        if len(prices) > drawn:
+            fig = draw(prices)
+            if fig is not None: area.plotly_chart(fig, use_container_width=True, key=f"{period_key}_progress_{len(prices)}")
+            drawn = len(prices)
+        last = time.perf_counter()
+    for tk, df, state in core.iter_prices(tickers, period_key):
+        if state == "waiting":
+            redraw()
+            last = 0.0   # 上流から最初に届いた銘柄はすぐに描く
+            continue
+        n += 1
+        if df is not None: prices[tk] = df
+        elif state == "timeout": slow.append(tk)
+        else: failed.append(tk)
+        if n < len(tickers) and time.perf_counter() - last >= PROGRESSIVE_REDRAW: redraw()
+    notes = []
+    if failed: notes.append(f"⚠️ 取得できず: {names(failed)}")
+    if slow: notes.append(f"⏱️ 応答待ち (裏で取得を続行・再表示で反映): {names(slow)}")
+    if notes: status.caption(" / ".join(notes))
+    else: status.empty()
+    return prices, area
+
+def price_chart(tk, period_key, live):
+    """
+    単一銘柄のチャート。live=True のときはこの部分だけが一定間隔で再実行され、
+    前回の最終バー以降だけを取得して指標を延長し、同じ図を更新する (ページ全体・他のキャッシュはそのまま)。
+    """
+    if live:
+        df = core.get_prices([tk], period_key, max_age=core.LIVE_POLL_SECONDS).get(tk)
+    else:
+        with st.spinner(f"{tk} データ取得中..."):
+            df = core.get_stock_data(tk, period_key)
+    if df is None:
+        st.error("データ取得エラー: コードが正しいか、期間を変更して再試行してください")
+        return
+    if live:
+        st.caption(f"🔴 {core.LIVE_POLL_SECONDS}秒ごとに更新中 (最終バー {df.index[-1]:%m/%d %H:%M})")
+    else:
+        age = core.data_age(df)
+        if age >= core.PRICE_TTL: st.caption(f"⏳ {int(age // 60)}分前のデータを表示中 (バックグラウンドで更新中)")
+    
+    cur = df['Close'].iloc[-1]
+    pre = df['Close'].iloc[-2]
+    chg = cur - pre
+    pct = (chg/pre)*100
+    
+    c1,c2,c3 = st.columns(3)
+    c1.metric("Current", f"{cur:,.2f}", f"{chg:,.2f} ({pct:.2f}%)")
+    c2.metric("Period", period_key)
+    c3.metric("High", f"{df['High'].max():,.2f}")
+    
+    def build():
+        cd = core.downsample_ohlc(df)
+        fig = go.Figure()
+        fig.add_trace(go.Candlestick(x=cd.index, open=cd['Open'], high=cd['High'], low=cd['Low'], close=cd['Close'], name="Price"))
+        if 'SMA20' in cd.columns: fig.add_trace(go.Scatter(x=cd.index, y=cd['SMA20'], line=dict(color='orange', width=1), name="SMA20"))
+        if 'SMA50' in cd.columns: fig.add_trace(go.Scatter(x=cd.index, y=cd['SMA50'], line=dict(color='blue', width=1), name="SMA50"))
+        # uirevision: 更新してもズーム・表示範囲を保つ
+        fig.update_layout(height=500, xaxis_rangeslider_visible=False, uirevision=f"{tk}/{period_key}")
+        return fig
+    fig = view_memo("price", (tk, period_key, len(df), df.index[-1], cur), build)
+    st.plotly_chart(fig, use_container_width=True, key="price_chart")
+
+# メイン: 選択中のビューだけを実行する (st.tabs だと全タブの中身が毎回実行される)
+nav = st.container()   # ビューの選択 (ビューの関数を定義した後にここへ置く)
+# 描画しなかったウィジェットの値は実行の終わりに消されるので、ビューの入力は毎回書き戻して切り替えても保つ
+VIEW_STATE_PREFIXES = ("live", "news_", "corr_", "db_", "screen_", "bt_", "pf_")
+VIEW_STATE_SKIP = {"screen_run", "screen_refresh", "bt_run", "pf_run", "pf_save", "pf_weights"}   # ボタン・表は書き戻せない
+for k in list(st.session_state):
+    if k.startswith(VIEW_STATE_PREFIXES) and k not in VIEW_STATE_SKIP: st.session_state[k] = st.session_state[k]
 
-with t1:
+def view_chart():
     if not current_tickers:
         st.info("銘柄を選択してください")
     elif len(current_tickers) == 1:
         tk = current_tickers[0]
-        with st.spinner(f"{tk} データ取得中..."):
-            df, fin, info = get_stock_data(tk, period)
-        if df is not None:
-            nm = info.get('shortName', tk) if info else tk
-            st.subheader(f"{nm} ({tk})")
-            
-            cur = df['Close'].iloc[-1]
-            pre = df['Close'].iloc[-2]
-            chg = cur - pre
-            pct = (chg/pre)*100
-            
-            c1,c2,c3 = st.columns(3)
-            c1.metric("Current", f"{cur:,.2f}", f"{chg:,.2f} ({pct:.2f}%)")
-            c2.metric("Period", period)
-            c3.metric("High", f"{df['High'].max():,.2f}")
-            
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name="Price"))
-            if 'SMA20' in df.columns: fig.add_trace(go.Scatter(x=df.index, y=df['SMA20'], line=dict(color='orange', width=1), name="SMA20"))
-            if 'SMA50' in df.columns: fig.add_trace(go.Scatter(x=df.index, y=df['SMA50'], line=dict(color='blue', width=1), name="SMA50"))
-            fig.update_layout(height=500, xaxis_rangeslider_visible=False)
-            st.plotly_chart(fig, use_container_width=True)
-            
-            if fin is not None and not fin.empty:
-                st.markdown("### 🏢 業績")
-                try:
-                    f = fin.T
-                    f.index = pd.to_datetime(f.index).strftime('%Y-%m-%d')
-                    fv = f.sort_index()
-                    cols = [c for c in ['Total Revenue', 'Net Income'] if c in fv.columns]
-                    if cols: st.plotly_chart(px.bar(fv, y=cols, barmode='group'), use_container_width=True)
-                except: pass
-        else:
-            st.error("データ取得エラー: コードが正しいか、期間を変更して再試行してください")
+        try: info = cached_call("info", get_ticker_info, tk)
+        except: info = {}
+        nm = info.get('shortName', tk) if info else tk
+        h1, h2 = st.columns([5, 1])
+        h1.subheader(f"{nm} ({tk})")
+        live = h2.toggle("🔴 ライブ", key="live", help=f"{core.LIVE_POLL_SECONDS}秒ごとにチャートだけを更新")
+        st.fragment(price_chart, run_every=core.LIVE_POLL_SECONDS if live else None)(tk, period, live)
+        
+        try: fin = cached_call("fundamentals", get_fundamentals, tk, core.current_report_period())
+        except: fin = None
+        if fin is not None and not fin.empty:
+            st.markdown("### 🏢 業績")
+            try:
+                f = fin.T
+                f.index = pd.to_datetime(f.index).strftime('%Y-%m-%d')
+                fv = f.sort_index()
+                cols = [c for c in ['Total Revenue', 'Net Income'] if c in fv.columns]
+                if cols: st.plotly_chart(px.bar(fv, y=cols, barmode='group'), use_container_width=True)
+            except: pass
     else:
         st.subheader("📊 比較チャート (正規化)")
-        fig = go.Figure()
-        for tk in current_tickers:
-            df, _, _ = get_stock_data(tk, period)
-            if df is not None:
-                st0 = df['Close'].iloc[0]
-                if st0>0:
-                    norm = ((df['Close']/st0)-1)*100
-                    fig.add_trace(go.Scatter(x=df.index, y=norm, mode='lines', name=f"{tk}"))
-        fig.update_layout(height=600, hovermode="x unified")
-        fig.add_hline(y=0, line_dash="solid", line_color="white", opacity=0.3)
-        st.plotly_chart(fig, use_container_width=True)
-
-with t2:
+        def build(prices):
+            fig = go.Figure()
+            lines = {}
+            for tk in current_tickers:
+                df = prices.get(tk)
+                if df is not None:
+                    st0 = df['Close'].iloc[0]
+                    if st0>0:
+                        lines[tk] = core.downsample_line(((df['Close']/st0)-1)*100)
+            total = sum(len(v) for v in lines.values())
+            for tk, norm in lines.items():
+                fig.add_trace(line_trace(norm.index, norm, total, mode='lines', name=f"{tk}"))
+            fig.update_layout(height=600, hovermode="x unified")
+            fig.add_hline(y=0, line_dash="solid", line_color="white", opacity=0.3)
+            return fig
+        # 届いた銘柄から線を足していく (遅い・失敗した銘柄は状態欄に出し、他を待たせない)
+        prices, area = load_progressive(current_tickers, period, build)
+        key = (period, tuple((tk, len(df), df.index[-1], df['Close'].iloc[-1]) for tk, df in prices.items()))
+        area.plotly_chart(view_memo("compare", key, lambda: build(prices)), use_container_width=True)
+
+def view_correlation():
     st.header("🔢 相関分析")
-    if len(current_tickers) >= 2:
+    universe = st.toggle("📋 DBの全銘柄で計算 (350+)", value=False, key="corr_universe")
+    targets = core.ticker_df_master['Ticker'].unique().tolist() if universe else current_tickers
+    if len(targets) >= 2:
+        big = len(targets) > 30
+        heatmap = lambda c: px.imshow(c, text_auto=False if big else ".2f", color_continuous_scale="RdBu_r",
+                                      range_color=[-1,1], height=900 if big else None)
+        def partial(prices):
+            # 取得途中: 届いた列だけ計算し、並びは選択順のまま (未着の銘柄は空欄)
+            ret = core.align_log_returns({tk: df['Close'] for tk, df in prices.items()}, intraday=period in core.I_MAP)
+            if ret.shape[1] < 2: return None
+            return heatmap(core.corr_matrix(ret).reindex(index=targets, columns=targets))
+        prices, area = load_progressive(targets, period, partial)
         with st.spinner("計算中..."):
-            d = {}
-            for tk in current_tickers:
-                df, _, _ = get_stock_data(tk, period)
-                if df is not None: d[tk] = df['Close']
-            if d:
-                corr = pd.DataFrame(d).corr()
-                st.plotly_chart(px.imshow(corr, text_auto=".2f", color_continuous_scale="RdBu_r", range_color=[-1,1]), use_container_width=True)
+            ret, corr = core.correlation_analysis(targets, period, prices=prices)
+        if corr is not None:
+            key = (tuple(targets), period, tuple((tk, df.index[-1], df['Close'].iloc[-1]) for tk, df in prices.items()))
+            area.plotly_chart(view_memo("corr", key, lambda: heatmap(corr)), use_container_width=True)
+            st.caption("対数リターン (共通カレンダー) で計算・似た銘柄が隣り合うように並べ替え")
+            
+            st.markdown("### ローリング相関")
+            c1, c2 = st.columns(2)
+            base = c1.selectbox("基準銘柄", list(ret.columns), key="corr_base")
+            win = c2.slider("ウィンドウ (本)", 10, 120, 30, key="corr_win")
+            others = ret.columns.drop(base)
+            shown = [tk for tk in current_tickers if tk in others] if universe else list(others)
+            if shown:
+                def build():
+                    rc = core.rolling_corr(ret, base, win)
+                    fig = go.Figure()
+                    for tk in shown: fig.add_trace(go.Scatter(x=rc.index, y=rc[tk], mode='lines', name=tk))
+                    fig.update_layout(height=400, hovermode="x unified", yaxis_range=[-1, 1])
+                    return fig
+                st.plotly_chart(view_memo("rolling_corr", (key, base, win, tuple(shown)), build), use_container_width=True)
     else:
         st.warning("2つ以上選択してください")
 
-with t3:
+def view_news():
     st.header("📰 関連ニュース (Hybrid)")
     st.caption("Yahoo RSS (確実性) + NewsAPI (検索性) のハイブリッド取得")
+    nq = st.text_input("🔎 過去の記事を検索", placeholder="earnings, 決算...", key="news_q",
+                       help="これまでに取得した記事のタイトルから検索 (銘柄を選択中はその銘柄の記事のみ)")
     
-    if current_tickers:
-        with st.spinner("ニュース収集中..."):
-            arts = fetch_news_hybrid(current_tickers)
+    if nq or current_tickers:
+        if nq:
+            arts, skipped = core.news_store_query(current_tickers, nq), []
+            st.caption(f"{len(arts)} 件")
+        else:
+            with st.spinner("ニュース収集中..."):
+                arts, skipped = core.fetch_news_hybrid(current_tickers)
+        if skipped:
+            st.caption(f"⏱️ 時間内に取得できなかったソース: {', '.join(skipped)}")
             
         if arts:
             for n in arts:
                 with st.container(border=True):
                     st.markdown(f"**[{n['title']}]({n['link']})**")
-                    st.caption(f"{n['source']} - {n['published']}")
+                    more = f" (ほか {n['dups'] - 1} 件の同じ記事)" if n.get('dups', 1) > 1 else ""
+                    st.caption(f"{n['source']} - {n['published']}{more}")
         else:
             st.info("ニュースが見つかりませんでした")
     else:
         st.warning("銘柄を選択してください")
 
-with t4:
+def view_db():
     st.header("📋 銘柄DB (350+)")
-    q = st.text_input("検索", placeholder="Toyota, Bond...")
-    df = ticker_df_master
-    if q: df = df[df.astype(str).apply(lambda x: x.str.contains(q, case=False)).any(axis=1)]
-    for c in df['Category'].unique():
-        with st.expander(c, expanded=False):
-            st.dataframe(df[df['Category']==c][['Ticker','Name']], use_container_width=True, hide_index=True)
+    q = st.text_input("検索", placeholder="Toyota, Bond...", key="db_q")
+    if q:
+        res = core.ticker_index().search(q)
+        st.caption(f"{len(res)} 件")
+        st.dataframe(res[['Ticker','Name','Category']], use_container_width=True, hide_index=True)
+    else:
+        df = core.ticker_df_master
+        for c in df['Category'].unique():
+            with st.expander(c, expanded=False):
+                st.dataframe(df[df['Category']==c][['Ticker','Name']], use_container_width=True, hide_index=True)
+
+def view_screener():
+    st.header("🔍 スクリーナー")
+    c1, c2, c3 = st.columns([2, 1, 1])
+    cat = c1.selectbox("カテゴリ", ["すべて", *core.ticker_df_master['Category'].unique()], key="screen_cat")
+    sp = c2.selectbox("騰落率の期間", list(core.SCREEN_PERIODS), index=2, key="screen_period")
+    universe = core.ticker_df_master if cat == "すべて" else core.ticker_df_master[core.ticker_df_master['Category'] == cat]
+    targets = universe['Ticker'].unique().tolist()
+    c3.write("")
+    # 未取得の銘柄はダウンロードが必要なので、開いただけでは実行しない
+    force = False
+    if st.session_state.get("screen_on"): force = c3.button("🔄 最新にする", key="screen_refresh")
+    elif c3.button("▶ 実行", key="screen_run"): st.session_state["screen_on"] = True
+    
+    if not st.session_state.get("screen_on"):
+        st.caption(f"{len(targets)} 銘柄の騰落率・ボラティリティ・RSI・SMA50乖離を一覧にします (初回は未取得の銘柄の日足を取得します)")
+    else:
+        bar = st.progress(0.0, text=f"{len(targets)} 銘柄を取得中...")
+        res = core.screen_universe(targets, sp, max_age=0 if force else core.PRICE_TTL,
+                              progress=lambda p: bar.progress(p, text=f"{len(targets)} 銘柄を取得中..."))
+        bar.empty()
+        if res.empty:
+            st.info("データを取得できませんでした")
+        else:
+            f1, f2, f3 = st.columns(3)
+            rsi = f1.slider("RSI", 0, 100, (0, 100), key="screen_rsi")
+            sma = f2.radio("SMA50 との位置", ["すべて", "上", "下"], horizontal=True, key="screen_sma")
+            sq = f3.text_input("絞り込み", placeholder="Ticker / 名前", key="screen_q")
+            view = res if rsi == (0, 100) else res[res["RSI"].between(*rsi)]
+            if sma == "上": view = view[view["SMA50乖離"] > 0]
+            elif sma == "下": view = view[view["SMA50乖離"] < 0]
+            if sq: view = view[view["Ticker"].str.contains(sq, case=False, regex=False) | view["Name"].str.contains(sq, case=False, regex=False, na=False)]
+            st.caption(f"{len(view)} / {len(res)} 銘柄 (列名をクリックで並べ替え)")
+            st.dataframe(
+                view.sort_values("騰落率", ascending=False), use_container_width=True, hide_index=True, height=600,
+                column_config={
+                    "終値": st.column_config.NumberColumn(format="%.2f"),
+                    "騰落率": st.column_config.NumberColumn(f"騰落率 ({sp})", format="%.1f%%"),
+                    "ボラティリティ": st.column_config.NumberColumn("ボラティリティ (年率)", format="%.1f%%"),
+                    "RSI": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f"),
+                    "SMA50乖離": st.column_config.NumberColumn(format="%+.1f%%"),
+                })
+
+def view_backtest():
+    st.header("🧪 バックテスト")
+    c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
+    scope = c1.selectbox("対象", ["選択中の銘柄", "すべて", *core.ticker_df_master['Category'].unique()], key="bt_scope")
+    strategy = c2.selectbox("戦略", list(core.BT_STRATEGIES), key="bt_strategy")
+    years = c3.selectbox("検証期間 (年)", core.BT_YEARS, index=len(core.BT_YEARS) - 1, key="bt_years")
+    cost = c4.number_input("売買コスト (bps)", 0.0, 100.0, 5.0, step=1.0, key="bt_cost")
+    if scope == "選択中の銘柄": targets = current_tickers
+    elif scope == "すべて": targets = core.ticker_df_master['Ticker'].unique().tolist()
+    else: targets = core.ticker_df_master[core.ticker_df_master['Category'] == scope]['Ticker'].unique().tolist()
+    
+    ranges = {}
+    for col, (name, (lo, hi, default, step)) in zip(st.columns(len(core.BT_STRATEGIES[strategy][0])), core.BT_STRATEGIES[strategy][0].items()):
+        rng = col.slider(name, lo, hi, default, key=f"bt_{strategy}_{name}")
+        ranges[name] = (*rng, col.number_input("刻み", 1, hi - lo, step, key=f"bt_{strategy}_{name}_step"))
+    grid = core.backtest_grid(strategy, ranges)
+    st.caption(f"{len(grid)} 通り × {len(targets)} 銘柄 (日足・終値で売買、翌日のリターンから反映)")
+    
+    if st.button("▶ 実行", key="bt_run", disabled=not targets or not grid or len(grid) > core.BT_MAX_COMBOS):
+        bar = st.progress(0.0, text="日足を取得中...")
+        core.refresh_daily(targets, stale_ok=True, progress=lambda p: bar.progress(p, text="日足を取得中..."))
+        bar.empty()
+        st.session_state["bt_cfg"] = {"tickers": targets, "strategy": strategy, "grid": grid, "years": years, "cost_bps": cost}
+    if len(grid) > core.BT_MAX_COMBOS: st.warning(f"組み合わせは {core.BT_MAX_COMBOS} 通りまでです (刻みを大きくしてください)")
+    
+    cfg = st.session_state.get("bt_cfg")
+    if cfg:
+        with st.spinner("計算中..."): res = core.backtest_sweep(**cfg)
+        if res.empty:
+            st.info("データがありません")
+        else:
+            names = list(core.BT_STRATEGIES[cfg["strategy"]][0])
+            pct = lambda label: st.column_config.NumberColumn(label, format="%.1f%%")
+            summary = res.groupby(names).agg(
+                Sharpe=("Sharpe", "median"), CAGR=("CAGR", "median"), 最大DD=("最大DD", "median"),
+                売買回数=("売買回数", "median"), 勝率=("超過", lambda x: (x > 0).mean()),
+            ).reset_index().sort_values("Sharpe", ascending=False)
+            st.markdown(f"### {cfg['strategy']} ({len(cfg['grid'])} 通り × {res['Ticker'].nunique()} 銘柄・{cfg['years']}年)")
+            st.dataframe(summary.assign(**{k: summary[k] * 100 for k in ["CAGR", "最大DD", "勝率"]}),
+                         use_container_width=True, hide_index=True, height=300,
+                         column_config={"Sharpe": st.column_config.NumberColumn("Sharpe (中央値)", format="%.2f"),
+                                        "CAGR": pct("CAGR (中央値)"), "最大DD": pct("最大DD (中央値)"),
+                                        "売買回数": st.column_config.NumberColumn("売買回数/年", format="%.1f"),
+                                        "勝率": pct("バイ&ホールドに勝った銘柄")})
+            if len(names) == 2:
+                heat = summary.pivot(index=names[0], columns=names[1], values="Sharpe")
+                st.plotly_chart(px.imshow(heat, text_auto=".2f", color_continuous_scale="RdYlGn", aspect="auto",
+                                          labels={"color": "Sharpe"}), use_container_width=True)
+            
+            st.markdown("### 銘柄ごとの結果")
+            d1, d2 = st.columns(2)
+            combos = [tuple(r) for r in summary[names].itertuples(index=False)]
+            combo = d1.selectbox("パラメータ", combos, format_func=lambda p: ", ".join(f"{n}={v}" for n, v in zip(names, p)), key="bt_combo")
+            one = res[(res[names] == combo).all(axis=1)].drop(columns=names).sort_values("Sharpe", ascending=False)
+            tk = d2.selectbox("銘柄", one['Ticker'].tolist(), key="bt_ticker")
+            eq = core.backtest_curve(tk, cfg["strategy"], combo, cfg["years"], cfg["cost_bps"])
+            if not eq.empty:
+                fig = go.Figure()
+                fig.add_trace(line_trace(eq.index, eq["戦略"], name="戦略"))
+                fig.add_trace(line_trace(eq.index, eq["バイ&ホールド"], name="バイ&ホールド"))
+                fig.add_trace(line_trace(eq.index, eq["ドローダウン"], name="ドローダウン", yaxis="y2", fill="tozeroy", opacity=0.3))
+                fig.update_layout(height=450, hovermode="x unified", yaxis=dict(type="log", title="資産 (開始=1)"),
+                                  yaxis2=dict(overlaying="y", side="right", tickformat=".0%", range=[-1, 0], showgrid=False))
+                st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(one.assign(**{k: one[k] * 100 for k in ["CAGR", "最大DD", "超過"]}, 保有率=one["保有率"] * 100),
+                         use_container_width=True, hide_index=True,
+                         column_config={"Sharpe": st.column_config.NumberColumn(format="%.2f"), "CAGR": pct("CAGR"),
+                                        "最大DD": pct("最大DD"), "売買回数": st.column_config.NumberColumn("売買回数/年", format="%.1f"),
+                                        "保有率": pct("保有率"), "超過": pct("超過 (対バイ&ホールド CAGR)")})
+
+def view_portfolio():
+    st.header("💼 ポートフォリオ (ウォッチリスト)")
+    if w_df.empty:
+        st.info("ウォッチリストが空です")
+    else:
+        with st.expander("⚖️ ウェイト", expanded=False):
+            st.caption("未設定の銘柄は、どれにも設定がなければ等ウェイト、いずれかに設定があれば 0 として扱います")
+            base = w_df[["id", "ticker", "note"]].assign(weight=w_df["weight"] if "weight" in w_df.columns else None)
+            edited = st.data_editor(base, hide_index=True, use_container_width=True, key="pf_weights",
+                                    disabled=["id", "ticker", "note"], column_order=["ticker", "note", "weight"],
+                                    column_config={"weight": st.column_config.NumberColumn("ウェイト", min_value=0.0)})
+            if st.button("💾 保存", key="pf_save"):
+                old = pd.to_numeric(base["weight"], errors="coerce")
+                new = pd.to_numeric(edited["weight"], errors="coerce")
+                changed = ~((old == new) | (old.isna() & new.isna()))
+                rows = [{"id": i, "weight": None if pd.isna(v) else float(v)} for i, v in zip(edited.loc[changed, "id"].tolist(), new[changed])]
+                if core.set_watchlist_weights(rows): st.rerun()
+                else: st.error("保存できませんでした。watchlist テーブルに weight 列 (double precision) を追加してください")
+        weights = core.portfolio_weights(w_df)
+        
+        c1, c2, c3, c4 = st.columns(4)
+        rp = c1.selectbox("推定に使う期間", core.RISK_PERIODS, index=1, key="pf_period")
+        horizon = c2.selectbox("シミュレーション日数", [21, 63, 126, 252], index=3, key="pf_horizon", format_func=lambda d: f"{d}営業日")
+        paths = c3.selectbox("パス数", core.MC_PATHS, index=1, key="pf_paths", format_func="{:,}".format)
+        method = c4.radio("リターンの生成", ["正規分布", "ヒストリカル"], key="pf_method", horizontal=True)
+        # 初回は価格の取得とシミュレーションに時間がかかるので、開いただけでは実行しない
+        if not st.session_state.get("pf_on"):
+            if st.button("▶ 分析", key="pf_run"): st.session_state["pf_on"] = True
+            st.caption(f"{len(weights)} 銘柄: " + ", ".join(f"{tk} {v:.0%}" for tk, v in weights.items()))
+        if st.session_state.get("pf_on"):
+            with st.spinner("計算中..."): pa = core.portfolio_analysis(weights, rp, horizon, paths, method)
+            if pa is None:
+                st.info("価格データが足りません")
+            else:
+                stats, ret = pa["stats"], pa["ret"]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("年率リターン (推定)", f"{stats['return']:.1%}")
+                m2.metric("年率ボラティリティ", f"{stats['vol']:.1%}")
+                m3.metric("1日 VaR 95% (ヒストリカル)", f"{stats['var'][0.95]['ヒストリカル'][0]:.2%}")
+                m4.metric("1日 CVaR 95% (ヒストリカル)", f"{stats['var'][0.95]['ヒストリカル'][1]:.2%}")
+                st.caption(f"{ret.index[0]:%Y-%m-%d} 〜 {ret.index[-1]:%Y-%m-%d} の {stats['days']} 日の日次リターンから推定")
+                
+                a1, a2 = st.columns(2)
+                a1.markdown("#### 1日の VaR / CVaR")
+                a1.dataframe(pd.DataFrame([{"信頼水準": f"{lv:.0%}", "方法": how, "VaR": v * 100, "CVaR": cv * 100}
+                                           for lv, d in stats["var"].items() for how, (v, cv) in d.items()]),
+                             hide_index=True, use_container_width=True,
+                             column_config={"VaR": st.column_config.NumberColumn(format="%.2f%%"), "CVaR": st.column_config.NumberColumn(format="%.2f%%")})
+                a2.markdown("#### 銘柄ごと")
+                assets = stats["assets"]
+                a2.dataframe(assets * 100, use_container_width=True,
+                             column_config={k: st.column_config.NumberColumn(format="%.1f%%") for k in assets.columns})
+                if len(assets) >= 2:
+                    cov = stats["cov"]
+                    sd = np.sqrt(np.diag(cov))
+                    st.plotly_chart(px.imshow(cov / np.outer(sd, sd), text_auto=".2f", color_continuous_scale="RdBu_r", range_color=[-1, 1],
+                                              title="相関 (共分散 / ボラティリティ)"), use_container_width=True)
+                
+                if "frontier" in pa:
+                    st.markdown("#### 効率的フロンティア (空売りなし)")
+                    pts, front, w_min, w_max = pa["frontier"]
+                    fig = go.Figure()
+                    fig.add_trace(go.Scattergl(x=pts["ボラティリティ"], y=pts["リターン"], mode="markers", name="ランダムな配分",
+                                               marker=dict(size=3, color=pts["シャープ"], colorscale="Viridis", opacity=0.4)))
+                    fig.add_trace(go.Scatter(x=front["ボラティリティ"], y=front["リターン"], mode="lines", name="フロンティア", line=dict(width=3)))
+                    fig.add_trace(go.Scatter(x=[stats["vol"]], y=[stats["return"]], mode="markers", name="現在",
+                                             marker=dict(size=14, symbol="star", color="red")))
+                    fig.update_layout(height=450, xaxis=dict(title="ボラティリティ (年率)", tickformat=".0%"),
+                                      yaxis=dict(title="リターン (年率)", tickformat=".0%"))
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.dataframe(pd.DataFrame({"現在": pa["w"], "最小分散": w_min, "最大シャープ": w_max}, index=ret.columns) * 100,
+                                 use_container_width=True, column_config={k: st.column_config.NumberColumn(format="%.1f%%") for k in ["現在", "最小分散", "最大シャープ"]})
+                
+                st.markdown(f"#### モンテカルロ ({paths:,} パス・{horizon} 営業日・{method})")
+                final, marks, band = pa["mc"]
+                fig = go.Figure()
+                for lo, hi, name in [(0, 4, "5〜95%"), (1, 3, "25〜75%")]:
+                    fig.add_trace(go.Scatter(x=marks, y=band[hi], mode="lines", line=dict(width=0), showlegend=False))
+                    fig.add_trace(go.Scatter(x=marks, y=band[lo], mode="lines", line=dict(width=0), fill="tonexty", name=name))
+                fig.add_trace(go.Scatter(x=marks, y=band[2], mode="lines", name="中央値"))
+                fig.update_layout(height=400, xaxis_title="営業日", yaxis=dict(title="価値 (開始=1)"), hovermode="x unified")
+                st.plotly_chart(fig, use_container_width=True)
+                r = final - 1
+                h1, h2, h3, h4 = st.columns(4)
+                h1.metric("中央値", f"{np.median(r):+.1%}")
+                h2.metric("損失になる確率", f"{(r < 0).mean():.1%}")
+                v95, cv95 = core.var_cvar(r, 0.95)
+                h3.metric(f"{horizon}日 VaR 95%", f"{v95:.1%}")
+                h4.metric(f"{horizon}日 CVaR 95%", f"{cv95:.1%}")
+                hist, edges = np.histogram(r, bins=100)
+                st.plotly_chart(go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=hist, marker_line_width=0))
+                                .update_layout(height=300, bargap=0, xaxis=dict(title="満期のリターン", tickformat=".0%")),
+                                use_container_width=True)
+
+VIEWS = {"📊 チャート": ("chart", view_chart), "🔢 相関": ("correlation", view_correlation),
+         "📰 ニュース (Hybrid)": ("news", view_news), "📋 DB": ("db", view_db), "🔍 スクリーナー": ("screener", view_screener),
+         "🧪 バックテスト": ("backtest", view_backtest), "💼 ポートフォリオ": ("portfolio", view_portfolio)}
+with nav: view = st.radio("表示", list(VIEWS), horizontal=True, key="view", label_visibility="collapsed")
+view_name, view_fn = VIEWS[view]
+with core.perf_span(f"tab.{view_name}"): view_fn()
+
+# 計測結果 (このセッションの今回の再実行の内訳 + プロセス全体の集計)
+core.record_span("rerun", time.perf_counter() - PERF_T0)
+with st.sidebar.expander("⏱️ パフォーマンス", expanded=False):
+    run = pd.DataFrame(PERF_RUN, columns=["区間", "秒"]).groupby("区間", sort=False)["秒"].agg(["sum", "count"])
+    st.caption(f"今回の再実行: {run.loc['rerun', 'sum'] * 1000:,.0f} ms")
+    st.dataframe((run.drop("rerun")["sum"] * 1000).round(1).rename("ms").to_frame().assign(回数=run["count"]),
+                 use_container_width=True)
+    ratio = pd.DataFrame(core.metrics_snapshot()["cache"]).T.reindex(columns=["hit", "stale", "miss"]).fillna(0).astype(int)
+    if not ratio.empty:
+        ratio["ヒット率"] = ((ratio["hit"] + ratio["stale"]) / ratio.sum(axis=1)).map("{:.0%}".format)
+        st.dataframe(ratio, use_container_width=True)
+    c1, c2 = st.columns(2)
+    c1.download_button("JSON", core.metrics_json(), "metrics.json", "application/json")
+    c2.download_button("Prometheus", core.metrics_prometheus(), "metrics.prom", "text/plain")
+core.export_metrics()
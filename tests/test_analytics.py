@@ -0,0 +1,243 @@
+"""
+分析機能の回帰テスト
+- 相関: 休日差のある銘柄の揃え方、欠損を除いた相関が pandas と同じか、似た銘柄が隣り合うか、キャッシュ
+- バックテスト: 成績指標・ポジションがループで素直に書いたものと同じか、一括検証と1銘柄の資産曲線が一致するか
+- ポートフォリオ: ウェイトの解釈、リスク指標、モンテカルロの期待値、キャッシュの版、ウェイトの保存
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_core as core
+
+
+def closes(ret, idx):
+    return pd.Series(100 * np.exp(np.cumsum(ret)), index=idx)
+
+
+# --- 相関 ---
+def test_align_keeps_common_calendar_and_carries_weekend_moves():
+    days = pd.date_range("2024-01-01", periods=28, freq="D", tz="UTC")
+    weekdays = days[days.dayofweek < 5]
+    rng = np.random.default_rng(1)
+    crypto = closes(rng.normal(0, 0.02, len(days)), days)
+    prices = {"AAA": closes(rng.normal(0, 0.01, len(weekdays)), weekdays),
+              "BBB": closes(rng.normal(0, 0.01, len(weekdays)), weekdays), "BTC-USD": crypto}
+    ret = core.align_log_returns(prices)
+    # 週末 (株が取引しない日) は落とし、暗号資産の週末の値動きは月曜に集約される
+    assert (ret.index.dayofweek < 5).all()
+    monday = ret.index[ret.index.dayofweek == 0][0]
+    friday = monday - pd.Timedelta(days=3)
+    expected = np.log(crypto[monday.tz_localize("UTC")] / crypto[friday.tz_localize("UTC")])
+    assert ret.loc[monday, "BTC-USD"] == pytest.approx(expected)
+
+
+def test_corr_matrix_matches_pandas_pairwise():
+    rng = np.random.default_rng(2)
+    base = rng.normal(0, 0.01, (200, 1))
+    ret = pd.DataFrame(base + rng.normal(0, 0.01, (200, 4)), columns=list("ABCD"))
+    ret.iloc[:80, 1] = np.nan     # 上場前
+    ret.iloc[150:, 3] = np.nan
+    ret.iloc[:190, 2] = np.nan    # 重なりが CORR_MIN_PERIODS 未満
+    got = core.corr_matrix(ret)
+    ref = ret.corr(min_periods=core.CORR_MIN_PERIODS)
+    np.testing.assert_allclose(got, ref, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_cluster_order_puts_similar_tickers_together():
+    rng = np.random.default_rng(3)
+    f1, f2 = rng.normal(0, 0.01, (2, 250, 1))
+    cols = ["A1", "B1", "A2", "B2", "A3"]
+    x = np.hstack([f1 if c[0] == "A" else f2 for c in cols]) + rng.normal(0, 0.003, (250, 5))
+    corr = core.corr_matrix(pd.DataFrame(x, columns=cols))
+    order = [cols[i] for i in core.cluster_order(corr)]
+    groups = "".join(c[0] for c in order)
+    assert groups in ("AAABB", "BBAAA")
+
+
+def test_rolling_corr_matches_pandas():
+    rng = np.random.default_rng(4)
+    ret = pd.DataFrame(rng.normal(0, 0.01, (120, 3)), columns=["X", "Y", "Z"])
+    got = core.rolling_corr(ret, "X", 30)
+    for c in ["Y", "Z"]:
+        np.testing.assert_allclose(got[c], ret["X"].rolling(30).corr(ret[c]), rtol=1e-7, atol=1e-9, equal_nan=True)
+
+
+def test_correlation_analysis_caches_by_data_range():
+    core._corr_cache().clear()
+    idx = pd.date_range("2024-01-01", periods=60, freq="B")
+    rng = np.random.default_rng(5)
+    prices = {tk: pd.DataFrame({"Close": closes(rng.normal(0, 0.01, 60), idx)}) for tk in ["A", "B", "C"]}
+    first = core.correlation_analysis(list(prices), "3ヶ月", prices=prices)
+    again = core.correlation_analysis(list(prices), "3ヶ月", prices=prices)
+    assert again[0] is first[0] and again[1] is first[1]
+    assert sorted(first[1].columns) == ["A", "B", "C"]
+    assert core.correlation_analysis(["A"], "3ヶ月", prices={"A": prices["A"]}) == (None, None)
+
+
+# --- バックテスト ---
+@pytest.fixture
+def daily_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(core, "OHLCV_DB", str(tmp_path / "ohlcv.sqlite"))
+    core._backtest_cache().clear()
+    rng = np.random.default_rng(6)
+    idx = pd.date_range("2018-01-01", "2024-12-31", freq="B", tz="America/New_York")
+    for i, tk in enumerate(["AAA", "BBB", "CCC"]):
+        c = closes(rng.normal(0.0003 * i, 0.015, len(idx)), idx)
+        core.store_write(tk, "1d", pd.DataFrame({"Open": c, "High": c, "Low": c, "Close": c, "Volume": 1.0}))
+    yield
+    core._backtest_cache().clear()
+
+
+def test_stats_buy_and_hold():
+    rng = np.random.default_rng(7)
+    ret = rng.normal(0.0005, 0.01, (504, 2))
+    ret[0] = np.nan
+    stats, logeq = core.backtest_stats(ret, np.ones(ret.shape))
+    eq = np.cumprod(1 + np.nan_to_num(ret), axis=0)
+    np.testing.assert_allclose(stats["CAGR"], eq[-1] ** (252 / 503) - 1)
+    np.testing.assert_allclose(stats["最大DD"], (eq / np.maximum.accumulate(eq, axis=0) - 1).min(axis=0))
+    np.testing.assert_allclose(np.exp(logeq), eq)
+    np.testing.assert_allclose(stats["保有率"], 1.0)
+
+
+def test_stats_cost_per_trade():
+    ret = np.zeros((11, 1))
+    ret[0] = np.nan
+    pos = np.array([0, 1, 1, 0, 0, 1, 1, 1, 0, 0, 0], dtype=float)[:, None]
+    _, logeq = core.backtest_stats(ret, pos, cost=0.01)
+    assert np.exp(logeq[-1, 0]) == pytest.approx(0.99 ** 4)
+
+
+def test_sma_and_rsi_positions_match_loop():
+    rng = np.random.default_rng(8)
+    c = closes(rng.normal(0, 0.02, 300), pd.RangeIndex(300))
+    close = c.to_numpy()[:, None]
+    ind = core._bt_sma_prep(close, [(5, 20)])
+    pos = core._bt_sma_pos(close, ind, 5, 20)[:, 0]
+    np.testing.assert_array_equal(pos, (c.rolling(5).mean() > c.rolling(20).mean()).astype(float))
+
+    ind = core._bt_rsi_prep(close, [(14, 30, 70)])
+    rsi = ind[14][:, 0]
+    pos = core._bt_rsi_pos(close, ind, 14, 30, 70)[:, 0]
+    ref, cur = [], 0.0
+    for r in rsi:
+        if r < 30: cur = 1.0
+        elif r > 70: cur = 0.0
+        ref.append(cur)
+    np.testing.assert_array_equal(pos, ref)
+
+
+def test_grid_respects_constraints():
+    grid = core.backtest_grid("SMA クロス", {"短期": (10, 50, 10), "長期": (20, 60, 20)})
+    assert grid == [(10, 20), (10, 40), (10, 60), (20, 40), (20, 60), (30, 40), (30, 60), (40, 60), (50, 60)]
+
+
+def test_sweep_matches_curve_and_caches(daily_store):
+    grid = [(5, 60), (20, 100)]
+    df = core.backtest_sweep(["AAA", "BBB", "CCC"], "SMA クロス", grid, years=3)
+    assert len(df) == len(grid) * 3
+    assert core.backtest_sweep(["AAA", "BBB", "CCC"], "SMA クロス", grid, years=3) is df
+    row = df[(df["Ticker"] == "BBB") & (df["短期"] == 20)].iloc[0]
+    eq = core.backtest_curve("BBB", "SMA クロス", (20, 100), years=3)
+    years = len(eq) / 252
+    assert row["CAGR"] == pytest.approx(eq["戦略"].iloc[-1] ** (1 / years) - 1, rel=1e-6)
+    assert row["超過"] == pytest.approx(row["CAGR"] - (eq["バイ&ホールド"].iloc[-1] ** (1 / years) - 1), rel=1e-6)
+    assert row["最大DD"] == pytest.approx(eq["ドローダウン"].min(), rel=1e-6)
+
+
+# --- ポートフォリオ ---
+def test_portfolio_weights():
+    df = pd.DataFrame({"ticker": ["A", "B", "A", "C"], "weight": [None, None, None, None]})
+    assert core.portfolio_weights(df) == {"A": 0.5, "B": 0.25, "C": 0.25}   # 未設定なら行ごとに等ウェイト
+    df["weight"] = [1.0, 2.0, 1.0, None]
+    assert core.portfolio_weights(df) == {"A": 0.5, "B": 0.5}
+    assert core.portfolio_weights(pd.DataFrame()) == {}
+
+
+def test_risk_stats_match_direct_calculation():
+    rng = np.random.default_rng(9)
+    ret = pd.DataFrame(rng.normal(0.0004, 0.01, (500, 3)), columns=list("ABC"))
+    w = np.array([0.5, 0.3, 0.2])
+    st = core.risk_stats(ret, w)
+    rp = np.expm1(ret.to_numpy()) @ w
+    assert st["vol"] == pytest.approx(rp.std(ddof=1) * np.sqrt(252))
+    assert st["assets"]["リスク寄与"].sum() == pytest.approx(1)
+    var, cvar = st["var"][0.95]["ヒストリカル"]
+    assert var == pytest.approx(-np.quantile(rp, 0.05)) and cvar >= var
+
+
+def test_monte_carlo_normal_mean_and_seed():
+    rng = np.random.default_rng(10)
+    ret = pd.DataFrame(rng.normal(0.0005, 0.01, (750, 2)) * [1, 2], columns=["A", "B"])
+    w, h = np.array([0.6, 0.4]), 126
+    final, marks, at = core.monte_carlo(ret, w, h, 100_000)
+    mu, var = ret.mean().to_numpy(), ret.var().to_numpy()
+    assert final.mean() == pytest.approx(w @ np.exp(h * (mu + var / 2)), rel=0.01)
+    assert marks[-1] == h and at.shape == (len(marks), 100_000)
+    np.testing.assert_allclose(at[-1], final, rtol=1e-4)
+    np.testing.assert_array_equal(core.monte_carlo(ret, w, h, 1000)[0], core.monte_carlo(ret, w, h, 1000)[0])
+
+
+def test_monte_carlo_historical_resamples_days():
+    ret = pd.DataFrame({"A": np.full(100, 0.001)})
+    final, _, _ = core.monte_carlo(ret, np.array([1.0]), 252, 500, method="ヒストリカル")
+    np.testing.assert_allclose(final, np.exp(0.252), rtol=1e-5)
+
+
+def test_portfolio_cache_sees_last_bar_updates(monkeypatch):
+    core._risk_cache().clear()
+    idx = pd.date_range("2024-01-01", periods=120, freq="B")
+    rng = np.random.default_rng(11)
+    prices = {tk: pd.DataFrame({"Close": closes(rng.normal(0, 0.01, 120), idx)}) for tk in ["A", "B"]}
+    monkeypatch.setattr(core, "get_prices", lambda tickers, period_key, **kw: prices)
+    weights = {"A": 0.5, "B": 0.5}
+    first = core.portfolio_analysis(weights, "1年", 21, 1000, "正規分布")
+    assert core.portfolio_analysis(weights, "1年", 21, 1000, "正規分布") is first
+    # 未確定の最終バーが更新された (時刻は同じで終値だけ変わった)
+    prices["A"] = prices["A"].copy()
+    prices["A"].iloc[-1, 0] *= 1.05
+    again = core.portfolio_analysis(weights, "1年", 21, 1000, "正規分布")
+    assert again is not first and again["ret"]["A"].iloc[-1] != first["ret"]["A"].iloc[-1]
+    core._risk_cache().clear()
+
+
+class Watchlist:
+    """get_supabase() の代わり: update().in_() だけを受け付ける"""
+    def __init__(self, rows):
+        self.rows, self.ops = rows, []
+
+    def table(self, name):
+        return self
+
+    def update(self, payload):
+        self.payload = payload
+        return self
+
+    def in_(self, col, ids):
+        self.ids = set(ids)
+        return self
+
+    def execute(self):
+        self.ops.append(("update", self.payload, self.ids))
+        hit = [r for r in self.rows if r["id"] in self.ids]
+        for r in hit: r.update(self.payload)
+        return type("Result", (), {"data": [dict(r) for r in hit]})
+
+
+def test_set_weights_updates_existing_rows_only(monkeypatch):
+    db = Watchlist([{"id": "a", "ticker": "AAPL", "note": "", "weight": None},
+                    {"id": "b", "ticker": "MSFT", "note": "", "weight": None}])
+    monkeypatch.setattr(core, "get_supabase", lambda: db)
+    c = core._watchlist_cache()
+    c["df"] = pd.DataFrame(db.rows)
+    assert core.set_watchlist_weights([{"id": "a", "weight": 2.0}, {"id": "b", "weight": 2.0}])
+    assert len(db.ops) == 1   # 同じ値はまとめて1回
+    assert c["df"]["weight"].tolist() == [2.0, 2.0]
+
+    # 他のセッションが削除した行は作り直さず、キャッシュは取り直させる
+    db.rows.pop()
+    assert core.set_watchlist_weights([{"id": "a", "weight": 1.0}, {"id": "b", "weight": None}])
+    assert [r["id"] for r in db.rows] == ["a"] and db.rows[0]["weight"] == 1.0
+    assert c["df"] is None
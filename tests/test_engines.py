@@ -0,0 +1,137 @@
+"""
+NumPy で書き直した計算エンジンの回帰テスト
+- 指標エンジン: pandas の rolling / ewm (書き換え前の calculate_technicals) と同じ値か、延長計算が一括計算と同じか
+- LTTB: 端点・点数・形 (極値) を保つか
+- SimHash: 配信元違いの同じ記事をまとめ、別の記事はまとめないか
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_core as core
+
+
+@pytest.fixture
+def ohlcv():
+    rng = np.random.default_rng(0)
+    n = 300
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    idx = pd.date_range("2024-01-01", periods=n, freq="B")
+    return pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close,
+                         "Volume": rng.integers(1e5, 1e6, n).astype(float)}, index=idx)
+
+
+def reference(df):
+    # pandas の rolling / ewm で同じ指標を計算したもの (NumPy エンジンの基準値)
+    c = df["Close"]
+    delta = c.diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    e12, e26 = c.ewm(span=12).mean(), c.ewm(span=26).mean()
+    out = pd.DataFrame({"SMA20": c.rolling(20).mean(), "SMA50": c.rolling(50).mean(),
+                        "RSI": 100 - 100 / (1 + gain / loss), "MACD": e12 - e26})
+    out["Signal"] = out["MACD"].ewm(span=9).mean()
+    sd = c.rolling(20).std()
+    out["BB_Upper"], out["BB_Lower"] = out["SMA20"] + 2 * sd, out["SMA20"] - 2 * sd
+    return out
+
+
+def test_indicators_match_pandas(ohlcv):
+    got = core.calculate_technicals(ohlcv)
+    ref = reference(ohlcv)
+    for col in ref.columns:
+        np.testing.assert_allclose(got[col], ref[col], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+def test_indicators_with_gaps_match_pandas(ohlcv):
+    # 欠損 (上場前など) があっても pandas と同じく窓内が揃った位置だけ値を持つ
+    df = ohlcv.copy()
+    df.iloc[:30, df.columns.get_loc("Close")] = np.nan
+    got = core.calculate_technicals(df)
+    ref = reference(df)
+    for col in ["SMA20", "SMA50", "MACD", "Signal"]:
+        np.testing.assert_allclose(got[col], ref[col], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+@pytest.mark.parametrize("split", [1, 49, 50, 120, 299])
+def test_incremental_equals_full(ohlcv, split):
+    full, _ = core.technicals_frame(ohlcv)
+    head, state = core.technicals_frame(ohlcv.iloc[:split])
+    tail, _ = core.technicals_frame(ohlcv.iloc[split:], state)
+    pd.testing.assert_frame_equal(pd.concat([head, tail]), full, rtol=1e-12, atol=1e-12)
+
+
+def test_checkpoint_extends_after_last_bar_rewrite(ohlcv):
+    # 未確定の最終バーを上書きしても、checkpoint からの延長は一括計算と同じ
+    first, ckpt = core.technicals_with_checkpoint(ohlcv.iloc[:200])
+    revised = ohlcv.copy()
+    revised.iloc[199, revised.columns.get_loc("Close")] *= 1.05
+    new, _ = core.technicals_with_checkpoint(revised.iloc[199:], ckpt)
+    full = core.calculate_technicals(revised)
+    pd.testing.assert_frame_equal(pd.concat([first.iloc[:-1], new]), full, rtol=1e-12, atol=1e-12)
+
+
+def test_matrix_matches_single(ohlcv):
+    other = ohlcv * 1.5
+    close = pd.DataFrame({"A": ohlcv["Close"], "B": other["Close"]})
+    mat = core.technicals_matrix(close)
+    for tk, df in (("A", ohlcv), ("B", other)):
+        one = core.calculate_technicals(df)
+        np.testing.assert_allclose(mat["RSI"][tk], one["RSI"], rtol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(mat["MACD"][tk], one["MACD"], rtol=1e-12, equal_nan=True)
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[3_333], y[7_777] = 5.0, -5.0   # スパイク
+    keep = core.lttb(x, y, 500)
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 3_333 in keep and 7_777 in keep
+
+
+def test_lttb_short_input_is_untouched():
+    assert np.array_equal(core.lttb(np.arange(10), np.arange(10), 20), np.arange(10))
+
+
+def test_downsample_ohlc_bar_count(ohlcv):
+    big = pd.concat([ohlcv] * 3)
+    big.index = pd.date_range("2000-01-01", periods=len(big), freq="D")
+    for n in (401, 799, len(big)):
+        out = core.downsample_ohlc(big.iloc[:n], 400)
+        assert len(out) == 400
+        assert out["Volume"].sum() == pytest.approx(big["Volume"].iloc[:n].sum())
+        assert out["High"].max() == big["High"].iloc[:n].max()
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_simhash_near_duplicates():
+    a = core.simhash("Apple beats earnings estimates as iPhone sales jump - Reuters")
+    b = core.simhash("Apple Beats Earnings Estimates as iPhone Sales Jump | Yahoo Finance")
+    c = core.simhash("Toyota recalls 100,000 vehicles over airbag fault")
+    assert hamming(a, b) <= core.NEWS_DUP_BITS
+    assert hamming(a, c) > core.NEWS_DUP_BITS
+
+
+def test_news_store_collapses_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(core, "NEWS_DB", str(tmp_path / "news.sqlite"))
+    ts = 1_790_000_000
+    art = lambda link, title, dt=0: {"link": link, "title": title, "source": "t", "published": "", "ts": ts + dt, "tickers": ["AAPL"]}
+    core.news_store_add([({}, [
+        art("https://a/1", "Apple beats earnings estimates as iPhone sales jump - Reuters"),
+        art("https://b/1", "Apple Beats Earnings Estimates as iPhone Sales Jump - Bloomberg", 3600),
+        art("https://c/1", "Apple faces EU antitrust fine over App Store rules", 7200),
+        # 同じ見出しでも公開時刻が離れていれば別の記事
+        art("https://d/1", "Apple beats earnings estimates as iPhone sales jump", 30 * 86400),
+    ])])
+    rows = core.news_store_query(["AAPL"])
+    assert sorted(r["dups"] for r in rows) == [1, 1, 2]
+    assert {r["link"] for r in rows if r["dups"] == 2} == {"https://a/1"}
@@ -0,0 +1,140 @@
+"""
+ニュース取得の回帰テスト
+- RSS の検証子 (ETag / Last-Modified) は記事を保存できてから記録する
+- NewsAPI のクエリの詰め方と、取り込み位置 (high-water mark) の進め方
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+import dashboard_core as core
+
+RSS = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>Apple beats estimates</title><link>https://example.com/a</link><pubDate>Fri, 16 Oct 2026 10:00:00 GMT</pubDate></item>
+</channel></rss>"""
+NOW = 1_790_000_000
+
+
+class Response:
+    def __init__(self, status, body=b"", headers=None):
+        self.status_code, self.content, self.headers = status, body, headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class Http:
+    """_http() の代わり: 検証子が送られてきたら 304、なければ本文を返す"""
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests.append(headers or {})
+        if (headers or {}).get("If-None-Match") == '"v1"': return Response(304)
+        return Response(200, RSS, {"ETag": '"v1"'})
+
+
+class NewsApi:
+    """get_newsapi() の代わり: 英語は1分おきに記事が出る忙しいキーワード、日本語は記事なし"""
+    def __init__(self):
+        self.calls = []
+
+    def get_everything(self, q=None, language=None, sort_by=None, page_size=20, page=1, from_param=None):
+        self.calls.append({"q": q, "language": language, "page": page, "from": from_param})
+        if language != "en": return {"articles": []}
+        since = datetime.fromisoformat(from_param).replace(tzinfo=timezone.utc).timestamp() if from_param else 0
+        ts = [t for t in range(NOW, NOW - 1000 * 60, -60) if t > since][(page - 1) * page_size:page * page_size]
+        return {"articles": [{"title": f"{q} update {t}", "url": f"https://n/{t}", "source": {"name": "Wire"},
+                              "publishedAt": datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")} for t in ts]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(core, "NEWS_DB", str(tmp_path / "news.sqlite"))
+    http = Http()
+    monkeypatch.setattr(core, "_http", lambda: http)
+    core._feed_validators().clear()
+    core._news_cache().clear()
+    yield http
+    core._feed_validators().clear()
+    core._news_cache().clear()
+
+
+@pytest.fixture
+def news(store, monkeypatch):
+    monkeypatch.setattr(core, "_fetch_newsapi", lambda *a, since=None: ([], True, {}))
+    return store
+
+
+@pytest.fixture
+def newsapi(store, monkeypatch):
+    api = NewsApi()
+    monkeypatch.setattr(core, "get_newsapi", lambda: api)
+    return api
+
+
+# --- RSS の検証子 ---
+def test_validators_saved_after_store(news):
+    articles, _ = core.fetch_news_hybrid(["AAPL"], deadline=None)
+    assert [a["title"] for a in articles] == ["Apple beats estimates"]
+    assert list(core._feed_validators().values()) == [{"etag": '"v1"', "modified": None}]
+    core.fetch_news_hybrid(["AAPL"], force=True, deadline=None)
+    assert news.requests[-1] == {"If-None-Match": '"v1"'}
+
+
+def test_failed_store_keeps_refetching(news, monkeypatch):
+    def broken(batches): raise OSError("disk full")
+    monkeypatch.setattr(core, "news_store_add", broken)
+    core.fetch_news_hybrid(["AAPL"], deadline=None)
+    assert core._feed_validators() == {}
+    core.fetch_news_hybrid(["AAPL"], force=True, deadline=None)
+    assert news.requests[-1] == {}
+
+
+# --- NewsAPI ---
+def test_plan_packs_keywords_under_limits():
+    kws = [f"keyword{i:02d}" for i in range(12)]   # 9文字 + " OR " 区切り
+    plan = core.plan_newsapi_queries(kws, max_chars=40, max_queries=2)
+    assert plan == [kws[0:3], kws[3:6]]
+    assert all(len(" OR ".join(q)) <= 40 for q in plan)
+    assert core.plan_newsapi_queries(["a", "b"]) == [["a", "b"]]
+    # 1語で上限を超えても単独のクエリにする
+    assert core.plan_newsapi_queries(["x" * 50, "y"], max_chars=40) == [["x" * 50], ["y"]]
+
+
+def test_busy_keyword_first_fetch_sets_mark(newsapi):
+    core.fetch_news_hybrid(["AAPL"], deadline=None)
+    en = [c for c in newsapi.calls if c["language"] == "en"]
+    assert len(en) == core.NEWSAPI_MAX_PAGES and en[0]["from"] is None
+    # ページが埋まったままでも初回は最新記事まで進める
+    assert core.news_hwm(["newsapi:en:Apple"]) == {"newsapi:en:Apple": NOW}
+
+
+def test_busy_keyword_incomplete_fetch_moves_to_oldest(newsapi):
+    core.fetch_news_hybrid(["AAPL"], deadline=None)
+    newsapi.calls.clear()
+    # 2回目は差分だけ: 前回の位置から取得し、ページ内で届けば1回で済む
+    core.fetch_news_hybrid(["AAPL"], force=True, deadline=None)
+    en = [c for c in newsapi.calls if c["language"] == "en"]
+    assert len(en) == 1 and en[0]["from"] == datetime.fromtimestamp(NOW, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    # 取りこぼしがあり得る (全ページ埋まった) 場合は受け取った最古の記事まで進める
+    with core._news_db() as con: con.execute("UPDATE news_hwm SET ts=? WHERE source='newsapi:en:Apple'", (NOW - 900 * 60,))
+    newsapi.calls.clear()
+    core.fetch_news_hybrid(["AAPL"], force=True, deadline=None)
+    oldest = NOW - (core.NEWSAPI_MAX_PAGES * core.NEWSAPI_PAGE_SIZE - 1) * 60
+    assert core.news_hwm(["newsapi:en:Apple"]) == {"newsapi:en:Apple": oldest}
+
+
+def test_combined_query_marks_only_matching_keywords(newsapi):
+    # まとめた検索 (Apple OR Microsoft) でも、記事に名前が出てこないキーワードの位置は進めない
+    orig = newsapi.get_everything
+    def only_apple(q=None, **kw):
+        got = orig(q=q, **kw)
+        for a in got["articles"]: a["title"] = a["title"].replace(q, "Apple")
+        return got
+    newsapi.get_everything = only_apple
+    core.fetch_news_hybrid(["AAPL", "MSFT"], deadline=None)
+    marks = core.news_hwm(["newsapi:en:Apple", "newsapi:en:Microsoft"])
+    assert marks == {"newsapi:en:Apple": NOW}
@@ -0,0 +1,21 @@
+"""
+計測の回帰テスト
+- 再実行がプールに投げた処理の区間も、その再実行の内訳に入るか
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import dashboard_core as core
+
+
+def test_pool_spans_join_the_rerun():
+    @core.timed("test.worker")
+    def work():
+        return 1
+
+    run = core.perf_begin()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert pool.submit(core.perf_bind(work)).result() == 1
+        pool.submit(work).result()   # 包まなければプロセス全体の集計だけ
+    assert [name for name, _ in run] == ["test.worker"]
+    assert core.span_count("test.worker") >= 2
+    core._perf_local.run = None
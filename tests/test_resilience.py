@@ -0,0 +1,129 @@
+"""
+上流 (yfinance) 呼び出しの制御の回帰テスト
+- トークンバケット: バースト分はすぐ通し、それ以降はレートに合わせて待たせる。pause() で全体を止める
+- 同一リクエストの合流: 同じ銘柄を同時に更新しても上流は1回だけ呼ぶ
+- サーキットブレーカー: 連続失敗で止め、クールダウン後に1本だけ試して復帰・延長する
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_core as core
+
+
+# --- トークンバケット ---
+def test_bucket_allows_burst_then_limits_rate():
+    bucket = core.TokenBucket(rate=20, burst=5)
+    t = time.monotonic()
+    for _ in range(5): bucket.acquire()
+    assert time.monotonic() - t < 0.1
+    for _ in range(5): bucket.acquire()
+    assert time.monotonic() - t >= 5 / 20 * 0.9
+
+
+def test_bucket_caps_request_at_burst():
+    # バーストより大きい要求 (多数銘柄の一括取得) でも永遠には待たない
+    bucket = core.TokenBucket(rate=100, burst=5)
+    t = time.monotonic()
+    bucket.acquire(50)
+    assert time.monotonic() - t < 0.1
+
+
+def test_bucket_pause_blocks_everyone():
+    bucket = core.TokenBucket(rate=1000, burst=10)
+    bucket.pause(0.1)
+    t = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - t >= 0.09
+
+
+# --- 同一リクエストの合流 ---
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(core, "OHLCV_DB", str(tmp_path / "ohlcv.sqlite"))
+
+
+def test_concurrent_refresh_downloads_once(store, monkeypatch):
+    calls, release = [], threading.Event()
+    idx = pd.date_range("2024-01-01", periods=30, freq="B", tz="UTC")
+    df = pd.DataFrame({c: np.linspace(100, 110, 30) for c in core.OHLCV_COLS}, index=idx)
+
+    def download(tickers, expect_data=False, **kw):
+        calls.append(list(tickers))
+        release.wait(5)
+        return {tk: df for tk in tickers}
+    monkeypatch.setattr(core, "download_prices", download)
+
+    results = [None, None]
+    def run(i): results[i] = core.refresh_store(["AAA"], "1d")
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for th in threads: th.start()
+    time.sleep(0.2)
+    release.set()
+    for th in threads: th.join(10)
+    assert calls == [["AAA"]]
+    assert all(len(r["AAA"]) == 30 for r in results)
+    assert core._inflight()["events"] == {}
+
+
+# --- サーキットブレーカー ---
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(core, "CB_COOLDOWN", 0.1)
+    return core.CircuitBreaker()
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    for _ in range(core.CB_THRESHOLD - 1): breaker.record(False)
+    breaker.record(True)   # 途中の成功で数え直し
+    for _ in range(core.CB_THRESHOLD - 1): breaker.record(False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_probe(breaker):
+    for _ in range(core.CB_THRESHOLD): breaker.record(False)
+    time.sleep(0.12)
+    assert breaker.state == "half-open"
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_failed_probe_doubles_cooldown(breaker):
+    for _ in range(core.CB_THRESHOLD): breaker.record(False)
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    time.sleep(0.12)
+    assert breaker.state == "open"   # 2回目は 0.2 秒
+    time.sleep(0.12)
+    assert breaker.state == "half-open"
+
+
+def test_breaker_ignores_unknown_outcome(breaker):
+    for _ in range(core.CB_THRESHOLD): breaker.record(False)
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record(None)   # 新規銘柄が空だった等: 成否不明なので状態は変えず、次の試行を許す
+    assert breaker.state == "half-open" and breaker.allow()
+
+
+def test_download_stops_calling_upstream_when_open(breaker, monkeypatch):
+    calls = []
+    def fail(*a, **kw):
+        calls.append(a)
+        raise ConnectionError("upstream down")
+    monkeypatch.setattr(core.yf, "download", fail)
+    monkeypatch.setattr(core, "_yf_breaker", lambda: breaker)
+    monkeypatch.setattr(core, "_yf_bucket", lambda: core.TokenBucket(1000, 1000))
+    for _ in range(core.CB_THRESHOLD): assert core.download_prices(["AAA"]) == {}
+    assert len(calls) == core.CB_THRESHOLD
+    assert core.download_prices(["AAA"]) == {}
+    assert len(calls) == core.CB_THRESHOLD
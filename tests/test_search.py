@@ -0,0 +1,63 @@
+"""
+銘柄検索 (TickerIndex) の回帰テスト
+- 完全一致・前方一致・部分一致・タイプミス・かな/ローマ字の揺れで見つかり、スコア順に並ぶか
+- 1〜2文字の検索語の打ち切りが、打ち切らない場合と同じ上位を返すか
+"""
+import random
+import string
+
+import pandas as pd
+import pytest
+
+import dashboard_core as core
+
+
+@pytest.fixture(scope="module")
+def index():
+    return core.TickerIndex(pd.DataFrame([
+        {"Ticker": "7203.T", "Name": "トヨタ自動車", "Category": "日本株"},
+        {"Ticker": "TM", "Name": "Toyota Motor (ADR)", "Category": "米国株"},
+        {"Ticker": "9984.T", "Name": "ソフトバンクグループ", "Category": "日本株"},
+        {"Ticker": "AAPL", "Name": "Apple", "Category": "米国株"},
+        {"Ticker": "AMAT", "Name": "Applied Materials", "Category": "米国株"},
+        {"Ticker": "BTC-USD", "Name": "Bitcoin", "Category": "暗号資産"},
+    ]))
+
+
+def tickers(res):
+    return res["Ticker"].tolist()
+
+
+@pytest.mark.parametrize("query, first", [
+    ("aapl", "AAPL"),          # ティッカー完全一致
+    ("appl", "AAPL"),          # 前方一致 (短い語ほど上)
+    ("7203", "7203.T"),        # 市場サフィックスなし
+    ("toyta", "TM"),           # タイプミス
+    ("トヨタ", "TM"),           # カタカナ → ローマ字
+    ("sofutobanku", "9984.T"), # ローマ字 → かな
+    ("coin", "BTC-USD"),       # 部分一致
+])
+def test_finds_best_match_first(index, query, first):
+    assert tickers(index.search(query))[0] == first
+
+
+def test_multiple_words_are_and(index):
+    assert tickers(index.search("apple materials")) == ["AMAT"]
+    assert index.search("apple bitcoin").empty
+
+
+def test_result_has_score_sorted(index):
+    res = index.search("a")
+    assert list(res.columns) == ["Ticker", "Name", "Category", "Score"]
+    assert res["Score"].is_monotonic_decreasing
+
+
+def test_short_query_cap_keeps_top_scores():
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(500)]
+    idx = core.TickerIndex(pd.DataFrame([{"Ticker": f"T{i}", "Name": " ".join(rng.choices(words, k=2)), "Category": "X"}
+                                         for i in range(3000)]))
+    for q in ["a", "s", "ab"]:
+        full = sorted(idx._match_short(q).values(), reverse=True)[:20]
+        got = [sc for _, sc in idx.search_ids(q, limit=20)]
+        assert got == full
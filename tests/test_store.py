@@ -0,0 +1,117 @@
+"""
+ローカル OHLCV ストアの回帰テスト
+- 追記: 2回目以降は最終バー以降だけを取得して足す
+- 鮮度: TTL 内なら上流を呼ばない
+- 分割: 調整済み価格が過去分まで変わったら全期間を取り直し、継ぎ目を残さない
+- 日中足: 表示に使う期間分だけ読み、古いバーは保存時に消す
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_core as core
+
+
+class Upstream:
+    """download_prices の代わり: 実際の値動き (raw) に分割調整をかけた日足を返し、呼び出しを記録する"""
+
+    def __init__(self, n=60):
+        self.idx = pd.date_range("2024-01-01", periods=n, freq="B", tz="America/New_York")
+        self.raw = pd.Series(100 + np.arange(n, dtype=float), index=self.idx)
+        self.splits = {}   # 日付 -> 比率
+        self.visible = 40  # 今日までに出ているバー数
+        self.calls = []
+
+    def adjusted(self):
+        close = self.raw.copy()
+        for day, ratio in self.splits.items():
+            close[close.index < day] /= ratio
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Volume": 1e6}, index=self.idx)[:self.visible]
+
+    def __call__(self, tickers, expect_data=False, **kw):
+        self.calls.append(kw)
+        df = self.adjusted()
+        if "start" in kw: df = df[df.index >= pd.Timestamp(kw["start"], tz=df.index.tz)]
+        return {tk: df for tk in tickers}
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(core, "OHLCV_DB", str(tmp_path / "ohlcv.sqlite"))
+    up = Upstream()
+    monkeypatch.setattr(core, "download_prices", up)
+    return up
+
+
+def expire(ticker):
+    # 最後の取得を TTL より前にずらす
+    with core._ohlcv_db() as con:
+        con.execute("UPDATE ohlcv_meta SET updated_at = updated_at - ? WHERE ticker=?", (core.PRICE_TTL + 1, ticker))
+
+
+def test_first_fetch_then_append(upstream):
+    df = core.refresh_store(["AAA"], "1d")["AAA"]
+    assert len(df) == 40 and upstream.calls[-1] == {"interval": "1d", "period": "max"}
+    upstream.visible = 45
+    expire("AAA")
+    df = core.refresh_store(["AAA"], "1d")["AAA"]
+    assert "start" in upstream.calls[-1]
+    assert len(df) == 45
+    np.testing.assert_allclose(df["Close"], upstream.adjusted()["Close"])
+
+
+def test_fresh_store_skips_upstream(upstream):
+    core.refresh_store(["AAA"], "1d")
+    upstream.visible = 45
+    df = core.refresh_store(["AAA"], "1d")["AAA"]
+    assert len(upstream.calls) == 1 and len(df) == 40
+    assert df.attrs["as_of"] == core.store_meta(["AAA"], "1d")["AAA"]["updated_at"]
+
+
+def test_split_reloads_history(upstream):
+    core.refresh_store(["AAA"], "1d")
+    # 2:1 分割: 分割日以降の実値が半分になり、調整済みの過去分も半分になる
+    day = upstream.idx[42]
+    upstream.raw[upstream.raw.index >= day] /= 2
+    upstream.splits[day] = 2
+    upstream.visible = 45
+    expire("AAA")
+    df = core.refresh_store(["AAA"], "1d")["AAA"]
+    assert [c.get("period") for c in upstream.calls] == ["max", None, "max"]
+    np.testing.assert_allclose(df["Close"], upstream.adjusted()["Close"])
+    # 継ぎ目 (分割日をまたいだ半値) がない
+    assert df["Close"].pct_change().abs().max() < 0.1
+
+
+def test_unchanged_overlap_is_not_reloaded(upstream):
+    core.refresh_store(["AAA"], "1d")
+    upstream.visible = 45
+    expire("AAA")
+    core.refresh_store(["AAA"], "1d")
+    assert [c.get("period") for c in upstream.calls] == ["max", None]
+
+
+def bars(idx):
+    close = np.linspace(100, 120, len(idx))
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0}, index=idx)
+
+
+def test_intraday_reads_window_and_prunes(upstream):
+    idx = pd.date_range("2024-03-01 09:30", periods=20 * 26, freq="15min", tz="America/New_York")
+    core.store_write("AAA", "15m", bars(idx))
+    df, meta = core.store_read("AAA", "15m")
+    keep = pd.Timedelta(days=core.INTRADAY_KEEP_DAYS["15m"])
+    assert df.index[0] >= idx[-1] - keep and df.index[-1] == idx[-1]
+    with core._ohlcv_db() as con:
+        n = con.execute("SELECT COUNT(*) FROM ohlcv WHERE ticker='AAA' AND interval='15m'").fetchone()[0]
+    assert n == len(df)
+    assert core.slice_period(df, "1日").index.normalize().nunique() == 1
+
+
+def test_daily_keeps_full_history(upstream):
+    idx = pd.date_range("1962-01-02", periods=20000, freq="B")
+    core.store_write("IBM", "1d", bars(idx))
+    df, _ = core.store_read("IBM", "1d")
+    assert len(df) == len(idx) and df.index[0] == idx[0]